@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Benchmark of the stages of the PSI pipeline on synthetic intersections"""
+# ---------------------------------------------------------------------------
+# Imports
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from crossing_v3 import Crossing
+from crossing_batch import CrossingBatch
+from intersection import intersection
+from intersection_batch import IntersectionBatch, APPROACH_FEATURES
+from main import OUTPUT_COLUMNS, DIRECTIONS, CONFLICT_ZONES, MOVEMENTS, format_intersection
+from result_writer import ResultWriter
+from workbook_loader import SHEET_NAME, read_summary_input
+
+SIZES = [1, 1000, 100000, 1000000]
+LEFT_TURN_TYPES = ['permissive', 'protected', 'protected-permissive']
+# scalar Crossing methods in the order they are computed and the arguments they take
+CROSSING_METHODS = [
+    ('test_validity', True, ()),
+    ('getPotentialConflictVolume', True, ()),
+    ('getPresentPedestrianProbability', True, ()),
+    ('getConflictSpeed', True, ()),
+    ('getDeathRisk', False, ()),
+    ('getSevereInjuryRisk', False, ()),
+    ('getPedestrianRiskIndex', False, ('death',)),
+    ('getPedestrianRiskIndex', False, ('injury',)),
+    ]
+
+
+def synthetic_table(n, seed=None):
+    """Generates a feature table of n random valid intersections
+
+    Every approach draws its lane number, slip lane, RTOR and left turn type independently
+    (about 20% slip lanes, 60% RTOR permitted and the three left turn types equally often),
+    and the shoulder type is chosen so the approach passes Crossing.test_validity. Ranges
+    keep clear of the inputs the model cannot evaluate (no zero right turn volume, and the
+    walk plus flashing don't walk time exceeds the leading pedestrian interval by at least
+    10 s so the right turn capacity never vanishes).
+
+    Args:
+        n: Number of intersections
+        seed: Seed of the random generator
+
+    Returns:
+        A DataFrame with one row per intersection in the format of workbook_loader.read_feature_table
+
+    """
+    rng = np.random.default_rng(seed)
+    shape = (n, 4)
+    columns = {}
+
+    def uniform(low, high):
+        return np.round(rng.uniform(low, high, shape), 2)
+
+    def integers(low, high):
+        return rng.integers(low, high + 1, shape)
+
+    def optional(probability, values):
+        return np.where(rng.random(shape) < probability, values, 0)
+
+    approach = {
+        'width_a': uniform(2.5, 4.5), 'width_b': uniform(2.5, 4.5),
+        'width_c': uniform(2.5, 4.5), 'width_d': uniform(2.5, 4.5),
+        'volume_P': integers(10, 200), 'volume_TH': integers(100, 1200),
+        'volume_RT': integers(10, 400), 'volume_LT': integers(10, 300),
+        'postedSpeedLimit': rng.choice([40, 50, 60], shape),
+        'rightTurnRadius': uniform(5, 30), 'leftTurnRadius': uniform(10, 40),
+        }
+    slip_lane = rng.random(shape) < 0.2
+    lane_number = integers(1, 4)
+    # 2: through only (slip lane), 1: right turn only (needs a second lane), 0: shared
+    shoulder_type = np.where(slip_lane, 2, np.where(lane_number >= 2, integers(0, 1), 0))
+    left_turn_type = rng.choice(LEFT_TURN_TYPES, shape)
+    approach.update({
+        'slipLane': slip_lane, 'shoulderType': shoulder_type, 'RTOR': rng.random(shape) < 0.6,
+        'leftTurnType': left_turn_type, 'laneNumber': lane_number,
+        'leadingPedInterval': optional(0.5, integers(3, 5)),
+        'effectiveRed': integers(20, 80), 'effectiveGreenPermissive': integers(10, 60),
+        'walkInterval': integers(10, 30), 'flashingDontWalkInterval': integers(5, 20),
+        'effectiveGreenProtectedLeftTurn': np.where(left_turn_type == 'permissive', 0, integers(5, 20)),
+        'effectiveGreenProtectedRightTurn': optional(0.5, integers(5, 15)),
+        })
+    for base in APPROACH_FEATURES:
+        for j in range(4):
+            columns[base + str(j + 1)] = approach[base][:, j]
+    columns.update({
+        'a_Frped': np.full(n, 0.49), 'b_Frped': np.full(n, 10645), 'baseSaturationFlow': np.full(n, 1900),
+        'cycleTime': rng.integers(60, 151, n), 'pedWalkSpeed': np.full(n, 1.2),
+        })
+    index = pd.Index(['I_%07d.xlsx' % i for i in range(n)], name='ID')
+    return pd.DataFrame(columns, index=index)
+
+
+def write_workbook(path, feature_dict, sheet_name=SHEET_NAME):
+    """Writes a feature_dict as an input workbook with a SummaryInput sheet"""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append(['feature', 'value'])
+    for feature, value in feature_dict.items():
+        ws.append([feature, value.item() if hasattr(value, 'item') else value])
+    wb.save(path)
+
+
+def timed(function, repeat=1):
+    """Returns the shortest wall time of repeat calls of function"""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class Benchmark:
+    """represents a benchmark run collecting the time of every stage at every size
+
+    Sizes are numbers of crossings, an intersection holds four of them. Stages that scale
+    badly (the scalar Crossing path and report text above max_scalar crossings, workbook
+    I/O above max_excel crossings) are skipped at larger sizes and listed as skipped.
+
+
+    Attributes:
+        results List[dict]: One record per stage and size with the 'seconds' and 'us_per_crossing'
+        skipped List[dict]: Stages and sizes that were not run and why
+    """
+
+    def __init__(self, sizes=SIZES, seed=0, repeat=3, max_scalar=100000, max_excel=1000):
+        self.sizes = list(sizes)
+        self.seed = seed
+        self.repeat = repeat
+        self.max_scalar = max_scalar
+        self.max_excel = max_excel
+        self.results = []
+        self.skipped = []
+
+    def run(self):
+        """Runs all stages at all sizes"""
+        for size in self.sizes:
+            n = -(-size // 4)
+            table = synthetic_table(n, self.seed)
+            print('size', size)
+            self.batch_stages(size, table)
+            if size <= self.max_scalar:
+                self.scalar_stages(size, table)
+            else:
+                self.skip(size, 'scalar', 'above max_scalar')
+            if size <= self.max_excel:
+                self.excel_stages(size, table)
+            else:
+                self.skip(size, 'excel', 'above max_excel')
+        return self
+
+    def record(self, stage, size, crossings, seconds):
+        self.results.append({'stage': stage, 'size': size, 'crossings': crossings,
+                             'seconds': seconds, 'us_per_crossing': seconds / crossings * 1e6})
+        print('  %-45s %12.6f s %12.3f us/crossing' % (stage, seconds, seconds / crossings * 1e6))
+
+    def skip(self, size, group, reason):
+        self.skipped.append({'group': group, 'size': size, 'reason': reason})
+
+    def batch_stages(self, size, table):
+        """Times the columnar path: building the batch and every get* method of CrossingBatch"""
+        n = len(table)
+        self.record('IntersectionBatch.from_table', size, 4 * n,
+                    timed(lambda: IntersectionBatch.from_table(table), self.repeat))
+
+        batch = IntersectionBatch.from_table(table)
+        self.record('IntersectionBatch.crossing_columns', size, 4 * n,
+                    timed(batch.crossing_columns, self.repeat))
+
+        # exactly size crossings, as 1-D columns
+        columns = {key: np.broadcast_to(values, (n, 4)).reshape(-1)[:size]
+                   for key, values in batch.crossing_columns().items()}
+        crossings = CrossingBatch(columns)
+        columns = CrossingBatch.to_columns(columns)
+        stages = [
+            ('test_validity', lambda: crossings.test_validity(columns)),
+            ('getPotentialConflictVolume', lambda: crossings.getPotentialConflictVolume(columns)),
+            ('getPresentPedestrianProbability', lambda: crossings.getPresentPedestrianProbability(columns)),
+            ('getConflictSpeed', lambda: crossings.getConflictSpeed(columns)),
+            ('getDeathRisk', crossings.getDeathRisk),
+            ('getSevereInjuryRisk', crossings.getSevereInjuryRisk),
+            ('getPedestrianRiskIndex(death)', lambda: crossings.getPedestrianRiskIndex('death')),
+            ('getPedestrianRiskIndex(injury)', lambda: crossings.getPedestrianRiskIndex('injury')),
+            ]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            for name, function in stages:
+                self.record('CrossingBatch.' + name, size, size, timed(function, self.repeat))
+
+        rows = batch_rows(batch, size)
+        with tempfile.TemporaryDirectory() as folder:
+            def write_csv():
+                with ResultWriter(os.path.join(folder, 'out.csv'), OUTPUT_COLUMNS, batch_rows=len(rows['IDs'])) as writer:
+                    writer.append(rows)
+            self.record('report.csv', size, size, timed(write_csv, self.repeat))
+
+    def scalar_stages(self, size, table):
+        """Times the original path: df_to_dict, adjust_feature_dict, every get* method of Crossing and out.txt"""
+        n = len(table)
+        feature_dicts = table.to_dict('records')
+        feature_dfs = [pd.DataFrame({'feature': list(d), 'value': list(d.values())}) for d in feature_dicts]
+        intersection_test = intersection(feature_dfs[0])
+
+        self.record('intersection.df_to_dict', size, 4 * n,
+                    timed(lambda: [intersection_test.df_to_dict(df) for df in feature_dfs], self.repeat))
+
+        targets = [(cross_num, feature_dicts[k // 4]) for k, cross_num in zip(range(size), [1, 2, 3, 4] * n)]
+        self.record('intersection.adjust_feature_dict', size, size,
+                    timed(lambda: [intersection_test.adjust_feature_dict(c, d) for c, d in targets], self.repeat))
+
+        crossing_dicts = [intersection_test.adjust_feature_dict(c, d) for c, d in targets]
+        crossings = [Crossing(d) for d in crossing_dicts]
+        for name, takes_features, args in CROSSING_METHODS:
+            stage = 'Crossing.' + name + ('(%s)' % args[0] if args else '')
+            if takes_features:
+                function = lambda: [getattr(c, name)(d) for c, d in zip(crossings, crossing_dicts)]
+            else:
+                function = lambda: [getattr(c, name)(*args) for c in crossings]
+            self.record(stage, size, size, timed(function, self.repeat))
+
+        intersections = [intersection(df) for df in feature_dfs]
+        ids = list(table.index)
+        self.record('report.text', size, 4 * n,
+                    timed(lambda: [format_intersection(ID, i) for ID, i in zip(ids, intersections)], self.repeat))
+
+    def excel_stages(self, size, table):
+        """Times reading the input workbooks (pd.read_excel and the sheet xml reader) and writing out.xlsx"""
+        n = len(table)
+        with tempfile.TemporaryDirectory() as folder:
+            paths = [os.path.join(folder, ID) for ID in table.index]
+            for path, feature_dict in zip(paths, table.to_dict('records')):
+                write_workbook(path, feature_dict)
+
+            self.record('ingest.read_excel', size, 4 * n,
+                        timed(lambda: [pd.read_excel(path, sheet_name=SHEET_NAME) for path in paths], self.repeat))
+            self.record('ingest.read_summary_input', size, 4 * n,
+                        timed(lambda: [read_summary_input(path) for path in paths], self.repeat))
+
+            outputDF = pd.DataFrame(batch_rows(IntersectionBatch.from_table(table), 4 * n))
+            self.record('report.xlsx', size, 4 * n,
+                        timed(lambda: outputDF.to_excel(os.path.join(folder, 'out.xlsx')), self.repeat))
+
+    def to_dict(self):
+        return {'meta': environment(self), 'results': self.results, 'skipped': self.skipped}
+
+    def save(self, path):
+        """Writes the results as JSON"""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def batch_rows(batch, size):
+    """Builds the out.xlsx rows (see main.OUTPUT_COLUMNS) of the first size crossings of a batch"""
+    n = len(batch)
+    ids = np.repeat(np.asarray(batch.ids, dtype=object), 20)[:5 * size]
+    rows = {'IDs': ids.tolist(),
+            'Crosswalks': np.tile(np.repeat(DIRECTIONS, 5), n)[:5 * size].tolist(),
+            'ConflictZones': np.tile(CONFLICT_ZONES, 4 * n)[:5 * size].tolist(),
+            'Movements': np.tile(MOVEMENTS, 4 * n)[:5 * size].tolist()}
+    for column, name in zip(OUTPUT_COLUMNS[4:], ['PCV', 'PPP', 'CS', 'DR', 'SIR']):
+        rows[column] = getattr(batch.crossings, name).reshape(-1)[:5 * size].tolist()
+    return rows
+
+
+def environment(benchmark):
+    """Describes the machine and settings of a run"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'sizes': benchmark.sizes,
+            'seed': benchmark.seed,
+            'repeat': benchmark.repeat}
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Finds the stages that got slower than in a baseline run
+
+    Args:
+        results: The dictionary of a run (Benchmark.to_dict) or the path of its JSON file
+        baseline: Same for the baseline run
+        tolerance: Allowed relative slowdown, 0.25 flags stages more than 25% slower
+
+    Returns:
+        A list of dictionaries with the 'stage', 'size', both times and their 'ratio' for every
+        stage and size measured in both runs that exceeds the tolerance
+
+    """
+    if isinstance(results, str):
+        with open(results) as f:
+            results = json.load(f)
+    if isinstance(baseline, str):
+        with open(baseline) as f:
+            baseline = json.load(f)
+    before = {(r['stage'], r['size']): r['seconds'] for r in baseline['results']}
+    regressions = []
+    for r in results['results']:
+        key = (r['stage'], r['size'])
+        if key in before and r['seconds'] > before[key] * (1 + tolerance):
+            regressions.append({'stage': r['stage'], 'size': r['size'], 'baseline': before[key],
+                                'seconds': r['seconds'], 'ratio': r['seconds'] / before[key]})
+    return regressions
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='numbers of crossings')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic intersections')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the shortest is kept')
+    parser.add_argument('--max-scalar', type=int, default=100000, help='largest size run through Crossing')
+    parser.add_argument('--max-excel', type=int, default=1000, help='largest size read from and written to workbooks')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file of the results')
+    parser.add_argument('--baseline', help='JSON file of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown against the baseline')
+    args = parser.parse_args()
+
+    benchmark = Benchmark(args.sizes, args.seed, args.repeat, args.max_scalar, args.max_excel).run()
+    benchmark.save(args.output)
+    if args.baseline:
+        regressions = compare(benchmark.to_dict(), args.baseline, args.tolerance)
+        for r in regressions:
+            print('slower: %-45s size %-8d %.6f s -> %.6f s (x%.2f)'
+                  % (r['stage'], r['size'], r['baseline'], r['seconds'], r['ratio']))
+        sys.exit(1 if regressions else 0)
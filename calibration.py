@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Calibration of the crash severity models against observed collision records"""
+# ---------------------------------------------------------------------------
+# Imports
+import numpy as np
+
+from crossing_batch import crash_risk, right_turn_speed
+from intersection_batch import IntersectionBatch, DIRECTIONS
+from monte_carlo import AREAS
+
+# current values of the parameters that can be calibrated
+PARAMETERS = {
+    'k_death': 6E-07, 'n_death': 3.35,          # getDeathRisk
+    'k_injury': 1.7E-06, 'n_injury': 3.25,      # getSevereInjuryRisk
+    'rt_o': 2.465682, 'rt_c': 0.0035318,        # right turn speed model of getConflictSpeed
+    'rt_d': -0.1375053, 'rt_f': 0.032,
+    }
+# search ranges, k is searched on a log scale
+BOUNDS = {
+    'k_death': (1E-10, 1E-3), 'n_death': (1, 6),
+    'k_injury': (1E-10, 1E-3), 'n_injury': (1, 6),
+    'rt_o': (1.5, 3.5), 'rt_c': (-0.01, 0.02),
+    'rt_d': (-2, 2), 'rt_f': (-0.1, 0.2),
+    }
+SPEED_PARAMETERS = ['rt_o', 'rt_c', 'rt_d', 'rt_f']
+# smallest probability used in the likelihood
+EPSILON = 1E-12
+
+
+class SeverityCalibration:
+    """represents the crash severity layer of an inventory of intersections
+
+    PCV and PPP do not depend on the severity parameters, so they are computed once for the
+    inventory, together with the inputs of the right turn speed model (radius and turning
+    volume of every right turn area) and the speeds that do not depend on it. A parameter
+    proposal then only re-evaluates conflict speeds, DR and SIR, for all crossings and for
+    many proposals at once.
+
+    Observed crashes are matched to crossing areas and scored with a binomial likelihood:
+    of the crashes of an area, the fatal ones follow DR and the severe injury ones follow SIR.
+
+
+    Attributes:
+        ids List: Identifier of each intersection of the inventory
+        PCV, PPP np.ndarray[N, 4, 5]: Cached potential conflict volumes and pedestrian presence probabilities
+        CS np.ndarray[N, 4, 5]: Cached conflict speeds with the current parameters
+        crashes, fatal, severe np.ndarray[M]: Observed counts of the M observed areas
+    """
+
+    def __init__(self, table, observed=None):
+        batch = IntersectionBatch.from_table(table, rounding=False)
+        columns = batch.crossing_columns()
+        crossings = batch.crossings
+        self.ids = list(batch.ids)
+        self.PCV = crossings.PCV
+        self.PPP = crossings.PPP
+        self.CS = crossings.CS
+        # inputs of the right turn speed model in the order [RT1_a, RT1_c, RT2_d]
+        shape = crossings.shape
+        self.radius = np.stack([np.broadcast_to(columns['rightTurnRadius1'] * 3.28, shape)] * 2
+                               + [np.broadcast_to(columns['rightTurnRadius2'] * 3.28, shape)], axis=-1)
+        self.volume = np.stack([np.broadcast_to(columns['volume_RT1'], shape), self.PCV[..., 1], self.PCV[..., 3]], axis=-1)
+        self.observed = None
+        if observed is not None:
+            self.observe(observed)
+
+    def observe(self, observed):
+        """Sets the observed crashes
+
+        Args:
+            observed: A DataFrame with the columns 'ID' (intersection), 'crossing' (1..4 or
+                'SouthBound', 'EastBound', ...), 'area' ('RT1_a', 'RT1_c', 'RT2_b', 'RT2_d' or
+                'LT3_a'), 'fatal' and 'severe_injury' (counts) and optionally 'crashes' (total
+                count, one crash per row by default); rows of the same area are added up
+
+        """
+        observed = observed.copy()
+        if 'crashes' not in observed:
+            observed['crashes'] = 1
+        observed['crossing'] = [DIRECTIONS.index(c) + 1 if c in DIRECTIONS else int(c) for c in observed['crossing']]
+        observed = observed.groupby(['ID', 'crossing', 'area'], as_index=False)[['crashes', 'fatal', 'severe_injury']].sum()
+
+        unknown = set(observed['ID']) - set(self.ids)
+        if unknown:
+            raise Exception('Error: observed crashes of unknown intersections ' + str(sorted(unknown)[:5]))
+        if not set(observed['area']) <= set(AREAS):
+            raise Exception('Error: unknown areas ' + str(sorted(set(observed['area']) - set(AREAS))))
+        if ((observed['fatal'] > observed['crashes']) | (observed['severe_injury'] > observed['crashes'])).any():
+            raise Exception('Error: more fatal or severe injury crashes than crashes in an area')
+
+        position = {ID: i for i, ID in enumerate(self.ids)}
+        self.observed = observed
+        self.index = (np.array([position[ID] for ID in observed['ID']]),
+                      observed['crossing'].to_numpy() - 1,
+                      np.array([AREAS.index(area) for area in observed['area']]))
+        self.crashes = observed['crashes'].to_numpy(dtype=np.float64)
+        self.fatal = observed['fatal'].to_numpy(dtype=np.float64)
+        self.severe = observed['severe_injury'].to_numpy(dtype=np.float64)
+
+    def speeds(self, parameters, index=None):
+        """Computes conflict speeds for parameter proposals
+
+        Args:
+            parameters: A dictionary of parameter names to values or to arrays of P proposals;
+                parameters not given keep their value of PARAMETERS
+            index: Optional (intersection, crossing, area) index arrays selecting areas
+
+        Returns:
+            An array of shape (P, N, 4, 5), or (P, M) with index, of conflict speeds
+
+        """
+        coefficients = {name[3:]: np.reshape(parameters.get(name, PARAMETERS[name]), (-1, 1, 1, 1))
+                        for name in SPEED_PARAMETERS}
+        CS = self.CS if index is None else self.CS[index]
+        if not any(name in parameters for name in SPEED_PARAMETERS):
+            return CS[None]
+        if index is None:
+            with np.errstate(divide='ignore', over='ignore'):
+                rt = right_turn_speed(self.radius, self.volume, **coefficients)
+            CS = np.broadcast_to(CS, rt.shape[:-1] + (5,)).copy()
+            CS[..., [0, 1, 3]] = rt
+            return CS
+        # only the observed areas: map RT1_a, RT1_c, RT2_d to the columns of radius and volume
+        rt_column = np.array([0, 1, -1, 2, -1])[index[2]]
+        is_rt = rt_column >= 0
+        selected = (index[0][is_rt], index[1][is_rt], rt_column[is_rt])
+        coefficients = {name: value.reshape(-1, 1) for name, value in coefficients.items()}
+        CS = np.broadcast_to(CS, (max(len(v) for v in coefficients.values()), len(CS))).copy()
+        with np.errstate(divide='ignore', over='ignore'):
+            CS[:, is_rt] = right_turn_speed(self.radius[selected], self.volume[selected], **coefficients)
+        return CS
+
+    def evaluate(self, parameters):
+        """Computes the negative log likelihood of the observed crashes for parameter proposals
+
+        Args:
+            parameters: See speeds
+
+        Returns:
+            An array of P negative log likelihoods
+
+        """
+        if self.observed is None:
+            raise Exception('Error: no observed crashes, see observe')
+        CS = self.speeds(parameters, self.index)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            nll = 0
+            for severity, count in [('death', self.fatal), ('injury', self.severe)]:
+                k = np.reshape(parameters.get('k_' + severity, PARAMETERS['k_' + severity]), (-1, 1))
+                n = np.reshape(parameters.get('n_' + severity, PARAMETERS['n_' + severity]), (-1, 1))
+                risk = np.clip(crash_risk(CS, k, n), EPSILON, 1 - EPSILON)
+                nll = nll - (count * np.log(risk) + (self.crashes - count) * np.log1p(-risk)).sum(axis=-1)
+        return np.where(np.isfinite(nll), nll, np.inf)
+
+    def fit(self, names=('k_death', 'n_death', 'k_injury', 'n_injury'), bounds=None, population=40,
+            generations=300, F=0.7, CR=0.9, seed=None, patience=30, tol=1E-9):
+        """Fits parameters by differential evolution (rand/1/bin), a generation is evaluated at once
+
+        Args:
+            names: Parameters to fit, the others keep their value of PARAMETERS
+            bounds: Dictionary of search ranges overriding BOUNDS
+            population: Number of proposals per generation
+            generations: Maximum number of generations
+            F: Differential weight
+            CR: Crossover probability
+            seed: Seed of the random generator
+            patience: Stop after this many generations improving the best by less than tol
+            tol: Relative improvement that counts as progress
+
+        Returns:
+            A dictionary with the fitted 'parameters', their negative log likelihood ('nll'),
+            that of the current parameters ('nll_default'), the best of each generation
+            ('history') and the number of 'evaluations'
+
+        """
+        names = list(names)
+        bounds = {**BOUNDS, **(bounds or {})}
+        log_scale = np.array([name.startswith('k_') for name in names])
+        low = np.array([bounds[name][0] for name in names], dtype=np.float64)
+        high = np.array([bounds[name][1] for name in names], dtype=np.float64)
+        low[log_scale], high[log_scale] = np.log10(low[log_scale]), np.log10(high[log_scale])
+
+        def decode(X):
+            values = np.where(log_scale, 10.0 ** X, X)
+            return {name: values[:, i] for i, name in enumerate(names)}
+
+        rng = np.random.default_rng(seed)
+        X = low + rng.random((population, len(names))) * (high - low)
+        default = np.array([PARAMETERS[name] for name in names], dtype=np.float64)
+        X[0] = np.clip(np.where(log_scale, np.log10(np.abs(default)), default), low, high)
+        y = self.evaluate(decode(X))
+        history = [y.min()]
+        evaluations = population
+        stale = 0
+        for _ in range(generations):
+            idx = np.array([rng.choice(np.delete(np.arange(population), i), 3, replace=False) for i in range(population)])
+            mutant = X[idx[:, 0]] + F * (X[idx[:, 1]] - X[idx[:, 2]])
+            cross = rng.random(X.shape) < CR
+            cross[np.arange(population), rng.integers(0, len(names), population)] = True
+            trial = np.clip(np.where(cross, mutant, X), low, high)
+            y_trial = self.evaluate(decode(trial))
+            evaluations += population
+            better = y_trial <= y
+            X[better] = trial[better]
+            y[better] = y_trial[better]
+            stale = stale + 1 if history[-1] - y.min() <= tol * abs(history[-1]) else 0
+            history.append(y.min())
+            if stale >= patience:
+                break
+
+        best = np.argmin(y)
+        parameters = {name: value[best].item() for name, value in decode(X).items()}
+        return {'parameters': parameters, 'nll': y[best].item(), 'nll_default': self.evaluate({})[0].item(),
+                'history': history, 'evaluations': evaluations}
+
+    def severity(self, parameters):
+        """Evaluates the severity layer of the whole inventory with one set of parameters
+
+        Returns:
+            A dictionary with 'CS', 'DR' and 'SIR' arrays of shape (N, 4, 5) and 'PSI_death'
+            and 'PSI_injury' arrays of shape (N, 4), unrounded
+
+        """
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            CS = self.speeds(parameters)[0]
+            res = {'CS': CS,
+                   'DR': crash_risk(CS, parameters.get('k_death', PARAMETERS['k_death']), parameters.get('n_death', PARAMETERS['n_death'])),
+                   'SIR': crash_risk(CS, parameters.get('k_injury', PARAMETERS['k_injury']), parameters.get('n_injury', PARAMETERS['n_injury']))}
+            for name, risk in [('PSI_death', res['DR']), ('PSI_injury', res['SIR'])]:
+                terms = self.PCV * self.PPP * risk
+                res[name] = terms[..., 0] + terms[..., 1] + terms[..., 2] + terms[..., 3] + terms[..., 4]
+        return res
+
+    def save(self, path):
+        """Writes the cached inventory to a .npz file"""
+        np.savez(path, ids=np.asarray(self.ids, dtype=str), PCV=self.PCV, PPP=self.PPP, CS=self.CS,
+                 radius=self.radius, volume=self.volume)
+
+    @classmethod
+    def load(cls, path, observed=None):
+        """Reads a cached inventory written by save, without recomputing it"""
+        data = np.load(path)
+        calibration = cls.__new__(cls)
+        calibration.ids = data['ids'].tolist()
+        for name in ['PCV', 'PPP', 'CS', 'radius', 'volume']:
+            setattr(calibration, name, data[name])
+        calibration.observed = None
+        if observed is not None:
+            calibration.observe(observed)
+        return calibration
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Single command line entry point to run, validate, sweep and query
+
+Every command imports only what it needs when it runs: validating a cached workbook loads
+neither pandas nor NumPy nor openpyxl, and only run and query load pandas. With --timings
+the time spent importing and running the command and the heavy modules loaded are printed
+to stderr (python -X importtime cli.py ... breaks the imports down further).
+
+Usage:
+    python cli.py run --inputs ./Inputs --outputs ./Outputs [options of main.py]
+    python cli.py validate ./Inputs/I_0001.xlsx [more workbooks or folders] [--cache ./Cache]
+    python cli.py sweep ./Inputs/I_0001.xlsx --set walkInterval1=5:30:5 --set leftTurnType3=protected,permissive
+    python cli.py query results.db top --by PSI_injury -n 20
+"""
+# ---------------------------------------------------------------------------
+# Imports
+import argparse
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# modules whose import dominates the start up time
+HEAVY_MODULES = ['numpy', 'pandas', 'openpyxl']
+
+# label to seconds spent, printed by --timings
+_timings = {}
+
+
+@contextmanager
+def timed(label):
+    """Adds the seconds spent inside a with block to the timing of label"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings[label] = _timings.get(label, 0.0) + time.perf_counter() - start
+
+
+def run_command(args, argv):
+    """Runs main.py with the remaining arguments"""
+    with timed('import'):
+        import main
+    main.main(argv)
+    return 0
+
+
+def validate_command(args):
+    """Checks workbooks and prints their problems; returns 1 if any workbook has one"""
+    with timed('import'):
+        from input_cache import InputCache
+        from validation import ERROR_COLUMNS, check_intersection
+
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths += [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.xlsx')]
+        else:
+            paths.append(path)
+    cache = InputCache(args.cache) if args.cache else None
+
+    rows = []
+    for path in paths:
+        if cache is not None:
+            feature_dict = cache.read(path)
+        else:
+            from workbook_loader import read_summary_input
+            feature_dict = read_summary_input(path)
+        found = check_intersection(feature_dict, os.path.basename(path))
+        if args.errors_only:
+            found = [row for row in found if row['severity'] == 'error']
+        rows += found
+    if cache is not None:
+        cache.save()
+
+    if rows:
+        print(','.join(ERROR_COLUMNS))
+        for row in rows:
+            print(','.join('' if row[name] is None else str(row[name]) for name in ERROR_COLUMNS[:-1])
+                  + ',"' + row['message'].replace('"', '""') + '"')
+    invalid = len(set(row['ID'] for row in rows))
+    print('%d of %d intersections have problems' % (invalid, len(paths)), file=sys.stderr)
+    return 1 if rows else 0
+
+
+def sweep_command(args):
+    """Evaluates every combination of the --set values on one workbook and writes one row per scenario"""
+    with timed('import'):
+        import itertools
+        import numpy as np
+        import pandas as pd
+        from intersection_batch import IntersectionBatch, DIRECTIONS
+        from validation import validate_feature_dicts
+        from workbook_loader import read_summary_input
+
+    feature_dict = read_summary_input(args.workbook)
+    values = {}
+    for setting in args.set:
+        feature, _, spec = setting.partition('=')
+        if feature not in feature_dict:
+            raise Exception('Error: ' + feature + ' is not a SummaryInput feature')
+        values[feature] = parse_values(spec, np)
+    features = list(values)
+    scenarios = pd.DataFrame(list(itertools.product(*values.values())), columns=features)
+
+    errors = validate_feature_dicts([{**feature_dict, **row} for row in scenarios.to_dict('records')])
+    valid = scenarios.drop(index=sorted(set(errors['ID'])))
+    if len(valid) < len(scenarios):
+        print('Skipped %d of %d scenarios with problems' % (len(scenarios) - len(valid), len(scenarios)), file=sys.stderr)
+    batch = IntersectionBatch.from_scenarios(feature_dict, {f: valid[f].tolist() for f in features},
+                                             rounding=not args.full_precision)
+    results = valid.reset_index(drop=True)
+    for name in ['PCV', 'PSI_death', 'PSI_injury']:
+        result = np.broadcast_to(getattr(batch, name), (len(valid), 4))
+        for k, direction in enumerate(DIRECTIONS):
+            results[name + '_' + direction] = result[:, k]
+    results.to_csv(args.out if args.out else sys.stdout, index=False)
+    return 0
+
+
+def parse_values(spec, np):
+    """Parses 'lo:hi:step' (inclusive) or 'a,b,c' into a list of values"""
+    if ':' in spec:
+        lo, hi, step = [float(v) for v in spec.split(':')]
+        values = np.arange(lo, hi + step / 2, step).round(10).tolist()
+        return [int(v) if v.is_integer() else v for v in values]
+    return [parse_value(v) for v in spec.split(',')]
+
+
+def parse_value(text):
+    """Types a value like read_summary_input does (True/False, int, float or str)"""
+    if text in ('True', 'False'):
+        return text == 'True'
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def query_command(args):
+    """Prints the result of a query of a result store"""
+    with timed('import'):
+        from result_store import ResultStore
+
+    with ResultStore(args.store) as store:
+        if args.query == 'runs':
+            result = store.runs()
+        elif args.query == 'top':
+            result = store.top(args.n, args.by, args.run_id, args.ascending)
+        elif args.query == 'threshold':
+            result = store.threshold(args.column, args.above, args.below, args.run_id, args.table)
+        elif args.query == 'diff':
+            result = store.diff(args.run_a, args.run_b, args.column, args.min_change, args.limit)
+        else:
+            result = store.query(args.sql)
+    if args.csv:
+        result.to_csv(sys.stdout, index=False)
+    else:
+        print(result.to_string(index=False))
+    return 0
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--timings', action='store_true', help='print import and command times to stderr')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('run', help='compute all workbooks of a folder (see python main.py --help)', add_help=False)
+
+    validate = commands.add_parser('validate', help='list the problems of workbooks without computing them')
+    validate.add_argument('paths', nargs='+', help='workbooks or folders of workbooks')
+    validate.add_argument('--cache', default='./Cache', help='input cache folder, empty to always parse the workbooks')
+    validate.add_argument('--errors-only', action='store_true', help='leave out hazards (divisions by zero)')
+
+    sweep = commands.add_parser('sweep', help='evaluate a grid of feature values on one workbook')
+    sweep.add_argument('workbook', help='the base intersection workbook')
+    sweep.add_argument('--set', action='append', required=True, metavar='FEATURE=VALUES',
+                       help='values of a SummaryInput feature as lo:hi:step or a,b,c; repeat for a grid')
+    sweep.add_argument('--full-precision', action='store_true', help='round only the outputs')
+    sweep.add_argument('--out', help='CSV file of the results (default: stdout)')
+
+    query = commands.add_parser('query', help='query a SQLite result store')
+    query.add_argument('store', help='path of the result store')
+    query.add_argument('--csv', action='store_true', help='print CSV instead of a table')
+    queries = query.add_subparsers(dest='query', required=True)
+    queries.add_parser('runs', help='the runs with their number of crossings')
+    top = queries.add_parser('top', help='the crossings with the highest values')
+    top.add_argument('--by', default='PSI_injury', help='PSI_injury, PSI_death or PCV')
+    top.add_argument('-n', type=int, default=50, help='number of crossings')
+    top.add_argument('--ascending', action='store_true', help='lowest values first')
+    threshold = queries.add_parser('threshold', help='the areas or crossings beyond thresholds')
+    threshold.add_argument('--column', default='DR')
+    threshold.add_argument('--above', type=float)
+    threshold.add_argument('--below', type=float)
+    threshold.add_argument('--table', default='areas', help='areas or crossings')
+    for subparser in (top, threshold):
+        subparser.add_argument('--run-id', help='run to query (default: the latest)')
+    diff = queries.add_parser('diff', help='the crossings that changed between two runs')
+    diff.add_argument('run_a')
+    diff.add_argument('run_b')
+    diff.add_argument('--column', default='PSI_injury')
+    diff.add_argument('--min-change', type=float, default=0)
+    diff.add_argument('--limit', type=int)
+    sql = queries.add_parser('sql', help='any SQL query')
+    sql.add_argument('sql')
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args, rest = make_parser().parse_known_args(argv)
+    start = time.perf_counter()
+    if args.command == 'run':
+        status = run_command(args, rest)
+    elif rest:
+        make_parser().error('unrecognized arguments: ' + ' '.join(rest))
+    elif args.command == 'validate':
+        status = validate_command(args)
+    elif args.command == 'sweep':
+        status = sweep_command(args)
+    else:
+        status = query_command(args)
+    if args.timings:
+        total = time.perf_counter() - start
+        imports = _timings.get('import', 0.0)
+        heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+        print('import %.1f ms, command %.1f ms, heavy modules loaded: %s'
+              % (1e3 * imports, 1e3 * (total - imports), ', '.join(heavy) or 'none'), file=sys.stderr)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version ='1.0'
+# ---------------------------------------------------------------------------
+"""Vectorized implementation of crossing class for evaluating many crossings at once"""
+# ---------------------------------------------------------------------------
+# Imports
+import numpy as np
+
+# Codes used for leftTurnType3 once it is converted to a column
+PERMISSIVE = 0
+PROTECTED = 1
+PROTECTED_PERMISSIVE = 2
+
+FLAG_FEATURES = ['slipLane1', 'slipLane2', 'slipLane3', 'slipLane4',
+                 'RTOR1', 'RTOR2', 'RTOR3', 'RTOR4']
+LEFT_TURN_FEATURES = ['leftTurnType1', 'leftTurnType2', 'leftTurnType3', 'leftTurnType4']
+
+
+def round_half_even(values, ndigits=3):
+    """Rounds an array exactly like the builtin round(value, ndigits)
+
+    np.round scales, rounds and unscales which can disagree with the builtin
+    round on values that sit on a tie, so those few values are rounded in Python.
+
+    Args:
+        values: An array of floats
+        ndigits: Number of decimals to keep
+
+    Returns:
+        A float64 array of rounded values
+
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    res = np.rint(scaled) / scale
+    with np.errstate(invalid='ignore'):
+        inexact = (np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6) | (np.abs(scaled) >= 2.0 ** 52)
+    inexact &= np.isfinite(values)
+    if inexact.any():
+        res[inexact] = [round(v, ndigits) for v in values[inexact].tolist()]
+    return res
+
+
+def left_turn_codes(values):
+    """Converts leftTurnType values ('permissive', 'protected', anything else) to integer codes"""
+    values = np.asarray(values)
+    if values.dtype.kind in 'biuf':
+        return values.astype(np.int8)
+    return np.where(values == 'permissive', PERMISSIVE,
+                    np.where(values == 'protected', PROTECTED, PROTECTED_PERMISSIVE)).astype(np.int8)
+
+
+def right_turn_speed(radius_ft, volume, o=2.465682, c=0.0035318, d=-0.1375053, f=0.032):
+    """Computes 85th percentile right turn speed for a radius (ft) and a turning volume (veh/h)
+
+    The coefficients o, c, d and f of the speed model can be replaced (see calibration),
+    they broadcast against radius_ft and volume. A zero volume has a zero speed.
+    """
+    ## RT model coefs
+    a, Iy = 0.0471218, 0
+    b, ITk = -0.1428277, 0
+    e, IThru =	0.8183215, 0
+    g =	0.0076864
+    z = 1.0364              # for 85th percentile
+
+    tH = 3600 / volume      # time headway between preceeding vehicle and vehicle of interest (seconds)
+    speed = np.exp(o + a*Iy + b*ITk + c*radius_ft + (d + e*IThru + f*radius_ft + g*radius_ft*IThru )/tH**2 + z*0.19)
+    return np.where(volume != 0, speed, 0)
+
+
+def crash_risk(speed, k, n):
+    """Computes the probability 1 - exp(-k * speed^n) of a crash at a conflict speed (km/h) being fatal or severe"""
+    return 1 - np.exp(-k*(speed**n))
+
+
+class CrossingBatch:
+    """represents a batch of crossings of 4-legged intersections.
+
+    Each element of the feature columns is one crossing (or one scenario of a crossing) and
+    follows the same format as the feature_dict of Crossing, i.e. every element reperents
+    crossing #2 in the provided guidline. Results are identical to evaluating Crossing one
+    element at a time.
+
+    Columns are usually 1-D (one row per crossing) but may have any shapes that broadcast
+    together, e.g. geometry of shape (4,) against volumes of shape (T, 4). Terms that only
+    depend on the smaller columns are then computed once and broadcast.
+
+    With rounding=False every result keeps full float64 precision instead of being rounded to
+    3 decimals after each step, so DR, SIR and PSI are computed from the unrounded CS, PCV and
+    PPP; the results then differ from Crossing in the last decimals.
+
+
+    Attributes:
+        shape Tuple: Broadcast shape of the feature columns, (n,) for n rows
+        rounding bool: Whether results are rounded to 3 decimals like Crossing
+        PCV np.ndarray[*shape, 5]: Potential conflicting volumes - [PCV_RT1_a, PCV_RT1_c, PCV_RT2_b, PCV_RT2_d, PCV_LT3_a]
+        PPP np.ndarray[*shape, 5]: Probability of pedestrain being present in the crossing - [PPP_RT1_a, PPP_RT1_c, PPP_RT2_b, PPP_RT2_d, PPP_LT3_a]
+        CS np.ndarray[*shape, 5]: Conflict speeds - [CS_RT1_a, CS_RT1_c, CS_RT2_b, CS_RT2_d, CS_LT3_a]
+        DR np.ndarray[*shape, 5]: Death risk for potential crash - [DR_RT1_a, DR_RT1_c, DR_RT2_b, DR_RT2_d, DR_LT3_a]
+        SIR np.ndarray[*shape, 5]: Severe injury risk for potential crash - [SIR_RT1_a, SIR_RT1_c, SIR_RT2_b, SIR_RT2_d, SIR_LT3_a]
+        PSI_death np.ndarray[*shape]: Pedstrian safety index using death risk model
+        PSI_injury np.ndarray[*shape]: Pedstrian safety index using severe injury risk model
+
+    """
+
+    def __init__(self, feature_columns, rounding=True):
+        self.rounding = rounding
+        self._evaluate(self.to_columns(feature_columns))
+
+    @classmethod
+    def from_columns(cls, columns, rounding=True):
+        """Builds the batch from columns that are already typed (see to_columns) without converting
+        them, e.g. columns of derivatives.Dual carrying derivatives along with the values"""
+        crossings = cls.__new__(cls)
+        crossings.rounding = rounding
+        crossings._evaluate(columns)
+        return crossings
+
+    def _evaluate(self, columns):
+        self.shape = np.broadcast_shapes(*[value.shape for value in columns.values()])
+        self.test_validity(columns)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            self.PCV = self.getPotentialConflictVolume(columns)
+            self.PPP = self.getPresentPedestrianProbability(columns)
+            self.CS = self.getConflictSpeed(columns)
+            self.DR = self.getDeathRisk()
+            self.SIR = self.getSevereInjuryRisk()
+            self.PSI_death = self.getPedestrianRiskIndex('death')
+            self.PSI_injury = self.getPedestrianRiskIndex('injury')
+
+    def __len__(self):
+        return self.shape[0]
+
+    @staticmethod
+    def to_columns(feature_columns):
+        """Converts a mapping of feature names to scalars or arrays into typed columns
+
+        Flags (slipLane, RTOR) become bool arrays, leftTurnType becomes integer codes and
+        everything else becomes float64. Columns keep their shape and are broadcast by the
+        computations.
+
+        Args:
+            feature_columns: A mapping of feature names to scalars or arrays (one value per crossing)
+
+        Returns:
+            A dictionary of feature names to arrays
+
+        """
+        columns = {}
+        for key, value in feature_columns.items():
+            if key in FLAG_FEATURES:
+                columns[key] = np.asarray(value).astype(bool)
+            elif key in LEFT_TURN_FEATURES:
+                columns[key] = left_turn_codes(value)
+            else:
+                columns[key] = np.asarray(value, dtype=np.float64)
+        return columns
+
+    def getPotentialConflictVolume(self, columns):
+        """Computes potential conflict volumes.
+
+        Args:
+            columns: A dictionary of feature columns realted to geometric and signal plan
+
+        Returns:
+            An array of potential conflict volumes along the last axis:
+
+            [PCV_RT1_a, PCV_RT1_c, PCV_RT2_b, PCV_RT2_d, PCV_LT3_a]
+
+        """
+        S_base = columns['baseSaturationFlow']
+        c = columns['cycleTime']
+        W = columns['pedWalkSpeed']
+
+        ### Computing PCV_RT1_a and PCV_RT1_c
+        ## 1) compute volume RTOR for appraoch 1
+        q_prime_ped = self._pedFlowRate(columns['volume_P1'], columns['leadingPedInterval2'],
+                                        columns['walkInterval2'] + columns['flashingDontWalkInterval2'], c)
+        F_Rped = np.where(q_prime_ped >= 200, np.maximum(0.49 - q_prime_ped/10645, 0), 1)
+        F_radius = self._radiusFactor(columns['rightTurnRadius4'])
+        S_R = S_base * np.minimum(F_Rped, F_radius)
+        shared4 = columns['shoulderType4'] == 0
+        K_R = np.where(shared4, S_base/S_R, 0)
+        V_TH4 = columns['volume_TH4']
+        V_RT4 = columns['volume_RT4']
+        N = columns['laneNumber4']
+        q_prime = V_TH4 + V_RT4 * K_R
+        q_m1 = np.where(shared4, np.maximum(0, q_prime/N - V_RT4*K_R), q_prime/N)
+        q_mR = np.where(shared4, V_RT4, 0)
+        q_prime_m1 = q_mR * c / columns['effectiveRed1']
+        q_prime_mR = q_m1 * c / columns['effectiveRed1']
+        q_prime_m = q_prime_mR/2 + q_prime_m1
+        q_rtor = 850 - 0.35 * q_prime_m
+
+        # compute C_rtor_exc
+        tw1 = 5.25/W
+        f_Pb = np.minimum(1, tw1*columns['volume_P1']/3600)
+        P_b = 1 - f_Pb
+        C_rtor_exc = P_b * q_rtor * columns['effectiveRed1'] / c
+
+        # compute C_rtor (shared lane unless RT1 has exclusive lane)
+        f_hat = self._sharedLaneFactor(columns, 1, columns['volume_P2'], columns['leadingPedInterval1'],
+                                       columns['walkInterval1'] + columns['flashingDontWalkInterval1'],
+                                       q_rtor, columns['effectiveRed1'])
+        C_rtor = np.where(columns['shoulderType1'] == 1, C_rtor_exc, C_rtor_exc * f_hat)
+        q_rtor_arrival = columns['volume_RT1'] * columns['effectiveRed1'] / c
+        RT1_rtor = np.minimum(C_rtor, q_rtor_arrival)
+        no_rtor1 = ~columns['RTOR1'] | (columns['shoulderType1'] == 2)
+        RT1_rtor = np.where(no_rtor1, 0, RT1_rtor)
+
+        ## 2) compute RT in protected phase
+        g_protected = columns['effectiveGreenProtectedRightTurn1']
+        q_arrive_g_protect = columns['volume_RT1'] * g_protected / c
+        q_arrive_ROR = columns['volume_RT1'] * columns['effectiveRed1'] / c
+        q_arrive_protect = q_arrive_g_protect + q_arrive_ROR - RT1_rtor
+        C_protected = S_base * self._radiusFactor(columns['rightTurnRadius1']) * g_protected / c
+        # without a protected phase (g_protected == 0) C_protected is 0 and q_arrive_protect is
+        # not negative (RT1_rtor <= q_arrive_ROR), so the minimum is the 0 of Crossing's branch;
+        # computing it instead of selecting 0 keeps the slope of a short protected phase in
+        # the derivatives (see derivatives.Dual)
+        RT1_protected = np.minimum(C_protected, q_arrive_protect)
+
+        ## 3) compute conflicting volumes
+        W_plus_FDW1 = columns['walkInterval1'] + columns['flashingDontWalkInterval1']
+        PCV_RT1_a = np.maximum(columns['volume_RT1'] - RT1_rtor - RT1_protected, 0)
+        PCV_RT1_a = PCV_RT1_a * np.minimum(1, W_plus_FDW1/columns['effectiveGreenPermissive1'])
+        PCV_RT1_a = np.where(columns['slipLane1'], 0, PCV_RT1_a)
+        PCV_RT1_c = np.where(columns['slipLane1'], columns['volume_RT1'], 0)
+
+        ### Computing PCV_RT2_b and PCV_RT2_d
+        ## 1) compute volume RTOR for appraoch 2
+        q_prime_ped = self._pedFlowRate(columns['volume_P2'], columns['leadingPedInterval1'], W_plus_FDW1, c)
+        F_Rped = np.where(q_prime_ped > 200, np.maximum(0.49 - q_prime_ped/10645.0, 0), 1.0)
+        F_radius = self._radiusFactor(columns['rightTurnRadius1'])
+        S_R = S_base * np.minimum(F_Rped, F_radius)
+        shared1 = columns['shoulderType1'] == 0
+        K_R = np.where(shared1, S_base/S_R, 0)
+        V_TH1 = columns['volume_TH1']
+        V_RT1 = columns['volume_RT1']
+        N = columns['laneNumber1']
+        q_prime = V_TH1 + V_RT1 * K_R
+        V_R = np.where(shared1, V_RT1, 0)
+        V_T = np.where(shared1, np.maximum(0, q_prime/N - V_RT1*K_R), q_prime/N)
+        q_prime_m1 = V_T * c / columns['effectiveRed2']
+        q_prime_mR = V_R * c / columns['effectiveRed2']
+        q_prime_m = q_prime_mR/2 + q_prime_m1
+        q_rtor = 850 - 0.35 * q_prime_m
+
+        # compute C_rtor_exc for RT2
+        tw2 = 5.25/W
+        f_Pb = np.minimum(1, tw2*columns['volume_P2']/3600)
+        P_b = 1 - f_Pb
+        C_rtor_exc = P_b * q_rtor * columns['effectiveRed2'] / c
+
+        # compute C_rtor for RT2 (shared lane unless RT2 has exclusive lane)
+        f_hat = self._sharedLaneFactor(columns, 2, columns['volume_P3'], columns['leadingPedInterval2'],
+                                       columns['walkInterval2'] + columns['flashingDontWalkInterval2'],
+                                       q_rtor, columns['effectiveRed2'])
+        C_rtor = np.where(columns['shoulderType2'] == 1, C_rtor_exc, C_rtor_exc * f_hat)
+        q_rtor_arrival = columns['volume_RT2'] * columns['effectiveRed2'] / c
+        RT2_rtor = np.minimum(C_rtor, q_rtor_arrival)
+
+        ## 2) compute conflicting volumes
+        PCV_RT2_b = RT2_rtor * np.minimum(1, W_plus_FDW1/columns['effectiveRed2'])
+        PCV_RT2_b = np.where(columns['slipLane2'] | ~columns['RTOR2'], 0, PCV_RT2_b)
+        PCV_RT2_d = np.where(columns['slipLane2'], columns['volume_RT2'], 0)
+
+        ### Computing PCV_LT3_a
+        left_turn_type = columns['leftTurnType3']
+        V_LT3 = columns['volume_LT3']
+        g_permissive3 = columns['effectiveGreenPermissive3']
+        PCV_LT3_a_permissive = V_LT3 * W_plus_FDW1/g_permissive3
+        ## protected and permissive: LT vehicles served in the protected phase
+        max_discharged_protected = S_base * columns['effectiveGreenProtectedLeftTurn3']/3600
+        re = c - columns['effectiveGreenProtectedLeftTurn3'] - g_permissive3
+        wating_veh = V_LT3 * re / 3600
+        served_veh_protected = np.minimum(wating_veh, max_discharged_protected) * 3600 / c
+        ## remaining vehicles are served during permissive phase
+        served_veh_permissive = V_LT3 - served_veh_protected
+        PCV_LT3_a = served_veh_permissive * np.minimum(1, W_plus_FDW1/g_permissive3)
+        PCV_LT3_a = np.where(left_turn_type == PERMISSIVE, PCV_LT3_a_permissive,
+                             np.where(left_turn_type == PROTECTED, 0, PCV_LT3_a))
+
+        res = self._stack([PCV_RT1_a, PCV_RT1_c, PCV_RT2_b, PCV_RT2_d, PCV_LT3_a])
+        return self._round(res)
+
+    def getPresentPedestrianProbability(self, columns):
+        """Computes probability of pedestrain being present in the crossing
+
+        Args:
+            columns: A dictionary of feature columns realted to geometric and signal plan
+
+        Returns:
+            An array of present pedestrian probabilities along the last axis:
+
+            [PPP_RT1_a, PPP_RT1_c, PPP_RT2_b, PPP_RT2_d, PPP_LT3_a]
+
+        """
+        ## Compute required time for peds to pass the area a,b,c,d
+        tw_a = columns['width_a2']/columns['pedWalkSpeed']
+        tw_b = columns['width_b2']/columns['pedWalkSpeed']
+        tw_c = columns['width_c2']/columns['pedWalkSpeed']
+        tw_d = columns['width_d2']/columns['pedWalkSpeed']
+
+        ## Compute average ped headway for area a, b and c, d
+        effectivePedVolume_ab = columns['volume_P2'] * columns['cycleTime'] / (columns['walkInterval1']+columns['flashingDontWalkInterval1']-columns['leadingPedInterval1'])
+        pedHeadway_ab = 3600 / effectivePedVolume_ab
+        pedHeadway_cd = 3600 / columns['volume_P2']
+
+        ## Compute probability of present ped in the areas
+        PPP_RT1_a = 1 - np.exp(-tw_a/pedHeadway_ab)
+        PPP_RT1_c = np.where(columns['slipLane1'], 1 - np.exp(-tw_c/pedHeadway_cd), 0)
+        PPP_RT2_b = 1 - np.exp(-tw_b/pedHeadway_ab)
+        PPP_RT2_d = np.where(columns['slipLane2'], 1 - np.exp(-tw_d/pedHeadway_cd), 0)
+        PPP_LT3_a = PPP_RT1_a
+
+        res = self._stack([PPP_RT1_a, PPP_RT1_c, PPP_RT2_b, PPP_RT2_d, PPP_LT3_a])
+        return self._round(res)
+
+    def getConflictSpeed(self, columns):
+        """Computes conflicting speeds in the crossing areas
+
+        Args:
+            columns: A dictionary of feature columns realted to geometric and signal plan
+
+        Returns:
+            An array of conflicting speeds along the last axis:
+
+            [CS_RT1_a, CS_RT1_c, CS_RT2_b, CS_RT2_d, CS_LT3_a]
+
+        """
+        ## Compute right turn speeds on apprrach 2
+        CS_RT2_b = 8.0                                         # assumed (km/h)
+        rRT2 = columns['rightTurnRadius2'] * 3.28              # radius of right turn in ft
+        CS_RT2_d = right_turn_speed(rRT2, self.PCV[..., 3])
+
+        ## Compute right turn speeds on apprrach 1
+        rRT1 = columns['rightTurnRadius1'] * 3.28
+        CS_RT1_a = right_turn_speed(rRT1, columns['volume_RT1'])
+        CS_RT1_c = right_turn_speed(rRT1, self.PCV[..., 1])
+
+        ## Compute left turn speeds from apprach 3 using LT radius and corrected AASHTO Model
+        correction_factor, f_r = 1.38, 0.16
+        CS_LT3_a = correction_factor * np.sqrt(127 * columns['leftTurnRadius3'] * f_r)
+
+        res = self._stack([CS_RT1_a, CS_RT1_c, CS_RT2_b, CS_RT2_d, CS_LT3_a])
+        return self._round(res)
+
+    def getDeathRisk(self):
+        """Computes the probability of a crash being fatal in the crossing areas
+
+        Returns:
+            An array of death risks for potential crashes along the last axis:
+
+            [DR_RT1_a, DR_RT1_c, DR_RT2_b, DR_RT2_d, DR_LT3_a]
+
+        """
+        k = 6E-07
+        n = 3.35
+        return self._round(crash_risk(self.CS, k, n))
+
+    def getSevereInjuryRisk(self):
+        """Computes the probability of a crash being severe injury in the crossing areas
+
+        Returns:
+            An array of severe injury risks for potential crashes along the last axis:
+
+            [SIR_RT1_a, SIR_RT1_c, SIR_RT2_b, SIR_RT2_d, SIR_LT3_a]
+
+        """
+        k = 1.7E-06
+        n = 3.25
+        return self._round(crash_risk(self.CS, k, n))
+
+    def getPedestrianRiskIndex(self, severity):
+        """Computes the pedestrian risk index for each crossing
+
+        Args:
+            severity: determine which severity model to use 'death' or 'injury'
+
+        Returns:
+            An array of Pedstrian safety index, one per crossing
+
+        """
+        if severity == 'death':
+            risk = self.DR
+        if severity == 'injury':
+            risk = self.SIR
+        terms = self.PCV * self.PPP * risk
+        # summing left to right keeps the result identical to the builtin sum in Crossing
+        PSI = terms[..., 0] + terms[..., 1] + terms[..., 2] + terms[..., 3] + terms[..., 4]
+        return self._round(PSI)
+
+    def test_validity(self, columns):
+        """Raises an exception if any crossing has an invalid lane/shoulder/slip lane combination on approach 1"""
+        single_lane = columns['laneNumber1'] == 1
+        multi_lane = columns['laneNumber1'] >= 2
+        shoulder = columns['shoulderType1']
+        slip = columns['slipLane1']
+        checks = [
+            (single_lane & (shoulder == 1), 'Shoulder type can never equal 1 (because then through vehicle cannot proceed) when lane Number = 1'),
+            (single_lane & (shoulder == 2) & ~slip, 'Shoulder type can never equal 1 when lane Number = 1 and there is no a slip lane '),
+            (multi_lane & (shoulder == 2) & ~slip, 'Shoulder type can never equal 2 when lane Number >= 2 and there is no a slip lane '),
+            (slip & (shoulder != 2), 'Shoulder type can only equal 2 when there is a slip lane '),
+        ]
+        for mask, message in checks:
+            if mask.any():
+                print('Invalid crossings: ', np.argwhere(np.broadcast_to(mask, self.shape)).tolist())
+                raise Exception('Error: ' + message)
+
+    def _round(self, values):
+        return round_half_even(values) if self.rounding else values
+
+    def _stack(self, values):
+        """Stacks the five areas of a crossing along a last axis"""
+        return np.stack([np.broadcast_to(v, self.shape) for v in values], axis=-1)
+
+    def _pedFlowRate(self, V_P, LPI, W_plus_FDW, c):
+        """Computes q'ped, the pedestrian flow rate during walk and flashing don't walk"""
+        V_P = np.where(LPI == 0, V_P*c/3600, np.maximum(0, V_P*c/3600 - V_P*(c - W_plus_FDW)/3600))
+        V_P = V_P*3600/c
+        return V_P * c / (W_plus_FDW - LPI)
+
+    def _radiusFactor(self, radius):
+        """Computes F_radius of a right turn"""
+        return np.where(radius < 15, np.maximum(0.5 + radius/30, 0), 1)
+
+    def _sharedLaneFactor(self, columns, approach, V_P, LPI, W_plus_FDW, q_rtor, effectiveRed):
+        """Computes f_hat, the share of RTOR capacity available to right turns on a shared lane"""
+        q_prime_ped = self._pedFlowRate(V_P, LPI, W_plus_FDW, columns['cycleTime'])
+        F_Rped = np.where(q_prime_ped >= 200, np.maximum(0.49 - q_prime_ped/10645, 0), 1.0)
+        F_radius = self._radiusFactor(columns['rightTurnRadius%d' % approach])
+        S_R = columns['baseSaturationFlow'] * np.minimum(F_Rped, F_radius)
+        shared = columns['shoulderType%d' % approach] == 0
+        K_R = np.where(shared, columns['baseSaturationFlow']/S_R, 0)
+
+        V_TH = columns['volume_TH%d' % approach]
+        V_RT = columns['volume_RT%d' % approach]
+        N = columns['laneNumber%d' % approach]
+        q_prime = V_TH + V_RT * K_R
+        V_R = V_RT
+        V_T = np.where(shared, np.maximum(0, q_prime/N - V_RT*K_R), q_prime/N)
+
+        P_R = V_R / (V_R + V_T)
+        return P_R * P_R ** (q_rtor*effectiveRed/10600)
@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Scalar kernel of Crossing on a fixed-layout array of floats, compiled with Numba when installed
+
+The kernel runs the whole crossing_v3 model (right turns on red, protected and permissive
+left turns, PPP, conflict speeds, risks and PSI) on the crossing features packed in the
+order of FEATURES, without dictionary lookups, and writes the results in the order of
+RESULTS. Every operation, including round(value, 3) (see round3), is written the way
+Crossing computes it, so the results are the same floats as Crossing's; verify checks this.
+With Numba the kernel is compiled on first use, otherwise it runs as plain Python.
+test_validity is not part of the kernel (see validation.check_intersection).
+
+Usage:
+    python crossing_kernel.py ./Inputs     verifies the kernel on the workbooks of a folder and times it
+"""
+# ---------------------------------------------------------------------------
+# Imports
+import argparse
+import math
+import os
+import struct
+import time
+from functools import lru_cache
+from types import FunctionType
+
+from intersection import intersection, rotate_feature_dict, transform_table
+
+# crossing features read by the kernel, in the order of the packed array
+FEATURES = (
+    'baseSaturationFlow', 'cycleTime', 'pedWalkSpeed',
+    'slipLane1', 'slipLane2', 'RTOR1', 'RTOR2', 'shoulderType1', 'shoulderType2', 'shoulderType4',
+    'laneNumber1', 'laneNumber2', 'laneNumber4',
+    'rightTurnRadius1', 'rightTurnRadius2', 'rightTurnRadius4', 'leftTurnRadius3',
+    'volume_P1', 'volume_P2', 'volume_P3', 'volume_TH1', 'volume_TH2', 'volume_TH4',
+    'volume_RT1', 'volume_RT2', 'volume_RT4', 'volume_LT3', 'leftTurnType3',
+    'leadingPedInterval1', 'leadingPedInterval2', 'walkInterval1', 'walkInterval2',
+    'flashingDontWalkInterval1', 'flashingDontWalkInterval2', 'effectiveRed1', 'effectiveRed2',
+    'effectiveGreenPermissive1', 'effectiveGreenPermissive3',
+    'effectiveGreenProtectedRightTurn1', 'effectiveGreenProtectedLeftTurn3',
+    'width_a2', 'width_b2', 'width_c2', 'width_d2',
+    )
+INDEX = {name: i for i, name in enumerate(FEATURES)}
+# results of the kernel: five areas of each of PCV, PPP, CS, DR and SIR, then PSI_death and PSI_injury
+RESULTS = ('PCV', 'PPP', 'CS', 'DR', 'SIR')
+RESULT_SIZE = 5 * len(RESULTS) + 2
+
+# leftTurnType3 codes, the same as crossing_batch
+PERMISSIVE = 0
+PROTECTED = 1
+PROTECTED_PERMISSIVE = 2
+LEFT_TURN_CODES = {'permissive': PERMISSIVE, 'protected': PROTECTED}
+
+# intersection feature read for each entry of FEATURES by crossing 1..4 (crossing 2 reads its own)
+SOURCES = {cross_num: [name[:-1] + str(transform_table[cross_num][int(name[-1])]) if name[-1].isdigit() else name
+                       for name in FEATURES]
+           for cross_num in (1, 2, 3, 4)}
+_LEFT_TURN = INDEX['leftTurnType3']
+
+# functions the kernel calls, compiled along with it
+_HELPERS = ('round3', '_max', '_min')
+
+_kernels = {}
+
+
+def pack(feature_dict, cross_num=2, out=None):
+    """Packs the features of a crossing into the layout of FEATURES
+
+    Args:
+        feature_dict: A SummaryInput feature_dict of an intersection, or a crossing
+            feature_dict (see intersection.rotate_feature_dict) with the default cross_num
+        cross_num: Crossing (1..4) of the intersection to pack; crossing 2 reads the
+            intersection features as they are
+        out: Optional list or float64 array of len(FEATURES) to fill
+
+    Returns:
+        out, or a new list of floats
+
+    """
+    if out is None:
+        out = [0.0] * len(FEATURES)
+    for i, source in enumerate(SOURCES[cross_num]):
+        if i == _LEFT_TURN:
+            out[i] = LEFT_TURN_CODES.get(feature_dict[source], PROTECTED_PERMISSIVE)
+        else:
+            out[i] = float(feature_dict[source])
+    return out
+
+
+def check(features):
+    """Tells whether Crossing.test_validity accepts the crossing of packed features (the kernel does not check)"""
+    lanes = features[INDEX['laneNumber1']]
+    shoulder = features[INDEX['shoulderType1']]
+    slip = features[INDEX['slipLane1']]
+    if lanes == 1 and (shoulder == 1 or (shoulder == 2 and slip == 0)):
+        return False
+    if lanes >= 2 and shoulder == 2 and slip == 0:
+        return False
+    return not (slip == 1 and shoulder != 2)
+
+
+def kernel(compiled=True):
+    """Returns the kernel function kernel(features, out), compiled when Numba is installed and compiled is True
+
+    The compiled kernel takes float64 arrays, the Python one also takes lists.
+    """
+    compiled = compiled and _numba() is not None
+    if compiled not in _kernels:
+        _kernels[compiled] = _compile() if compiled else _crossing
+    return _kernels[compiled]
+
+
+def is_compiled():
+    """Tells whether kernel() returns a compiled kernel"""
+    return _numba() is not None
+
+
+def evaluate(features, out=None, compiled=True):
+    """Runs the kernel on packed crossing features and returns the RESULT_SIZE results"""
+    function = kernel(compiled)
+    if function is not _crossing:
+        import numpy as np
+        features = np.asarray(features, dtype=np.float64)
+        if out is None:
+            out = np.empty(RESULT_SIZE)
+    elif out is None:
+        out = [0.0] * RESULT_SIZE
+    return function(features, out)
+
+
+def evaluate_crossing(feature_dict, cross_num=2, compiled=True):
+    """Computes one crossing like Crossing(feature_dict)
+
+    Returns:
+        A dictionary with the lists 'PCV', 'PPP', 'CS', 'DR' and 'SIR' of the five areas and
+        the floats 'PSI_death' and 'PSI_injury' of the crossing
+
+    """
+    return _unpack(list(evaluate(pack(feature_dict, cross_num), compiled=compiled)))
+
+
+def evaluate_intersection(feature_dict, compiled=True):
+    """Computes the four crossings of an intersection like intersection(feature_df)
+
+    Returns:
+        A dictionary with the lists 'PCV', 'PSI_death' and 'PSI_injury' of the four crossings
+        and 'crossings', the results of each crossing (see evaluate_crossing)
+
+    """
+    crossings = [evaluate_crossing(feature_dict, cross_num, compiled) for cross_num in (1, 2, 3, 4)]
+    return {'PCV': [round3(sum(c['PCV'])) for c in crossings],
+            'PSI_death': [round3(c['PSI_death']) for c in crossings],
+            'PSI_injury': [round3(c['PSI_injury']) for c in crossings],
+            'crossings': crossings}
+
+
+def verify(feature_dicts, compiled=True):
+    """Compares the kernel with Crossing bit for bit on every crossing of intersections
+
+    Intersections on which intersection raises (invalid ones) are skipped.
+
+    Args:
+        feature_dicts: SummaryInput feature_dicts of intersections
+        compiled: Verify the compiled kernel (when Numba is installed) or the Python one
+
+    Returns:
+        A tuple (checked, mismatches) of the number of intersections compared and a list of
+        (intersection index, crossing, result, kernel value, Crossing value)
+
+    """
+    checked = 0
+    mismatches = []
+    for i, feature_dict in enumerate(feature_dicts):
+        try:
+            reference = intersection(_to_df(feature_dict))
+        except Exception:
+            continue
+        checked += 1
+        res = evaluate_intersection(feature_dict, compiled)
+        for cross_num, crossing in enumerate([reference.crossing1, reference.crossing2,
+                                              reference.crossing3, reference.crossing4], 1):
+            for name in RESULTS + ('PSI_death', 'PSI_injury'):
+                if _bits(res['crossings'][cross_num - 1][name]) != _bits(getattr(crossing, name)):
+                    mismatches.append((i, cross_num, name, res['crossings'][cross_num - 1][name], getattr(crossing, name)))
+        for name in ['PCV', 'PSI_death', 'PSI_injury']:
+            if _bits(res[name]) != _bits(getattr(reference, name)):
+                mismatches.append((i, None, name, res[name], getattr(reference, name)))
+    return checked, mismatches
+
+
+def round3(value):
+    """Rounds like the builtin round(value, 3) using float arithmetic only
+
+    value * 1000 is rounded to an integer, half to even, on its exact value (the rounding
+    error of the product is recovered with Dekker's product), and the integer divided by
+    1000 is the float closest to the rounded decimal, which is what round returns.
+    """
+    a = abs(value)
+    y = a * 1000.0
+    if not y < 9007199254740992.0:
+        # 2 ** 53: value has no digits beyond the third decimal (also inf and nan)
+        return value
+    t = a * 134217729.0
+    hi = t - (t - a)
+    lo = a - hi
+    error = (hi * 1000.0 - y) + lo * 1000.0
+    n = math.floor(y)
+    d = (y - n - 0.5) + error
+    if d > 0.0 or (d == 0.0 and n % 2.0 == 1.0):
+        n += 1.0
+    return math.copysign(n / 1000.0, value)
+
+
+def _max(a, b):
+    # the builtin max(a, b)
+    return b if b > a else a
+
+
+def _min(a, b):
+    # the builtin min(a, b)
+    return b if b < a else a
+
+
+def _crossing(x, out):
+    """The kernel: Crossing's sub-models on the packed features x, results written to out"""
+    S_base = x[0]
+    c = x[1]
+    W = x[2]
+    slipLane1 = x[3]
+    slipLane2 = x[4]
+    RTOR1 = x[5]
+    RTOR2 = x[6]
+    shoulderType1 = x[7]
+    shoulderType2 = x[8]
+    shoulderType4 = x[9]
+    laneNumber1 = x[10]
+    laneNumber2 = x[11]
+    laneNumber4 = x[12]
+    rightTurnRadius1 = x[13]
+    rightTurnRadius2 = x[14]
+    rightTurnRadius4 = x[15]
+    leftTurnRadius3 = x[16]
+    volume_P1 = x[17]
+    volume_P2 = x[18]
+    volume_P3 = x[19]
+    volume_TH1 = x[20]
+    volume_TH2 = x[21]
+    volume_TH4 = x[22]
+    volume_RT1 = x[23]
+    volume_RT2 = x[24]
+    volume_RT4 = x[25]
+    volume_LT3 = x[26]
+    leftTurnType3 = x[27]
+    leadingPedInterval1 = x[28]
+    leadingPedInterval2 = x[29]
+    walkInterval1 = x[30]
+    walkInterval2 = x[31]
+    flashingDontWalkInterval1 = x[32]
+    flashingDontWalkInterval2 = x[33]
+    effectiveRed1 = x[34]
+    effectiveRed2 = x[35]
+    effectiveGreenPermissive1 = x[36]
+    effectiveGreenPermissive3 = x[37]
+    effectiveGreenProtectedRightTurn1 = x[38]
+    effectiveGreenProtectedLeftTurn3 = x[39]
+    width_a2 = x[40]
+    width_b2 = x[41]
+    width_c2 = x[42]
+    width_d2 = x[43]
+
+    ### PCV_RT1_a and PCV_RT1_c
+    if slipLane1 != 0.0:
+        PCV_RT1_a = 0.0
+        PCV_RT1_c = volume_RT1
+    else:
+        PCV_RT1_c = 0.0
+        if RTOR1 == 0.0 or shoulderType1 == 2.0:
+            RT1_rtor = 0.0
+        else:
+            LPI = leadingPedInterval2
+            W_plus_FDW = walkInterval2 + flashingDontWalkInterval2
+            V_P1 = volume_P1
+            V_P1 = V_P1*c/3600 if LPI == 0.0 else _max(0.0, V_P1*c/3600 - V_P1 * (c - W_plus_FDW)/3600)
+            V_P1 = V_P1*3600/c
+            q_prime_ped = V_P1 * c / (W_plus_FDW - LPI)
+            F_Rped = _max(0.49 - q_prime_ped/10645, 0.0) if q_prime_ped >= 200 else 1.0
+            F_radius = _max(0.5 + rightTurnRadius4/30, 0.0) if rightTurnRadius4 < 15 else 1.0
+            S_R = S_base * _min(F_Rped, F_radius)
+            K_R = S_base/S_R if shoulderType4 == 0.0 else 0.0
+            q_prime = volume_TH4 + volume_RT4 * K_R
+            q_m1 = _max(0.0, q_prime/laneNumber4 - volume_RT4*K_R) if shoulderType4 == 0.0 else q_prime/laneNumber4
+            q_mR = volume_RT4 if shoulderType4 == 0.0 else 0.0
+            q_prime_m1 = q_mR * c / effectiveRed1
+            q_prime_mR = q_m1 * c / effectiveRed1
+            q_prime_m = q_prime_mR/2 + q_prime_m1
+            q_rtor = 850 - 0.35 * q_prime_m
+
+            tw1 = 5.25/W
+            f_Pb = _min(1.0, tw1*volume_P1/3600)
+            P_b = 1 - f_Pb
+            C_rtor_exc = P_b * q_rtor * effectiveRed1 / c
+
+            if shoulderType1 == 1.0:
+                C_rtor = C_rtor_exc
+            else:
+                LPI = leadingPedInterval1
+                W_plus_FDW = walkInterval1 + flashingDontWalkInterval1
+                V_P2 = volume_P2
+                V_P2 = V_P2*c/3600 if LPI == 0.0 else _max(0.0, V_P2*c/3600 - V_P2*(c - W_plus_FDW)/3600)
+                V_P2 = V_P2*3600/c
+                q_prime_ped = V_P2 * c / (W_plus_FDW - LPI)
+                F_Rped = _max(0.49 - q_prime_ped/10645, 0.0) if q_prime_ped >= 200 else 1.0
+                F_radius = _max(0.5 + rightTurnRadius1/30, 0.0) if rightTurnRadius1 < 15 else 1.0
+                S_R = S_base * _min(F_Rped, F_radius)
+                K_R = S_base/S_R if shoulderType1 == 0.0 else 0.0
+                q_prime = volume_TH1 + volume_RT1 * K_R
+                V_R = volume_RT1
+                V_T = _max(0.0, q_prime/laneNumber1 - volume_RT1*K_R) if shoulderType1 == 0.0 else q_prime/laneNumber1
+                P_R = V_R / (V_R + V_T)
+                f_hat = P_R * P_R ** (q_rtor*effectiveRed1/10600)
+                C_rtor = C_rtor_exc * f_hat
+
+            q_rtor_arrival = volume_RT1 * effectiveRed1 / c
+            RT1_rtor = _min(C_rtor, q_rtor_arrival)
+
+        if effectiveGreenProtectedRightTurn1 == 0.0:
+            RT1_protected = 0.0
+        else:
+            q_arrive_g_protect = volume_RT1 * effectiveGreenProtectedRightTurn1 / c
+            q_arrive_ROR = volume_RT1 * effectiveRed1 / c
+            q_arrive_protect = q_arrive_g_protect + q_arrive_ROR - RT1_rtor
+            F_radius = _max(0.5 + rightTurnRadius1/30, 0.0) if rightTurnRadius1 < 15 else 1.0
+            C_protected = S_base * F_radius * effectiveGreenProtectedRightTurn1 / c
+            RT1_protected = _min(C_protected, q_arrive_protect)
+
+        PCV_RT1_a = _max(volume_RT1 - RT1_rtor - RT1_protected, 0.0)
+        PCV_RT1_a = PCV_RT1_a * _min(1.0, (walkInterval1 + flashingDontWalkInterval1)/effectiveGreenPermissive1)
+
+    ### PCV_RT2_b and PCV_RT2_d
+    if slipLane2 != 0.0:
+        PCV_RT2_b = 0.0
+        PCV_RT2_d = volume_RT2
+    elif RTOR2 == 0.0:
+        PCV_RT2_b = 0.0
+        PCV_RT2_d = 0.0
+    else:
+        PCV_RT2_d = 0.0
+        LPI = leadingPedInterval1
+        W_plus_FDW = walkInterval1 + flashingDontWalkInterval1
+        V_P2 = volume_P2
+        V_P2 = V_P2*c/3600 if LPI == 0.0 else _max(0.0, V_P2*c/3600 - V_P2*(c - W_plus_FDW)/3600)
+        V_P2 = V_P2*3600/c
+        q_prime_ped = V_P2 * c / (W_plus_FDW - LPI)
+        F_Rped = _max(0.49 - q_prime_ped/10645.0, 0.0) if q_prime_ped > 200 else 1.0
+        F_radius = _max(0.5 + rightTurnRadius1/30, 0.0) if rightTurnRadius1 < 15 else 1.0
+        S_R = S_base * _min(F_Rped, F_radius)
+        K_R = S_base/S_R if shoulderType1 == 0.0 else 0.0
+        q_prime = volume_TH1 + volume_RT1 * K_R
+        V_R = volume_RT1 if shoulderType1 == 0.0 else 0.0
+        V_T = _max(0.0, q_prime/laneNumber1 - volume_RT1*K_R) if shoulderType1 == 0.0 else q_prime/laneNumber1
+        q_prime_m1 = V_T * c / effectiveRed2
+        q_prime_mR = V_R * c / effectiveRed2
+        q_prime_m = q_prime_mR/2 + q_prime_m1
+        q_rtor = 850 - 0.35 * q_prime_m
+
+        tw2 = 5.25/W
+        f_Pb = _min(1.0, tw2*volume_P2/3600)
+        P_b = 1 - f_Pb
+        C_rtor_exc = P_b * q_rtor * effectiveRed2 / c
+
+        if shoulderType2 == 1.0:
+            C_rtor = C_rtor_exc
+        else:
+            LPI = leadingPedInterval2
+            W_plus_FDW = walkInterval2 + flashingDontWalkInterval2
+            V_P3 = volume_P3
+            V_P3 = V_P3*c/3600 if LPI == 0.0 else _max(0.0, V_P3*c/3600 - V_P3*(c - W_plus_FDW)/3600)
+            V_P3 = V_P3*3600/c
+            q_prime_ped = V_P3 * c / (W_plus_FDW - LPI)
+            F_Rped = _max(0.49 - q_prime_ped/10645, 0.0) if q_prime_ped >= 200 else 1.0
+            F_radius = _max(0.5 + rightTurnRadius2/30, 0.0) if rightTurnRadius2 < 15 else 1.0
+            S_R = S_base * _min(F_Rped, F_radius)
+            K_R = S_base/S_R if shoulderType2 == 0.0 else 0.0
+            q_prime = volume_TH2 + volume_RT2 * K_R
+            V_R = volume_RT2
+            V_T = _max(0.0, q_prime/laneNumber2 - volume_RT2*K_R) if shoulderType2 == 0.0 else q_prime/laneNumber2
+            P_R = V_R / (V_R + V_T)
+            f_hat = P_R * P_R ** (q_rtor*effectiveRed2/10600)
+            C_rtor = C_rtor_exc * f_hat
+
+        q_rtor_arrival = volume_RT2 * effectiveRed2 / c
+        RT2_rtor = _min(C_rtor, q_rtor_arrival)
+        PCV_RT2_b = RT2_rtor * _min(1.0, (walkInterval1 + flashingDontWalkInterval1)/effectiveRed2)
+
+    ### PCV_LT3_a
+    if leftTurnType3 == PERMISSIVE:
+        PCV_LT3_a = volume_LT3 * (walkInterval1 + flashingDontWalkInterval1)/effectiveGreenPermissive3
+    elif leftTurnType3 == PROTECTED:
+        PCV_LT3_a = 0.0
+    else:
+        max_discharged_protected = S_base * effectiveGreenProtectedLeftTurn3/3600
+        re = c - effectiveGreenProtectedLeftTurn3 - effectiveGreenPermissive3
+        wating_veh = volume_LT3 * re / 3600
+        served_veh_protected = _min(wating_veh, max_discharged_protected) * 3600 / c
+        served_veh_permissive = volume_LT3 - served_veh_protected
+        PCV_LT3_a = served_veh_permissive * _min(1.0, (walkInterval1 + flashingDontWalkInterval1)/effectiveGreenPermissive3)
+
+    out[0] = round3(PCV_RT1_a)
+    out[1] = round3(PCV_RT1_c)
+    out[2] = round3(PCV_RT2_b)
+    out[3] = round3(PCV_RT2_d)
+    out[4] = round3(PCV_LT3_a)
+
+    ### PPP
+    tw_a = width_a2/W
+    tw_b = width_b2/W
+    tw_c = width_c2/W
+    tw_d = width_d2/W
+    effectivePedVolume_ab = volume_P2 * c / (walkInterval1 + flashingDontWalkInterval1 - leadingPedInterval1)
+    pedHeadway_ab = 3600 / effectivePedVolume_ab
+    pedHeadway_cd = 3600 / volume_P2
+    out[5] = round3(1 - math.exp(-tw_a/pedHeadway_ab))
+    out[6] = round3(1 - math.exp(-tw_c/pedHeadway_cd) if slipLane1 != 0.0 else 0.0)
+    out[7] = round3(1 - math.exp(-tw_b/pedHeadway_ab))
+    out[8] = round3(1 - math.exp(-tw_d/pedHeadway_cd) if slipLane2 != 0.0 else 0.0)
+    out[9] = round3(1 - math.exp(-tw_a/pedHeadway_ab))
+
+    ### CS, with the right turn model coefficients of Crossing.getConflictSpeed
+    o = 2.465682
+    a, Iy = 0.0471218, 0
+    b, ITk = -0.1428277, 0
+    cc = 0.0035318
+    d = -0.1375053
+    e, IThru = 0.8183215, 0
+    f = 0.032
+    g = 0.0076864
+    z = 1.0364
+    rRT2 = rightTurnRadius2 * 3.28
+    if out[3] != 0.0:
+        tH = 3600 / out[3]
+        CS_RT2_d = math.exp(o + a*Iy + b*ITk + cc*rRT2 + (d + e*IThru + f*rRT2 + g*rRT2*IThru)/tH**2 + z*0.19)
+    else:
+        CS_RT2_d = 0.0
+    rRT1 = rightTurnRadius1 * 3.28
+    if volume_RT1 != 0.0:
+        tH = 3600 / volume_RT1
+        CS_RT1_a = math.exp(o + a*Iy + b*ITk + cc*rRT1 + (d + e*IThru + f*rRT1 + g*rRT1*IThru)/tH**2 + z*0.19)
+    else:
+        CS_RT1_a = 0.0
+    if out[1] != 0.0:
+        tH = 3600 / out[1]
+        CS_RT1_c = math.exp(o + a*Iy + b*ITk + cc*rRT1 + (d + e*IThru + f*rRT1 + g*rRT1*IThru)/tH**2 + z*0.19)
+    else:
+        CS_RT1_c = 0.0
+    CS_LT3_a = 1.38 * math.sqrt(127 * leftTurnRadius3 * 0.16)
+    out[10] = round3(CS_RT1_a)
+    out[11] = round3(CS_RT1_c)
+    out[12] = round3(8.0)
+    out[13] = round3(CS_RT2_d)
+    out[14] = round3(CS_LT3_a)
+
+    ### DR and SIR
+    for k in range(5):
+        s = out[10 + k]
+        out[15 + k] = round3(1-math.exp(-6E-07*(s**3.35)))
+        out[20 + k] = round3(1-math.exp(-1.7E-06*(s**3.25)))
+
+    ### PSI
+    PSI_death = 0.0
+    PSI_injury = 0.0
+    for k in range(5):
+        PSI_death += out[k]*out[5 + k]*out[15 + k]
+        PSI_injury += out[k]*out[5 + k]*out[20 + k]
+    out[25] = round3(PSI_death)
+    out[26] = round3(PSI_injury)
+    return out
+
+
+@lru_cache(maxsize=None)
+def _numba():
+    """Returns the numba module, or None when it is not installed (looked up once)"""
+    try:
+        import numba
+    except ImportError:
+        return None
+    return numba
+
+
+def _compile():
+    """Compiles _crossing and the helpers it calls with Numba"""
+    numba = _numba()
+    namespace = dict(globals())
+    for name in _HELPERS:
+        namespace[name] = numba.njit(globals()[name])
+    return numba.njit(FunctionType(_crossing.__code__, namespace, '_crossing'))
+
+
+def _unpack(results):
+    res = {name: results[5 * k:5 * k + 5] for k, name in enumerate(RESULTS)}
+    res['PSI_death'] = results[25]
+    res['PSI_injury'] = results[26]
+    return res
+
+
+def _to_df(feature_dict):
+    import pandas as pd
+    return pd.DataFrame({'feature': list(feature_dict), 'value': list(feature_dict.values())})
+
+
+def _bits(values):
+    values = values if isinstance(values, list) else [values]
+    return struct.pack('<%dd' % len(values), *[float(v) for v in values])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Verifies the crossing kernel against Crossing and times both')
+    parser.add_argument('inputs', help='folder of input workbooks')
+    parser.add_argument('--python', action='store_true', help='use the Python kernel even if Numba is installed')
+    args = parser.parse_args()
+
+    from crossing_v3 import Crossing
+    from workbook_loader import read_summary_input
+
+    compiled = not args.python
+    feature_dicts = [read_summary_input(os.path.join(args.inputs, path)) for path in sorted(os.listdir(args.inputs))]
+    checked, mismatches = verify(feature_dicts, compiled)
+    print('kernel: %s, %d of %d intersections checked, %d mismatches'
+          % ('compiled' if kernel(compiled) is not _crossing else 'python', checked, len(feature_dicts), len(mismatches)))
+    for mismatch in mismatches[:20]:
+        print('  intersection %d crossing %s %s: kernel %r, Crossing %r' % mismatch)
+
+    crossings = [rotate_feature_dict(cross_num, d) for d in feature_dicts for cross_num in (1, 2, 3, 4)]
+    packed = [pack(d) for d in crossings]
+    if compiled and kernel(compiled) is not _crossing:
+        import numpy as np
+        packed = [np.asarray(p, dtype=np.float64) for p in packed]
+    out = evaluate(packed[0], compiled=compiled)
+    function = kernel(compiled)
+    timings = {}
+    for name, call in [('Crossing', lambda: [Crossing(d) for d in crossings]),
+                       ('kernel (dict)', lambda: [evaluate_crossing(d, compiled=compiled) for d in crossings]),
+                       ('kernel (packed)', lambda: [function(p, out) for p in packed])]:
+        start = time.perf_counter()
+        repeats = 0
+        while time.perf_counter() - start < 1.0:
+            call()
+            repeats += 1
+        timings[name] = (time.perf_counter() - start) / repeats / len(crossings)
+        print('%-16s %.2f us per crossing' % (name, 1e6 * timings[name]))
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Forward-mode derivatives of the crossing results with respect to the SummaryInput features"""
+# ---------------------------------------------------------------------------
+# Imports
+import numpy as np
+import pandas as pd
+
+from crossing_batch import CrossingBatch, FLAG_FEATURES, LEFT_TURN_FEATURES, left_turn_codes
+from intersection_batch import APPROACH_FEATURES, GLOBAL_FEATURES, DIRECTIONS, rotate_columns
+
+# approach features that are categories rather than quantities have no derivative
+CATEGORICAL_FEATURES = ['slipLane', 'RTOR', 'leftTurnType', 'shoulderType']
+# SummaryInput features with a derivative, in the order of the last axis of the derivatives
+FEATURES = ([base + str(j) for base in APPROACH_FEATURES if base not in CATEGORICAL_FEATURES for j in (1, 2, 3, 4)]
+            + GLOBAL_FEATURES)
+RESULTS = ['PCV', 'PPP', 'CS', 'DR', 'SIR', 'PSI_death', 'PSI_injury']
+
+
+class Dual:
+    """represents an array of values together with their derivatives along F directions
+
+    The derivatives are stored in tangent, of shape (F, *shape) or broadcastable to it with
+    the same number of dimensions. Numpy ufuncs (arithmetic, power, exp, sqrt, log, maximum,
+    minimum, comparisons) and np.where, np.stack and np.broadcast_to accept Dual arrays and
+    apply the chain rule, so numpy code such as CrossingBatch runs unchanged on them.
+
+    Conventions at the points where the model is not differentiable:
+        maximum/minimum: on a tie the derivative is the larger/smaller of the two one-sided
+            ones, which is the exact one-sided derivative when a feature is increased
+        np.where and comparisons: the derivative is that of the branch taken at the given
+            values; the jump between branches (e.g. q'ped crossing 200 ped/h) is not included
+        derivatives multiplying an infinite or undefined partial derivative are 0 when the
+            direction does not move the input (e.g. 0 ** x at a zero right turn share)
+    """
+
+    __array_priority__ = 100
+
+    def __init__(self, value, tangent):
+        self.value = np.asarray(value, dtype=np.float64)
+        self.tangent = tangent
+
+    @property
+    def shape(self):
+        return self.value.shape
+
+    @property
+    def ndim(self):
+        return self.value.ndim
+
+    def __getitem__(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        value = self.value[key]
+        # index the tangent as it is when that gives a broadcastable result (seeds stay small)
+        try:
+            tangent = self.tangent[(slice(None),) + key]
+            np.broadcast_shapes(tangent.shape, tangent.shape[:1] + value.shape)
+            if tangent.ndim != value.ndim + 1:
+                raise ValueError
+        except (IndexError, ValueError):
+            tangent = np.broadcast_to(self.tangent, self.tangent.shape[:1] + self.value.shape)[(slice(None),) + key]
+        return Dual(value, tangent)
+
+    def __repr__(self):
+        return 'Dual(%r, tangent shape %s)' % (self.value, self.tangent.shape)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != '__call__' or kwargs or ufunc not in _UFUNCS:
+            return NotImplemented
+        values = [x.value if isinstance(x, Dual) else np.asarray(x) for x in inputs]
+        res = ufunc(*values)
+        if ufunc in _COMPARISONS:
+            return res
+        tangents = [_lift(x, res.ndim) for x in inputs]
+        return Dual(res, _UFUNCS[ufunc](res, values, tangents))
+
+    def __array_function__(self, func, types, args, kwargs):
+        if func not in _FUNCTIONS:
+            return NotImplemented
+        return _FUNCTIONS[func](*args, **kwargs)
+
+    def __add__(self, other):
+        return np.add(self, other)
+
+    def __radd__(self, other):
+        return np.add(other, self)
+
+    def __sub__(self, other):
+        return np.subtract(self, other)
+
+    def __rsub__(self, other):
+        return np.subtract(other, self)
+
+    def __mul__(self, other):
+        return np.multiply(self, other)
+
+    def __rmul__(self, other):
+        return np.multiply(other, self)
+
+    def __truediv__(self, other):
+        return np.true_divide(self, other)
+
+    def __rtruediv__(self, other):
+        return np.true_divide(other, self)
+
+    def __pow__(self, other):
+        return np.power(self, other)
+
+    def __rpow__(self, other):
+        return np.power(other, self)
+
+    def __neg__(self):
+        return np.negative(self)
+
+    def __eq__(self, other):
+        return np.equal(self, other)
+
+    def __ne__(self, other):
+        return np.not_equal(self, other)
+
+    def __lt__(self, other):
+        return np.less(self, other)
+
+    def __le__(self, other):
+        return np.less_equal(self, other)
+
+    def __gt__(self, other):
+        return np.greater(self, other)
+
+    def __ge__(self, other):
+        return np.greater_equal(self, other)
+
+    __hash__ = None
+
+
+def _lift(x, ndim):
+    """Returns the tangent of x with ndim value dimensions (None for constants)"""
+    if not isinstance(x, Dual):
+        return None
+    t = x.tangent
+    missing = ndim + 1 - t.ndim
+    return t.reshape(t.shape[:1] + (1,) * missing + t.shape[1:]) if missing > 0 else t
+
+
+def _scale(coefficient, t):
+    """coefficient * t, with 0 wherever t is 0 even if coefficient is infinite or undefined"""
+    if t is None:
+        return None
+    with np.errstate(invalid='ignore', over='ignore'):
+        return np.where(t == 0, 0.0, coefficient * t)
+
+
+def _sum(*terms):
+    terms = [t for t in terms if t is not None]
+    res = terms[0]
+    for t in terms[1:]:
+        res = res + t
+    return res
+
+
+def _negate(t):
+    return None if t is None else -t
+
+
+def _power(res, values, tangents):
+    a, b = values
+    ta, tb = tangents
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        return _sum(_scale(b * a ** (b - 1), ta), _scale(res * np.log(a), tb) if tb is not None else None)
+
+
+def _select(compare, res, values, tangents):
+    a, b = values
+    ta, tb = [np.zeros((1,) * (res.ndim + 1)) if t is None else t for t in tangents]
+    # on a tie the one-sided derivative along each direction is the max (min) of both
+    return np.where(a == b, compare(ta, tb), np.where(res == a, ta, tb))
+
+
+_COMPARISONS = {np.equal, np.not_equal, np.less, np.less_equal, np.greater, np.greater_equal}
+_UFUNCS = {
+    np.add: lambda res, v, t: _sum(*t),
+    np.subtract: lambda res, v, t: _sum(t[0], _negate(t[1])),
+    np.multiply: lambda res, v, t: _sum(_scale(v[1], t[0]), _scale(v[0], t[1])),
+    np.true_divide: lambda res, v, t: _sum(_scale(1 / v[1], t[0]), _scale(-res / v[1], t[1])),
+    np.power: _power,
+    np.negative: lambda res, v, t: -t[0],
+    np.exp: lambda res, v, t: _scale(res, t[0]),
+    np.sqrt: lambda res, v, t: _scale(0.5 / res, t[0]),
+    np.log: lambda res, v, t: _scale(1 / v[0], t[0]),
+    np.log1p: lambda res, v, t: _scale(1 / (1 + v[0]), t[0]),
+    np.maximum: lambda res, v, t: _select(np.maximum, res, v, t),
+    np.minimum: lambda res, v, t: _select(np.minimum, res, v, t),
+    }
+_UFUNCS.update({ufunc: None for ufunc in _COMPARISONS})
+
+
+def _where(condition, x, y):
+    condition = np.asarray(condition)
+    xv = x.value if isinstance(x, Dual) else x
+    yv = y.value if isinstance(y, Dual) else y
+    res = np.where(condition, xv, yv)
+    tx, ty = [np.zeros((1,) * (res.ndim + 1)) if t is None else t for t in (_lift(x, res.ndim), _lift(y, res.ndim))]
+    return Dual(res, np.where(condition, tx, ty))
+
+
+def _broadcast_to(x, shape):
+    t = np.broadcast_to(_lift(x, len(shape)), _lift(x, len(shape)).shape[:1] + tuple(shape))
+    return Dual(np.broadcast_to(x.value, shape), t)
+
+
+def _stack(arrays, axis=0):
+    arrays = list(arrays)
+    res = np.stack([x.value if isinstance(x, Dual) else np.asarray(x, dtype=np.float64) for x in arrays], axis=axis)
+    ndim = res.ndim - 1
+    F = max(x.tangent.shape[0] for x in arrays if isinstance(x, Dual))
+    tangents = [np.broadcast_to(_lift(x, ndim) if isinstance(x, Dual) else np.zeros((1,) * (ndim + 1)),
+                                (F,) + np.shape(x.value if isinstance(x, Dual) else x))
+                for x in arrays]
+    return Dual(res, np.stack(tangents, axis=axis if axis < 0 else axis + 1))
+
+
+_FUNCTIONS = {np.where: _where, np.broadcast_to: _broadcast_to, np.stack: _stack}
+
+
+class IntersectionJacobian:
+    """represents N 4-legged intersections with the derivatives of their results
+
+    All results and their derivatives with respect to every SummaryInput feature of FEATURES
+    are computed in one pass of CrossingBatch on Dual columns: each feature is seeded with a
+    unit derivative and the rotation of the intersection for each crossing carries it to the
+    crossing features that read it. Results are unrounded (CrossingBatch with rounding=False).
+
+
+    Attributes:
+        ids List: Identifier of each intersection
+        features List[str]: The F features, order of the last axis of the derivatives
+        PCV, PPP, CS, DR, SIR np.ndarray[N, 4, 5]: Results of each crossing and area
+        PSI_death, PSI_injury np.ndarray[N, 4]: Pedestrian safety index of each crossing
+        dPCV, dPPP, dCS, dDR, dSIR np.ndarray[N, 4, 5, F]: Derivatives of the results
+        dPSI_death, dPSI_injury np.ndarray[N, 4, F]: Derivatives of the pedestrian safety indices
+    """
+
+    def __init__(self, approach_features, global_features, ids=None, features=FEATURES):
+        self.features = list(features)
+        unknown = set(self.features) - set(FEATURES)
+        if unknown:
+            raise Exception('Error: no derivative with respect to ' + str(sorted(unknown)))
+        position = {name: f for f, name in enumerate(self.features)}
+        F = len(self.features)
+
+        approach = {}
+        for base in APPROACH_FEATURES:
+            values = np.asarray(approach_features[base])
+            if base + '1' in FLAG_FEATURES:
+                approach[base] = values.astype(bool)
+            elif base + '1' in LEFT_TURN_FEATURES:
+                approach[base] = left_turn_codes(values)
+            elif base == 'shoulderType':
+                approach[base] = values.astype(np.float64)
+            else:
+                tangent = np.zeros((F, 1, 4))
+                for j in range(4):
+                    if base + str(j + 1) in position:
+                        tangent[position[base + str(j + 1)], 0, j] = 1
+                approach[base] = Dual(values, tangent)
+        globals_ = {}
+        for key in GLOBAL_FEATURES:
+            values = np.asarray(global_features[key], dtype=np.float64)
+            tangent = np.zeros((F,) + (1,) * values.ndim)
+            if key in position:
+                tangent[position[key]] = 1
+            globals_[key] = Dual(values, tangent)
+
+        size = np.broadcast_shapes((1,), *[v.shape[:-1] for v in approach.values()],
+                                   *[v.shape for v in globals_.values()])[0]
+        self.ids = list(ids) if ids is not None else list(range(size))
+        crossings = CrossingBatch.from_columns(rotate_columns(approach, globals_), rounding=False)
+        for name in RESULTS:
+            res = getattr(crossings, name)
+            if not isinstance(res, Dual):
+                res = Dual(res, np.zeros((F,) + (1,) * np.ndim(res)))
+            shape = (size, 4) + res.shape[2:]
+            setattr(self, name, np.broadcast_to(res.value, shape))
+            tangent = np.broadcast_to(res.tangent, (F,) + shape)
+            setattr(self, 'd' + name, np.moveaxis(tangent, 0, -1))
+
+    @classmethod
+    def from_feature_dicts(cls, feature_dicts, ids=None, features=FEATURES):
+        """Builds the derivatives from one SummaryInput feature_dict per intersection (see intersection.df_to_dict)"""
+        approach_features = {base: [[d[base + str(j)] for j in (1, 2, 3, 4)] for d in feature_dicts]
+                             for base in APPROACH_FEATURES}
+        global_features = {key: [d[key] for d in feature_dicts] for key in GLOBAL_FEATURES}
+        return cls(approach_features, global_features, ids, features)
+
+    @classmethod
+    def from_table(cls, table, features=FEATURES):
+        """Builds the derivatives from a feature table with one row per intersection (see workbook_loader.read_feature_table)"""
+        approach_features = {base: table[[base + str(j) for j in (1, 2, 3, 4)]].to_numpy()
+                             for base in APPROACH_FEATURES}
+        global_features = {key: table[key].to_numpy() for key in GLOBAL_FEATURES}
+        return cls(approach_features, global_features, table.index, features)
+
+    def frame(self, name='PSI_injury', i=0):
+        """Returns the derivatives of a PSI of intersection i as a DataFrame with a row per crossing and a column per feature"""
+        return pd.DataFrame(getattr(self, 'd' + name)[i], index=DIRECTIONS, columns=self.features)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Incremental recomputation of an intersection after what-if edits of its features"""
+# ---------------------------------------------------------------------------
+# Imports
+from intersection import intersection
+
+# quantities of a crossing in the order they are computed
+NODES = ['PCV', 'PPP', 'CS', 'DR', 'SIR', 'PSI_death', 'PSI_injury']
+# quantities each quantity is computed from (besides the features it reads)
+NODE_DEPENDENCIES = {
+    'PCV': [],
+    'PPP': [],
+    'CS': ['PCV'],
+    'DR': ['CS'],
+    'SIR': ['CS'],
+    'PSI_death': ['PCV', 'PPP', 'DR'],
+    'PSI_injury': ['PCV', 'PPP', 'SIR'],
+}
+
+
+class _RecordingDict(dict):
+    """A feature_dict that records the keys read from it"""
+
+    def __getitem__(self, key):
+        self.reads.add(key)
+        return dict.__getitem__(self, key)
+
+
+class IncrementalIntersection(intersection):
+    """represents a 4-legged intersection that can be edited feature by feature
+
+    Every quantity of every crossing remembers the features it read the last time it was
+    computed (the branch taken decides which ones, e.g. the RTOR capacity is only read when
+    RTOR is permitted). An edit only recomputes the quantities that read a changed feature,
+    and the quantities downstream of them whose inputs actually changed value, using the
+    methods of Crossing so the results are the same as building a new intersection.
+
+
+    Attributes:
+        feature_dict dict: The current SummaryInput features of the intersection
+        crossing1, crossing2, crossing3, crossing4: classes of each crossing
+        PCV, PSI_death, PSI_injury List[float]: Same as intersection
+    """
+
+    def __init__(self, feature_df):
+        # the crossings are built here instead of by intersection.__init__, so every quantity
+        # is computed once while recording the features it reads
+        from crossing_v3 import Crossing
+
+        self.feature_dict = self.df_to_dict(feature_df)
+        self.crossings = [Crossing.__new__(Crossing) for _ in range(4)]
+        self.crossing1, self.crossing2, self.crossing3, self.crossing4 = self.crossings
+        self._feature_dicts = []
+        self._reads = []
+        # _users[k][feature]: crossing features of crossing k+1 read from an intersection feature
+        self._users = []
+        for cross_num, cross in enumerate(self.crossings, start=1):
+            sources = self.adjust_feature_dict(cross_num, {key: key for key in self.feature_dict})
+            users = {}
+            for local, source in sources.items():
+                users.setdefault(source, []).append(local)
+            self._users.append(users)
+            self._feature_dicts.append(_RecordingDict(self.adjust_feature_dict(cross_num, self.feature_dict)))
+            self._reads.append({})
+            for node in ['validity'] + NODES:
+                self._compute(cross_num - 1, node)
+        self.PCV = [round(sum(cross.PCV), 3) for cross in self.crossings]
+        self.PSI_death = [round(cross.PSI_death, 3) for cross in self.crossings]
+        self.PSI_injury = [round(cross.PSI_injury, 3) for cross in self.crossings]
+
+    def update(self, changes):
+        """Changes some features and recomputes what depends on them
+
+        The update is atomic: if a crossing raises on the new values (e.g. a division by zero
+        the validity check does not catch), the features and results are restored as they were
+        before the update and the exception is raised.
+
+        Args:
+            changes: A dictionary of SummaryInput feature names to their new values
+
+        Returns:
+            A list of (crossing number, quantity) that were recomputed
+
+        """
+        for key in changes:
+            if key not in self.feature_dict:
+                raise KeyError(key)
+
+        # find the crossing features each crossing reads from the changed features
+        local_changes = []
+        for k in range(4):
+            local = {}
+            for key, value in changes.items():
+                for local_key in self._users[k].get(key, []):
+                    local[local_key] = value
+            local_changes.append(local)
+            # check the new values before changing anything
+            if local.keys() & self._reads[k]['validity']:
+                self.crossings[k].test_validity({**self._feature_dicts[k], **local})
+
+        snapshot = self._snapshot()
+        try:
+            return self._apply(changes, local_changes)
+        except Exception:
+            self._restore(snapshot)
+            raise
+
+    def _apply(self, changes, local_changes):
+        self.feature_dict.update(changes)
+        recomputed = []
+        for k, local in enumerate(local_changes):
+            changed = {key for key, value in local.items() if dict.__getitem__(self._feature_dicts[k], key) != value}
+            dict.update(self._feature_dicts[k], local)
+            if not changed:
+                continue
+            if changed & self._reads[k]['validity']:
+                self._compute(k, 'validity')
+            dirty = set()
+            for node in NODES:
+                if changed & self._reads[k][node] or dirty.intersection(NODE_DEPENDENCIES[node]):
+                    old = getattr(self.crossings[k], node)
+                    self._compute(k, node)
+                    recomputed.append((k + 1, node))
+                    if getattr(self.crossings[k], node) != old:
+                        dirty.add(node)
+            if dirty:
+                cross = self.crossings[k]
+                self.PCV[k] = round(sum(cross.PCV), 3)
+                self.PSI_death[k] = round(cross.PSI_death, 3)
+                self.PSI_injury[k] = round(cross.PSI_injury, 3)
+        return recomputed
+
+    def _snapshot(self):
+        """Returns what an update can change (the quantities are replaced, never changed in place)"""
+        return (dict(self.feature_dict), [dict(d) for d in self._feature_dicts], [dict(r) for r in self._reads],
+                [dict(vars(cross)) for cross in self.crossings], list(self.PCV), list(self.PSI_death), list(self.PSI_injury))
+
+    def _restore(self, snapshot):
+        feature_dict, feature_dicts, reads, crossings, self.PCV[:], self.PSI_death[:], self.PSI_injury[:] = snapshot
+        self.feature_dict.clear()
+        self.feature_dict.update(feature_dict)
+        for k in range(4):
+            dict.clear(self._feature_dicts[k])
+            dict.update(self._feature_dicts[k], feature_dicts[k])
+            self._reads[k] = reads[k]
+            vars(self.crossings[k]).clear()
+            vars(self.crossings[k]).update(crossings[k])
+
+    def _compute(self, k, node):
+        """Computes one quantity of crossing k+1 and records the features it read"""
+        cross = self.crossings[k]
+        feature_dict = self._feature_dicts[k]
+        feature_dict.reads = set()
+        if node == 'validity':
+            cross.test_validity(feature_dict)
+        elif node == 'PCV':
+            cross.PCV = cross.getPotentialConflictVolume(feature_dict)
+        elif node == 'PPP':
+            cross.PPP = cross.getPresentPedestrianProbability(feature_dict)
+        elif node == 'CS':
+            cross.CS = cross.getConflictSpeed(feature_dict)
+        elif node == 'DR':
+            cross.DR = cross.getDeathRisk()
+        elif node == 'SIR':
+            cross.SIR = cross.getSevereInjuryRisk()
+        elif node == 'PSI_death':
+            cross.PSI_death = cross.getPedestrianRiskIndex('death')
+        elif node == 'PSI_injury':
+            cross.PSI_injury = cross.getPedestrianRiskIndex('injury')
+        self._reads[k][node] = feature_dict.reads
+        feature_dict.reads = set()
+
+
+def verify(feature_dicts, edits=20, seed=0):
+    """Checks random edits of every intersection against a new intersection of the edited features
+
+    Some edits set a feature to 0, which can make a crossing raise; such an update must leave
+    the intersection as it was before it.
+
+    Args:
+        feature_dicts: List of feature_dicts of intersections
+        edits: Number of updates of every intersection
+        seed: Seed of the random edits
+
+    Returns:
+        A tuple (updates, failed, mismatches): the number of updates, a Counter of the
+        exceptions the failed ones raised and a list of (intersection index, edit, attribute)
+        that differ from a new intersection
+
+    """
+    import io
+    import random
+    from collections import Counter
+    from contextlib import redirect_stdout
+    from crossing_kernel import _to_df
+
+    rng = random.Random(seed)
+    updates = 0
+    failed = Counter()
+    mismatches = []
+    for i, feature_dict in enumerate(feature_dicts):
+        inc = IncrementalIntersection(_to_df(feature_dict))
+        numeric = [key for key, value in feature_dict.items()
+                   if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        for _ in range(edits):
+            keys = rng.sample(numeric, rng.randint(1, 3))
+            changes = {key: 0 if rng.random() < 0.2 else _scale(inc.feature_dict[key], rng.uniform(0.5, 1.5))
+                       for key in keys}
+            updates += 1
+            try:
+                # Crossing.test_validity prints the features it rejects
+                with redirect_stdout(io.StringIO()):
+                    inc.update(changes)
+            except Exception as error:
+                failed[type(error).__name__] += 1
+            try:
+                fresh = intersection(_to_df(inc.feature_dict))
+            except Exception:
+                mismatches.append((i, changes, 'feature_dict'))
+                break
+            for k in range(1, 5):
+                for node in NODES:
+                    name = 'crossing%d.%s' % (k, node)
+                    if getattr(getattr(inc, 'crossing%d' % k), node) != getattr(getattr(fresh, 'crossing%d' % k), node):
+                        mismatches.append((i, changes, name))
+            for name in ['PCV', 'PSI_death', 'PSI_injury']:
+                if getattr(inc, name) != getattr(fresh, name):
+                    mismatches.append((i, changes, name))
+    return updates, failed, mismatches
+
+
+def _scale(value, factor):
+    # counts (lanes, shoulder types) stay integers
+    if isinstance(value, int):
+        return int(round(value * factor))
+    return round(value * factor, 3)
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+
+    from workbook_loader import read_summary_input
+
+    parser = argparse.ArgumentParser(description='Verifies random edits of IncrementalIntersection against intersection')
+    parser.add_argument('inputs', help='folder of input workbooks')
+    parser.add_argument('--edits', type=int, default=20, help='updates of every intersection')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random edits')
+    args = parser.parse_args()
+
+    feature_dicts = [read_summary_input(os.path.join(args.inputs, path)) for path in sorted(os.listdir(args.inputs))]
+    updates, failed, mismatches = verify(feature_dicts, args.edits, args.seed)
+    print('%d updates of %d intersections, %d raised (%s), %d mismatches'
+          % (updates, len(feature_dicts), sum(failed.values()),
+             ', '.join('%d %s' % (n, name) for name, n in failed.most_common()), len(mismatches)))
+    for mismatch in mismatches[:20]:
+        print('  intersection %d %r: %s' % mismatch)
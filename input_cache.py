@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""On-disk cache of parsed SummaryInput sheets keyed by workbook content, sheet and loader version"""
+# ---------------------------------------------------------------------------
+# Imports
+import ast
+import hashlib
+import json
+import os
+import struct
+import time
+
+from workbook_loader import LOADER_VERSION, SHEET_NAME
+
+# type codes of the values stored in an entry
+KINDS = {bool: 'b', int: 'i', float: 'f', str: 's', type(None): 'n'}
+
+
+def read_npz(path):
+    """Reads the 1-d arrays of an .npz written by np.savez as lists, without importing NumPy
+
+    Only what np.savez writes is supported: members stored without compression holding
+    float64 or unicode arrays. Returns None for anything else, which np.load can then read.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    arrays = {}
+    pos = 0
+    while data[pos:pos + 4] == b'PK\x03\x04':
+        flags, method, size, name_length, extra_length = struct.unpack('<2xHH8xI4xHH', data[pos + 4:pos + 30])
+        if method != 0 or flags & 8:
+            return None
+        name = data[pos + 30:pos + 30 + name_length].decode()
+        extra = data[pos + 30 + name_length:pos + 30 + name_length + extra_length]
+        if size == 0xFFFFFFFF:
+            # the zip64 extra field holds the uncompressed then the compressed size
+            field = 0
+            while field + 4 <= len(extra):
+                tag, length = struct.unpack('<HH', extra[field:field + 4])
+                if tag == 1:
+                    size = struct.unpack('<Q', extra[field + 4:field + 12])[0]
+                    break
+                field += 4 + length
+        start = pos + 30 + name_length + extra_length
+        array = _read_npy(data[start:start + size])
+        if array is None:
+            return None
+        arrays[name[:-len('.npy')]] = array
+        pos = start + size
+    return arrays
+
+
+def _read_npy(data):
+    """Reads a 1-d float64 or unicode .npy as a list, or returns None"""
+    if data[:6] != b'\x93NUMPY':
+        return None
+    if data[6] == 1:
+        header_length, start = struct.unpack('<H', data[8:10])[0], 10
+    else:
+        header_length, start = struct.unpack('<I', data[8:12])[0], 12
+    header = ast.literal_eval(data[start:start + header_length].decode('latin1'))
+    body = data[start + header_length:]
+    descr, shape = header['descr'], header['shape']
+    if header['fortran_order'] or len(shape) != 1:
+        return None
+    if descr == '<f8':
+        return list(struct.unpack('<%dd' % shape[0], body[:8 * shape[0]]))
+    if descr[:2] == '<U':
+        width = int(descr[2:])
+        text = body[:4 * width * shape[0]].decode('utf-32-le')
+        return [text[i * width:(i + 1) * width].rstrip('\x00') for i in range(shape[0])]
+    return None
+
+
+def read_entry(path):
+    """Reads the feature_dict of an entry file
+
+    Entries are named after the content they hold and never change, so other processes can
+    read the entries an InputCache finds (see InputCache.lookup) while it alone writes the cache.
+    """
+    entry = read_npz(path)
+    if entry is None:
+        import numpy as np
+        with np.load(path) as arrays:
+            entry = {name: arrays[name].tolist() for name in arrays.files}
+    return InputCache.decode(entry)
+
+
+def file_hash(path):
+    """Computes the sha256 of the content of a file"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class InputCache:
+    """represents a size-bounded cache of parsed workbooks stored as .npz files
+
+    Each entry holds the feature/value pairs of one sheet of a workbook and is keyed by the
+    sha256 of the workbook content, the sheet name and the version of the loader that parsed
+    it (see entry_key), so another sheet, another reader or a newer loader never gets the
+    values of an older one. An index remembers the size and mtime of every workbook path seen,
+    so an unchanged workbook is found without even hashing it; a workbook whose mtime changed
+    is hashed and still hits the cache if its content is the same. When the entries take more
+    than max_bytes the least recently used ones are removed.
+
+
+    Attributes:
+        cache_dir str: Folder holding the entries and index.json
+        max_bytes int: Maximum total size of the entries
+        hits int: Number of lookups served from the cache
+        misses int: Number of lookups that required parsing the workbook
+    """
+
+    def __init__(self, cache_dir='./Cache', max_bytes=256 * 2**20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        self.files = index.get('files', {})
+        self.entries = index.get('entries', {})
+        # entries of indexes written before entry_key were keyed by the content hash only
+        for key in [key for key in self.entries if ':' not in key]:
+            del self.entries[key]
+            try:
+                os.remove(os.path.join(cache_dir, key + '.npz'))
+            except OSError:
+                pass
+
+    def key(self, path):
+        """Returns the content hash of a workbook, reusing the indexed one if size and mtime did not change"""
+        stat = os.stat(path)
+        known = self.files.get(os.path.abspath(path))
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['sha256']
+        sha = file_hash(path)
+        self.files[os.path.abspath(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha}
+        return sha
+
+    def entry_key(self, path, sheet_name=SHEET_NAME, loader=LOADER_VERSION):
+        """Returns the key of the entry of a sheet of a workbook parsed by loader ('content sha256:sheet:loader')"""
+        return self.key(path) + ':' + sheet_name + ':' + loader
+
+    def get(self, path, sheet_name=SHEET_NAME, loader=LOADER_VERSION):
+        """Returns the cached feature_dict of a sheet of a workbook or None if it is not cached"""
+        entry_path = self.lookup(path, sheet_name, loader)
+        if entry_path is None:
+            return None
+        return read_entry(entry_path)
+
+    def lookup(self, path, sheet_name=SHEET_NAME, loader=LOADER_VERSION):
+        """Returns the entry file of a sheet of a workbook (see read_entry) or None if it is not cached, counting a hit or a miss"""
+        key = self.entry_key(path, sheet_name, loader)
+        if key not in self.entries or not os.path.exists(self._entry_path(key)):
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+        self.entries[key]['last_used'] = time.time()
+        self.hits += 1
+        return self._entry_path(key)
+
+    def put(self, path, feature_dict, sheet_name=SHEET_NAME, loader=LOADER_VERSION):
+        """Stores the feature_dict of a sheet of a workbook and evicts old entries if the cache is full"""
+        import numpy as np
+
+        key = self.entry_key(path, sheet_name, loader)
+        np.savez(self._entry_path(key), **self.encode(feature_dict))
+        self.entries[key] = {'bytes': os.path.getsize(self._entry_path(key)), 'last_used': time.time()}
+        self.evict()
+
+    def read(self, path, reader=None, sheet_name=SHEET_NAME):
+        """Returns the feature_dict of a sheet of a workbook, parsing and caching it only if needed
+
+        Args:
+            path: Path of the .xlsx workbook
+            reader: Function of the path returning its feature_dict, workbook_loader.read_summary_input
+                of sheet_name by default. Its entries are kept under its qualified name instead of
+                LOADER_VERSION; rename it when the values it returns change.
+            sheet_name: Name of the sheet read
+
+        """
+        if reader is None:
+            from workbook_loader import read_summary_input
+
+            loader = LOADER_VERSION
+            reader = lambda path: read_summary_input(path, sheet_name)
+        else:
+            loader = getattr(reader, '__module__', '') + '.' + getattr(reader, '__qualname__', repr(reader))
+        feature_dict = self.get(path, sheet_name, loader)
+        if feature_dict is None:
+            feature_dict = reader(path)
+            self.put(path, feature_dict, sheet_name, loader)
+        return feature_dict
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes"""
+        total = sum(entry['bytes'] for entry in self.entries.values())
+        for key in sorted(self.entries, key=lambda k: self.entries[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= self.entries.pop(key)['bytes']
+            try:
+                os.remove(self._entry_path(key))
+            except OSError:
+                pass
+        known = {key.split(':', 1)[0] for key in self.entries}
+        self.files = {p: f for p, f in self.files.items() if f['sha256'] in known}
+
+    def save(self):
+        """Evicts entries above max_bytes and writes the index to disk; call once after a batch of lookups"""
+        self.evict()
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'files': self.files, 'entries': self.entries}, f)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def encode(feature_dict):
+        """Converts a feature_dict to the arrays of an entry"""
+        import numpy as np
+
+        values = list(feature_dict.values())
+        kinds = [KINDS.get(type(v), 'f') for v in values]
+        numbers = [float(v) if k in 'bif' else np.nan for v, k in zip(values, kinds)]
+        strings = [v if k == 's' else '' for v, k in zip(values, kinds)]
+        return {'names': np.array(list(feature_dict), dtype=str),
+                'kinds': np.array(kinds, dtype='U1'),
+                'numbers': np.array(numbers, dtype=np.float64),
+                'strings': np.array(strings, dtype=str)}
+
+    @staticmethod
+    def decode(entry):
+        """Converts the arrays of an entry, given as lists, back to a feature_dict"""
+        feature_dict = {}
+        for name, kind, number, string in zip(entry['names'], entry['kinds'], entry['numbers'], entry['strings']):
+            if kind == 'b':
+                feature_dict[name] = bool(number)
+            elif kind == 'i':
+                feature_dict[name] = int(number)
+            elif kind == 's':
+                feature_dict[name] = string
+            elif kind == 'n':
+                feature_dict[name] = None
+            else:
+                feature_dict[name] = number
+        return feature_dict
+
+    def _entry_path(self, key):
+        # sheet and loader names can hold any character, so files are named after the hash of the key
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode()).hexdigest() + '.npz')
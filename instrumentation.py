@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Opt-in timings and branch counters of the PSI pipeline stages"""
+# ---------------------------------------------------------------------------
+# Imports
+import functools
+import importlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import patching
+
+# functions timed when instrumentation is enabled, as 'module:attribute path'
+TARGETS = [
+    'crossing_v3:Crossing.test_validity',
+    'crossing_v3:Crossing.getPotentialConflictVolume',
+    'crossing_v3:Crossing.getPresentPedestrianProbability',
+    'crossing_v3:Crossing.getConflictSpeed',
+    'crossing_v3:Crossing.getDeathRisk',
+    'crossing_v3:Crossing.getSevereInjuryRisk',
+    'crossing_v3:Crossing.getPedestrianRiskIndex',
+    'crossing_batch:CrossingBatch.test_validity',
+    'crossing_batch:CrossingBatch.getPotentialConflictVolume',
+    'crossing_batch:CrossingBatch.getPresentPedestrianProbability',
+    'crossing_batch:CrossingBatch.getConflictSpeed',
+    'crossing_batch:CrossingBatch.getDeathRisk',
+    'crossing_batch:CrossingBatch.getSevereInjuryRisk',
+    'crossing_batch:CrossingBatch.getPedestrianRiskIndex',
+    'intersection:intersection.df_to_dict',
+    'intersection:intersection.adjust_feature_dict',
+    'main:process_intersection',
+    'main:read_workbook',
+    'main:rounded_intersection',
+    'main:format_intersection',
+    'main:write_xlsx',
+    'result_writer:ResultWriter.append',
+    'result_writer:ResultWriter.flush',
+    ]
+
+# timings[name]: [calls, total seconds, max seconds]
+timings = {}
+# counters[name]: number of crossings that took a branch of the model (e.g. 'RT1.slip_lane')
+counters = Counter()
+# complete events of the Chrome trace format, only collected when tracing
+events = []
+
+_patched = {}
+_trace = False
+_origin = time.perf_counter()
+
+
+def enable(trace=False, targets=TARGETS):
+    """Starts recording the targets by replacing them with timed wrappers
+
+    Nothing is wrapped while instrumentation is disabled, so the pipeline then runs the
+    original functions at their original cost. Only calls made in this process are
+    recorded; run main with workers=1 to see the whole pipeline. The wrappers are installed
+    outside the ones of memo (see patching), so calls answered from its caches are timed and
+    counted as well.
+
+    Args:
+        trace: Also keep one event per call for save_trace
+        targets: Functions to time as 'module:attribute path' (see TARGETS); use the module
+            '__main__' for functions of the script being run (e.g. '__main__:process_intersection')
+
+    """
+    global _trace
+    _trace = trace
+    for target in targets:
+        if target in _patched:
+            continue
+        owner, attribute = _resolve(target)
+        patching.install(owner, attribute, 'instrumentation', functools.partial(_wrap, name=_name(target)))
+        _patched[target] = (owner, attribute)
+
+
+def disable():
+    """Restores the original functions, the recorded timings and counters are kept"""
+    for owner, attribute in _patched.values():
+        patching.remove(owner, attribute, 'instrumentation')
+    _patched.clear()
+
+
+def enabled():
+    return bool(_patched)
+
+
+def reset():
+    """Clears the recorded timings, counters and trace events"""
+    global _origin
+    timings.clear()
+    counters.clear()
+    del events[:]
+    _origin = time.perf_counter()
+
+
+@contextmanager
+def instrumented(trace=False, targets=TARGETS):
+    """Enables instrumentation inside a with block"""
+    enable(trace, targets)
+    try:
+        yield
+    finally:
+        disable()
+
+
+@contextmanager
+def span(name):
+    """Times a block of code that is not a function of TARGETS, only when enabled"""
+    if not _patched:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, start, time.perf_counter())
+
+
+def summary():
+    """Returns the recorded timings and branch counters
+
+    Returns:
+        A dictionary with 'timings' (name to calls, total_s, mean_us and max_us; times include
+        the nested targets, e.g. Crossing.getConflictSpeed within main.process_intersection)
+        and 'counters' (branch to number of crossings)
+
+    """
+    return {'timings': {name: {'calls': calls, 'total_s': total, 'mean_us': total / calls * 1e6, 'max_us': longest * 1e6}
+                        for name, (calls, total, longest) in sorted(timings.items())},
+            'counters': dict(sorted(counters.items()))}
+
+
+def save_summary(path):
+    """Writes summary() as JSON"""
+    with open(path, 'w') as f:
+        json.dump(summary(), f, indent=2)
+
+
+def save_trace(path):
+    """Writes the events recorded with enable(trace=True) as a Chrome trace (chrome://tracing, Perfetto)"""
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'counters': dict(counters)}}, f)
+
+
+def count_branches(feature_dict):
+    """Counts the branches of Crossing.getPotentialConflictVolume that a crossing takes"""
+    if feature_dict['slipLane1']:
+        counters['RT1.slip_lane'] += 1
+    elif feature_dict['RTOR1'] == False or feature_dict['shoulderType1'] == 2:
+        counters['RT1.rtor_not_permitted'] += 1
+    else:
+        counters['RT1.rtor_permitted'] += 1
+    if feature_dict['slipLane2']:
+        counters['RT2.slip_lane'] += 1
+    elif feature_dict['RTOR2'] == False:
+        counters['RT2.rtor_not_permitted'] += 1
+    else:
+        counters['RT2.rtor_permitted'] += 1
+    if feature_dict['leftTurnType3'] == "permissive":
+        counters['LT3.permissive'] += 1
+    elif feature_dict['leftTurnType3'] == "protected":
+        counters['LT3.protected'] += 1
+    else:
+        counters['LT3.protected_permissive'] += 1
+
+
+def count_batch_branches(batch, columns):
+    """Counts the branches of CrossingBatch.getPotentialConflictVolume that the crossings of a batch take"""
+    import numpy as np
+    from crossing_batch import PERMISSIVE, PROTECTED
+
+    def count(name, mask):
+        counters[name] += int(np.count_nonzero(np.broadcast_to(mask, batch.shape)))
+
+    slip1 = columns['slipLane1']
+    not_permitted1 = (columns['RTOR1'] == False) | (columns['shoulderType1'] == 2)
+    count('RT1.slip_lane', slip1)
+    count('RT1.rtor_not_permitted', ~slip1 & not_permitted1)
+    count('RT1.rtor_permitted', ~slip1 & ~not_permitted1)
+    slip2 = columns['slipLane2']
+    count('RT2.slip_lane', slip2)
+    count('RT2.rtor_not_permitted', ~slip2 & (columns['RTOR2'] == False))
+    count('RT2.rtor_permitted', ~slip2 & (columns['RTOR2'] != False))
+    left_turn = columns['leftTurnType3']
+    count('LT3.permissive', left_turn == PERMISSIVE)
+    count('LT3.protected', left_turn == PROTECTED)
+    count('LT3.protected_permissive', (left_turn != PERMISSIVE) & (left_turn != PROTECTED))
+
+
+# functions called with the arguments of a target before it runs
+_BRANCH_COUNTERS = {
+    'Crossing.getPotentialConflictVolume': lambda self, feature_dict: count_branches(feature_dict),
+    'CrossingBatch.getPotentialConflictVolume': count_batch_branches,
+    }
+
+
+def _resolve(target):
+    module_name, path = target.split(':')
+    owner = importlib.import_module(module_name)
+    parts = path.split('.')
+    for part in parts[:-1]:
+        owner = getattr(owner, part)
+    return owner, parts[-1]
+
+
+def _name(target):
+    # methods are named by their class, functions by their module
+    module_name, path = target.split(':')
+    if '.' in path:
+        return path
+    return ('main' if module_name == '__main__' else module_name) + '.' + path
+
+
+def _wrap(function, name):
+    before = _BRANCH_COUNTERS.get(name)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if before is not None:
+            before(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _record(name, start, time.perf_counter())
+    return wrapper
+
+
+def _record(name, start, end):
+    entry = timings.get(name)
+    if entry is None:
+        entry = timings[name] = [0, 0.0, 0.0]
+    entry[0] += 1
+    entry[1] += end - start
+    if end - start > entry[2]:
+        entry[2] = end - start
+    if _trace:
+        events.append({'name': name, 'cat': name.split('.')[0], 'ph': 'X',
+                       'ts': (start - _origin) * 1e6, 'dur': (end - start) * 1e6,
+                       'pid': os.getpid(), 'tid': threading.get_ident()})
@@ -8,7 +8,54 @@
 """Implementation of an intersection class with four crossing for pedestrian risk index model"""
 # ---------------------------------------------------------------------------
 # Imports
-from crossing_v3 import Crossing
+
+# approach of the intersection that plays the role of approach 1..4 of each crossing
+transform_table = {1:[0, 4,1,2,3],
+                   2:[0, 1,2,3,4],
+                   3:[0, 2,3,4,1],
+                   4:[0, 3,4,1,2]}
+
+
+def rotate_feature_dict(cross_num, feature_dict):
+    """Returns the feature_dict of crossing cross_num (1..4) in the approach numbering of crossing 2, which Crossing takes"""
+    keys = [
+        'width_a2', 'width_b2', 'width_c2', 'width_d2',
+        'volume_P1', 'volume_P2', 'volume_P3', 'volume_P4',
+        'volume_TH1', 'volume_TH2', 'volume_TH3', 'volume_TH4',
+        'volume_RT1', 'volume_RT2', 'volume_RT3', 'volume_RT4',
+        'volume_LT1', 'volume_LT2', 'volume_LT3', 'volume_LT4', 
+        'postedSpeedLimit1', 'postedSpeedLimit2', 'postedSpeedLimit3', 'postedSpeedLimit4',
+        'rightTurnRadius1', 'rightTurnRadius2', 'rightTurnRadius3', 'rightTurnRadius4',
+        'leftTurnRadius1', 'leftTurnRadius2', 'leftTurnRadius3', 'leftTurnRadius4',
+        'slipLane1', 'slipLane2', 'slipLane3','slipLane4',
+        'shoulderType1', 'shoulderType2', 'shoulderType3', 'shoulderType4', # 0: shared, 1: RT only, 2:TH only (when there is slip lane)
+        'RTOR1', 'RTOR2','RTOR3','RTOR4',
+        'leftTurnType1', 'leftTurnType2', 'leftTurnType3', 'leftTurnType3',
+        'laneNumber1', 'laneNumber2', 'laneNumber3', 'laneNumber4', 
+        'leadingPedInterval1', 'leadingPedInterval2', 'leadingPedInterval3', 'leadingPedInterval4',
+        'effectiveRed1', 'effectiveRed2', 'effectiveRed4', 'effectiveRed4', 
+        'effectiveGreenPermissive1', 'effectiveGreenPermissive2', 'effectiveGreenPermissive3', 'effectiveGreenPermissive4',
+        'walkInterval1', 'walkInterval2', 'walkInterval3', 'walkInterval4', 
+        'flashingDontWalkInterval1', 'flashingDontWalkInterval2', 'flashingDontWalkInterval3', 'flashingDontWalkInterval4',
+        'effectiveGreenProtectedLeftTurn1', 'effectiveGreenProtectedLeftTurn2', 'effectiveGreenProtectedLeftTurn3', 'effectiveGreenProtectedLeftTurn4',
+        'effectiveGreenProtectedRightTurn1', 'effectiveGreenProtectedRightTurn2', 'effectiveGreenProtectedRightTurn3', 'effectiveGreenProtectedRightTurn4'
+        ]
+    feature_dict_adjusted = {}
+    
+    for key in keys:
+        adjusted_key = key[:-1] + str(transform_table[cross_num][int(key[-1])])
+        feature_dict_adjusted[key] = feature_dict[adjusted_key]
+        # print('key: ', key, 'adj key: ', adjusted_key,'value: ', feature_dict[adjusted_key])
+
+    keys = ['a_Frped', 'b_Frped',
+            'baseSaturationFlow',
+            'cycleTime',
+            'pedWalkSpeed']
+    for key in keys:
+        feature_dict_adjusted[key] = feature_dict[key]
+    
+    return feature_dict_adjusted
+
 
 class intersection:
     """represents a 4-legged intersection
@@ -24,6 +71,9 @@ class intersection:
     """
 
     def __init__(self, feature_df):
+        # imported here so the feature helpers below are available without loading the model
+        from crossing_v3 import Crossing
+
         # Initializing crossings
         feature_dict = self.df_to_dict(feature_df)
 
@@ -50,46 +100,6 @@ class intersection:
         return feature_dict
 
     def adjust_feature_dict(self, cross_num, feature_dict):
-        transform_table = {1:[0, 4,1,2,3],
-                           2:[0, 1,2,3,4],
-                           3:[0, 2,3,4,1],
-                           4:[0, 3,4,1,2]}
-        keys = [
-            'width_a2', 'width_b2', 'width_c2', 'width_d2',
-            'volume_P1', 'volume_P2', 'volume_P3', 'volume_P4',
-            'volume_TH1', 'volume_TH2', 'volume_TH3', 'volume_TH4',
-            'volume_RT1', 'volume_RT2', 'volume_RT3', 'volume_RT4',
-            'volume_LT1', 'volume_LT2', 'volume_LT3', 'volume_LT4', 
-            'postedSpeedLimit1', 'postedSpeedLimit2', 'postedSpeedLimit3', 'postedSpeedLimit4',
-            'rightTurnRadius1', 'rightTurnRadius2', 'rightTurnRadius3', 'rightTurnRadius4',
-            'leftTurnRadius1', 'leftTurnRadius2', 'leftTurnRadius3', 'leftTurnRadius4',
-            'slipLane1', 'slipLane2', 'slipLane3','slipLane4',
-            'shoulderType1', 'shoulderType2', 'shoulderType3', 'shoulderType4', # 0: shared, 1: RT only, 2:TH only (when there is slip lane)
-            'RTOR1', 'RTOR2','RTOR3','RTOR4',
-            'leftTurnType1', 'leftTurnType2', 'leftTurnType3', 'leftTurnType3',
-            'laneNumber1', 'laneNumber2', 'laneNumber3', 'laneNumber4', 
-            'leadingPedInterval1', 'leadingPedInterval2', 'leadingPedInterval3', 'leadingPedInterval4',
-            'effectiveRed1', 'effectiveRed2', 'effectiveRed4', 'effectiveRed4', 
-            'effectiveGreenPermissive1', 'effectiveGreenPermissive2', 'effectiveGreenPermissive3', 'effectiveGreenPermissive4',
-            'walkInterval1', 'walkInterval2', 'walkInterval3', 'walkInterval4', 
-            'flashingDontWalkInterval1', 'flashingDontWalkInterval2', 'flashingDontWalkInterval3', 'flashingDontWalkInterval4',
-            'effectiveGreenProtectedLeftTurn1', 'effectiveGreenProtectedLeftTurn2', 'effectiveGreenProtectedLeftTurn3', 'effectiveGreenProtectedLeftTurn4',
-            'effectiveGreenProtectedRightTurn1', 'effectiveGreenProtectedRightTurn2', 'effectiveGreenProtectedRightTurn3', 'effectiveGreenProtectedRightTurn4'
-            ]
-        feature_dict_adjusted = {}
-        
-        for key in keys:
-            adjusted_key = key[:-1] + str(transform_table[cross_num][int(key[-1])])
-            feature_dict_adjusted[key] = feature_dict[adjusted_key]
-            # print('key: ', key, 'adj key: ', adjusted_key,'value: ', feature_dict[adjusted_key])
-
-        keys = ['a_Frped', 'b_Frped',
-                'baseSaturationFlow',
-                'cycleTime',
-                'pedWalkSpeed']
-        for key in keys:
-            feature_dict_adjusted[key] = feature_dict[key]
-        
-        return feature_dict_adjusted
+        return rotate_feature_dict(cross_num, feature_dict)
     
         
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Columnar implementation of the intersection class for many intersections at once"""
+# ---------------------------------------------------------------------------
+# Imports
+import numpy as np
+
+from crossing_batch import CrossingBatch, FLAG_FEATURES, LEFT_TURN_FEATURES, left_turn_codes, round_half_even
+from intersection import transform_table
+
+# features given once per approach (suffix 1..4 in the SummaryInput sheet)
+APPROACH_FEATURES = [
+    'width_a', 'width_b', 'width_c', 'width_d',
+    'volume_P', 'volume_TH', 'volume_RT', 'volume_LT',
+    'postedSpeedLimit', 'rightTurnRadius', 'leftTurnRadius',
+    'slipLane', 'shoulderType', 'RTOR', 'leftTurnType', 'laneNumber',
+    'leadingPedInterval', 'effectiveRed', 'effectiveGreenPermissive',
+    'walkInterval', 'flashingDontWalkInterval',
+    'effectiveGreenProtectedLeftTurn', 'effectiveGreenProtectedRightTurn',
+    ]
+# features shared by the whole intersection
+GLOBAL_FEATURES = ['a_Frped', 'b_Frped', 'baseSaturationFlow', 'cycleTime', 'pedWalkSpeed']
+
+# CROSSING_PERMUTATION[k, j]: zero-based approach of the intersection used as approach j+1 of crossing k+1
+CROSSING_PERMUTATION = np.array([[t - 1 for t in transform_table[k][1:]] for k in (1, 2, 3, 4)])
+
+DIRECTIONS = ['SouthBound', 'EastBound', 'NorthBound', 'WestBound']
+# conflict zone and movement of the five areas of a crossing (order of PCV, PPP, CS, DR and SIR)
+CONFLICT_ZONES = ['A', 'C', 'B', 'D', 'A']
+MOVEMENTS = ['RT1', 'RT1', 'RT2', 'RT2', 'LT3']
+
+
+def approach_array(base, values):
+    """Converts the values of an approach feature to a typed array (flags to bool, left turn types to codes)"""
+    if base + '1' in FLAG_FEATURES:
+        return np.asarray(values).astype(bool)
+    if base + '1' in LEFT_TURN_FEATURES:
+        return left_turn_codes(values)
+    return np.asarray(values, dtype=np.float64)
+
+
+def rotate_columns(approach_features, global_features):
+    """Builds the crossing feature columns from approach features (N, 4) and global features (N,) (see IntersectionBatch.crossing_columns)"""
+    columns = {}
+    for base, values in approach_features.items():
+        # rotated[i, k, j] is approach j+1 of crossing k+1 of intersection i
+        rotated = values[..., CROSSING_PERMUTATION]
+        for j in range(4):
+            columns[base + str(j + 1)] = rotated[..., j]
+    for key, values in global_features.items():
+        columns[key] = values[..., None]
+    return columns
+
+
+class IntersectionBatch:
+    """represents N 4-legged intersections stored column-wise
+
+    Every approach feature is an array of shape (N, 4) holding approaches 1..4 and every
+    global feature an array of shape (N,); features shared by all intersections may be given
+    as (1, 4) and scalars and are broadcast. Rotating the intersection for crossing k is an
+    index permutation of the approach axis (CROSSING_PERMUTATION), so all 4N crossings are
+    evaluated by a single CrossingBatch of shape (N, 4) whose element [i, k-1] is crossing k
+    of intersection i. With rounding=False nothing is rounded (see CrossingBatch), results
+    are then rounded only where they are reported.
+
+
+    Attributes:
+        ids List: Identifier of each intersection
+        crossings CrossingBatch: Results of all crossings, shape (N, 4)
+        PCV np.ndarray[N, 4]: Sum of potential conflicting volumes for each crossing
+        PSI_death np.ndarray[N, 4]: Pedstrian safety index using death risk model for each crossing
+        PSI_injury np.ndarray[N, 4]: Pedstrian safety index using severe injury risk model for each crossing
+    """
+
+    def __init__(self, approach_features, global_features, ids=None, rounding=True):
+        self.approach_features = {base: approach_array(base, approach_features[base]) for base in APPROACH_FEATURES}
+        self.global_features = {key: np.asarray(global_features[key], dtype=np.float64) for key in GLOBAL_FEATURES}
+        self.size = np.broadcast_shapes((1,), *[v.shape[:-1] for v in self.approach_features.values()],
+                                        *[v.shape for v in self.global_features.values()])[0]
+        self.ids = list(ids) if ids is not None else list(range(self.size))
+
+        self.rounding = rounding
+        self.crossings = CrossingBatch(self.crossing_columns(), rounding)
+
+        PCV = self.crossings.PCV
+        PCV_sum = PCV[..., 0] + PCV[..., 1] + PCV[..., 2] + PCV[..., 3] + PCV[..., 4]
+        if rounding:
+            self.PCV = round_half_even(PCV_sum)
+            self.PSI_death = round_half_even(self.crossings.PSI_death)
+            self.PSI_injury = round_half_even(self.crossings.PSI_injury)
+        else:
+            self.PCV = PCV_sum
+            self.PSI_death = self.crossings.PSI_death
+            self.PSI_injury = self.crossings.PSI_injury
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def from_feature_dicts(cls, feature_dicts, ids=None, rounding=True):
+        """Builds the batch from one SummaryInput feature_dict per intersection (see intersection.df_to_dict)"""
+        approach_features = {base: [[d[base + str(j)] for j in (1, 2, 3, 4)] for d in feature_dicts]
+                             for base in APPROACH_FEATURES}
+        global_features = {key: [d[key] for d in feature_dicts] for key in GLOBAL_FEATURES}
+        return cls(approach_features, global_features, ids, rounding)
+
+    @classmethod
+    def from_table(cls, table, rounding=True):
+        """Builds the batch from a feature table with one row per intersection (see workbook_loader.read_feature_table)"""
+        approach_features = {base: table[[base + str(j) for j in (1, 2, 3, 4)]].to_numpy()
+                             for base in APPROACH_FEATURES}
+        global_features = {key: table[key].to_numpy() for key in GLOBAL_FEATURES}
+        return cls(approach_features, global_features, table.index, rounding)
+
+    @classmethod
+    def from_scenarios(cls, feature_dict, overrides, ids=None, rounding=True):
+        """Builds one row per scenario of a single intersection
+
+        Args:
+            feature_dict: The SummaryInput feature_dict of the base intersection
+            overrides: A dictionary of SummaryInput feature names (e.g. 'walkInterval1', 'cycleTime')
+                to arrays holding the value of that feature in each scenario
+
+        """
+        n = max([len(v) for v in overrides.values()], default=1)
+        approach_features = {}
+        for base in APPROACH_FEATURES:
+            # features that are not overridden stay (1, 4) so terms depending only on them are computed once
+            values = approach_array(base, [[feature_dict[base + str(j)] for j in (1, 2, 3, 4)]])
+            overridden = [j for j in (1, 2, 3, 4) if base + str(j) in overrides]
+            if overridden:
+                values = np.repeat(values, n, axis=0)
+                for j in overridden:
+                    values[:, j - 1] = approach_array(base, overrides[base + str(j)])
+            approach_features[base] = values
+        global_features = {key: overrides.get(key, feature_dict[key]) for key in GLOBAL_FEATURES}
+        return cls(approach_features, global_features, ids, rounding)
+
+    def crossing_columns(self):
+        """Builds the crossing feature columns of all 4N crossings
+
+        Returns:
+            A dictionary of crossing feature names (as in Crossing's feature_dict) to arrays
+            broadcastable to (N, 4)
+
+        """
+        return rotate_columns(self.approach_features, self.global_features)
+
+    def crossing(self, cross_num, name):
+        """Returns the result `name` (e.g. 'PCV' or 'PSI_death') of crossing cross_num (1..4) for every intersection"""
+        return getattr(self.crossings, name)[:, cross_num - 1]
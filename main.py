@@ -8,77 +8,361 @@
 """Computing PSI values for all given intersections"""
 # ---------------------------------------------------------------------------
 # Imports
-from curses.ascii import SI
 # from crossing_v1 import Crossing
 from crossing_v3 import Crossing
 
 from intersection import intersection
+from intersection_batch import IntersectionBatch
+from crossing_batch import round_half_even
+from result_writer import ResultWriter
+from result_store import ResultStore
+from validation import validate_feature_dicts
+from workbook_loader import read_summary_input
+from input_cache import InputCache, read_entry
+import instrumentation
+import memo
+from pipeline import Pipeline, Stage
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from types import SimpleNamespace
+from datetime import datetime
+import argparse
+import json
 import pandas as pd
 import os
 
 inputsPath = './Inputs'
+outputsPath = './Outputs'
 
-    
-# Output lists for final dataframe
-IDs = []
-Crosswalks = []
-ConflictZones = []
-Movements = []
-PCVs = []
-PPPs = []
-CSs = []
-DRs = []
-SIRs = []
-
-
-with open('Outputs/out.txt', 'w') as f:
-    for path in os.listdir(inputsPath):
-        print(path)
-        f.write("%"*90 + "\n")
-        f.write("%"*90 + "\n")
-        f.write("Crossings for           " + path[2:-5] + "\n")
-        f.write("%"*90 + "\n")
-        f.write("%"*90 + "\n")
+DIRECTIONS = ['SouthBound', 'EastBound', 'NorthBound', 'WestBound']
+CONFLICT_ZONES = ['A', 'C', 'B', 'D', 'A']
+MOVEMENTS = ['RT1', 'RT1', 'RT2', 'RT2', 'LT3']
+# Columns of out.xlsx
+OUTPUT_COLUMNS = ['IDs', 'Crosswalks', 'ConflictZones', 'Movements',
+                  'Potential Conflict Volume', 'Ped Presence Prob', 'Conflict Speed', 'Death Risk', 'Injury Risk']
+# Results of every crossing, as reported in out.txt
+CROSSING_RESULTS = ['PCV', 'PSI_death', 'PSI_injury']
+
+
+def process_intersection(path, inputsPath=inputsPath, full_precision=False, validate=False, cache=None):
+    """Computes all crossings of one intersection workbook
+
+    Args:
+        path: File name of the workbook in inputsPath
+        inputsPath: Folder of the input workbooks
+        full_precision: Compute without intermediate rounding and round the results to 3
+            decimals only for the outputs; by default every step is rounded as in Crossing
+        validate: Check the intersection first (see validation.validate) instead of raising
+            on the first invalid crossing
+        cache: Optional input_cache.InputCache the workbook is read through
+
+    Returns:
+        A tuple (text, rows) where text is the section of out.txt for this intersection and
+        rows is a dictionary of the out.xlsx columns holding five rows per crossing and of
+        CROSSING_RESULTS holding the four values of out.txt (one per crossing). With
+        validate, an intersection with problems returns (None, errors) with its error table.
+
+    """
+    return compute_intersection(path, read_workbook(path, inputsPath, cache), full_precision, validate)
 
-        feature_df = pd.read_excel(os.path.join(inputsPath, path),sheet_name="SummaryInput")
 
+def compute_intersection(path, feature_df, full_precision=False, validate=False):
+    """Computes all crossings of one intersection read by read_workbook (see process_intersection)"""
+    if validate:
+        errors = validate_feature_dicts([dict(zip(feature_df['feature'].values, feature_df['value'].values))], [path])
+        if len(errors):
+            return None, errors
+
+    if full_precision:
+        feature_dict = dict(zip(feature_df['feature'].values, feature_df['value'].values))
+        intersection_test = rounded_intersection(IntersectionBatch.from_feature_dicts([feature_dict], rounding=False))
+    else:
         intersection_test = intersection(feature_df)
 
-        for cross, dir in zip([intersection_test.crossing1, intersection_test.crossing2, intersection_test.crossing3, intersection_test.crossing4],
-                               ['SouthBound', 'EastBound', 'NorthBound', 'WestBound']):
-            f.write(90*"=" + "\n")
-            f.write(f"Crossing:          {dir} \n")
-            f.write(f"PCV values:        {cross.PCV} \n")
-            f.write(f"PPP values:        {cross.PPP} \n")
-            f.write(f"CS values:         {cross.CS} \n")
-            f.write(f"PSI injury values: {cross.PSI_injury} \n")
-            f.write(f"PSI fatal values:  {cross.PSI_death} \n")
-
-            IDs.extend([path]*5)
-            Crosswalks.extend([dir]*5)
-            ConflictZones.extend(['A', 'C', 'B', 'D', 'A'])
-            Movements.extend(['RT1', 'RT1', 'RT2', 'RT2', 'LT3'])
-            PCVs.extend(cross.PCV)
-            PPPs.extend(cross.PPP)
-            CSs.extend(cross.CS)
-            DRs.extend(cross.DR)
-            SIRs.extend(cross.SIR)
-
-        f.write("*"*90 + "\n")
-        f.write("Final results for intersection:                   " + path[2:-5] + "\n")
-        f.write(f"PCV values for each crossing:                    {intersection_test.PCV} \n")
-        f.write(f"PSI death risk values for each crossing:         {intersection_test.PSI_death} \n")
-        f.write(f"PSI severe injury risk values for each crossing: {intersection_test.PSI_injury} \n\n\n")
-
-outputDF = pd.DataFrame()
-outputDF['IDs'] = IDs
-outputDF['Crosswalks'] = Crosswalks
-outputDF['ConflictZones'] = ConflictZones
-outputDF['Movements'] = Movements
-outputDF['Potential Conflict Volume'] = PCVs
-outputDF['Ped Presence Prob'] = PPPs
-outputDF['Conflict Speed'] = CSs
-outputDF['Death Risk'] = DRs
-outputDF['Injury Risk'] = SIRs
-
-outputDF.to_excel('./Outputs/out.xlsx')
\ No newline at end of file
+    return format_intersection(path, intersection_test)
+
+
+def read_workbook(path, inputsPath=inputsPath, cache=None):
+    """Reads the SummaryInput sheet of one intersection workbook (see workbook_loader.read_summary_input)
+
+    With an input_cache.InputCache, a workbook parsed before is read from the cache instead.
+    """
+    path = os.path.join(inputsPath, path)
+    feature_dict = cache.read(path) if cache is not None else read_summary_input(path)
+    return _feature_df(feature_dict)
+
+
+def rounded_intersection(batch, i=0):
+    """Rounds the full precision results of intersection i of an IntersectionBatch to 3 decimals
+
+    Returns:
+        An object with the attributes of intersection (crossing1..4 with lists PCV, PPP, CS, DR
+        and SIR and floats PSI_death and PSI_injury; lists PCV, PSI_death and PSI_injury)
+
+    """
+    crossings = batch.crossings
+    res = SimpleNamespace(PCV=round_half_even(batch.PCV[i]).tolist(),
+                          PSI_death=round_half_even(batch.PSI_death[i]).tolist(),
+                          PSI_injury=round_half_even(batch.PSI_injury[i]).tolist())
+    for k in range(4):
+        cross = SimpleNamespace(**{name: round_half_even(getattr(crossings, name)[i, k]).tolist()
+                                   for name in ['PCV', 'PPP', 'CS', 'DR', 'SIR', 'PSI_death', 'PSI_injury']})
+        setattr(res, 'crossing' + str(k + 1), cross)
+    return res
+
+
+def format_intersection(path, intersection_test):
+    """Formats the results of one intersection as its out.txt section and out.xlsx rows (see process_intersection)"""
+    lines = []
+    lines.append("%"*90 + "\n")
+    lines.append("%"*90 + "\n")
+    lines.append("Crossings for           " + path[2:-5] + "\n")
+    lines.append("%"*90 + "\n")
+    lines.append("%"*90 + "\n")
+
+    rows = {name: [] for name in OUTPUT_COLUMNS}
+    for cross, dir in zip([intersection_test.crossing1, intersection_test.crossing2, intersection_test.crossing3, intersection_test.crossing4],
+                           DIRECTIONS):
+        lines.append(90*"=" + "\n")
+        lines.append(f"Crossing:          {dir} \n")
+        lines.append(f"PCV values:        {cross.PCV} \n")
+        lines.append(f"PPP values:        {cross.PPP} \n")
+        lines.append(f"CS values:         {cross.CS} \n")
+        lines.append(f"PSI injury values: {cross.PSI_injury} \n")
+        lines.append(f"PSI fatal values:  {cross.PSI_death} \n")
+
+        rows['IDs'].extend([path]*5)
+        rows['Crosswalks'].extend([dir]*5)
+        rows['ConflictZones'].extend(CONFLICT_ZONES)
+        rows['Movements'].extend(MOVEMENTS)
+        rows['Potential Conflict Volume'].extend(cross.PCV)
+        rows['Ped Presence Prob'].extend(cross.PPP)
+        rows['Conflict Speed'].extend(cross.CS)
+        rows['Death Risk'].extend(cross.DR)
+        rows['Injury Risk'].extend(cross.SIR)
+
+    lines.append("*"*90 + "\n")
+    lines.append("Final results for intersection:                   " + path[2:-5] + "\n")
+    lines.append(f"PCV values for each crossing:                    {intersection_test.PCV} \n")
+    lines.append(f"PSI death risk values for each crossing:         {intersection_test.PSI_death} \n")
+    lines.append(f"PSI severe injury risk values for each crossing: {intersection_test.PSI_injury} \n\n\n")
+    for name in CROSSING_RESULTS:
+        rows[name] = list(getattr(intersection_test, name))
+    return "".join(lines), rows
+
+
+def run(inputsPath=inputsPath, outputsPath=outputsPath, workers=1, chunksize=1, batch_rows=1000, resume=False, xlsx=True,
+        full_precision=False, store=None, run_id=None, validate=False, pipeline=False, ingest_workers=2, queue_size=64,
+        cache=None):
+    """Computes all intersections of inputsPath and writes out.txt, out.csv and out.xlsx to outputsPath
+
+    Result rows are streamed to out.csv in batches while the run progresses. With resume,
+    intersections already complete in out.csv are skipped and the new ones are appended.
+
+    Args:
+        inputsPath: Folder of the input workbooks
+        outputsPath: Folder of the output files
+        workers: Number of worker processes, 1 runs serially in this process
+        chunksize: Number of intersections sent to a worker at once
+        batch_rows: Number of rows appended to out.csv at once
+        resume: Continue an interrupted run instead of starting over
+        xlsx: Also write out.xlsx from out.csv at the end of the run
+        full_precision: Round only the reported results (see process_intersection)
+        store: Path of a ResultStore database the results are also added to
+        run_id: Name of the run in the store, the start time by default; give the same
+            name when resuming
+        validate: Skip the intersections with errors or hazards (see validation.validate)
+            and list their problems in invalid.csv instead of stopping at the first one
+        pipeline: Read workbooks, compute intersections and write results concurrently in a
+            pipeline.Pipeline: ingest_workers processes read the workbooks, workers processes
+            (a thread when 1) compute them and this process writes the results
+        ingest_workers: Number of processes reading workbooks in the pipeline
+        queue_size: Number of items waiting in front of every stage of the pipeline
+        cache: Folder of an input_cache.InputCache the workbooks are read through, so only
+            new or changed workbooks are parsed; None parses every workbook. Worker processes
+            only read its entries: the workbooks are looked up here first and the ones the
+            workers parse are sent back and stored here.
+
+    Returns:
+        The Pipeline with its metrics when pipeline is set, else None
+
+    """
+    csv_path = os.path.join(outputsPath, 'out.csv')
+    staged = None
+    if cache is not None:
+        cache = InputCache(cache)
+    result_store = None
+    if store is not None:
+        result_store = ResultStore(store)
+        run_id = run_id or datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+        result_store.add_run(run_id, os.path.abspath(inputsPath))
+    with ResultWriter(csv_path, OUTPUT_COLUMNS, batch_rows, resume) as writer, \
+         open(os.path.join(outputsPath, 'out.txt'), 'a' if resume else 'w') as f:
+        paths = [path for path in os.listdir(inputsPath) if path not in writer.done_ids]
+        arguments = [paths, [inputsPath]*len(paths), [full_precision]*len(paths), [validate]*len(paths)]
+        if pipeline or workers > 1:
+            entries = [cache.lookup(os.path.join(inputsPath, path)) if cache is not None else None for path in paths]
+        if pipeline:
+            stages = [Stage('read', partial(_read_workbook, inputsPath=inputsPath, store=cache is not None),
+                            ingest_workers),
+                      Stage('compute', partial(_compute_intersection, full_precision=full_precision, validate=validate),
+                            workers)]
+            staged = Pipeline(stages, queue_size)
+            with staged:
+                results = _store_parsed(cache, inputsPath, paths, staged.map(zip(paths, entries)))
+                errors = _write_results(f, writer, paths, results, result_store, run_id)
+        elif workers == 1:
+            results = map(process_intersection, *arguments, [cache]*len(paths))
+            errors = _write_results(f, writer, paths, results, result_store, run_id)
+        else:
+            # map keeps the order of paths, so the outputs are the same as a serial run
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(_process_intersection, *arguments, entries, [cache is not None]*len(paths),
+                                       chunksize=chunksize)
+                results = _store_parsed(cache, inputsPath, paths, results)
+                errors = _write_results(f, writer, paths, results, result_store, run_id)
+    if cache is not None:
+        cache.save()
+        print('Input cache:', cache.hits, 'hits,', cache.misses, 'misses')
+    if result_store is not None:
+        result_store.close()
+    if errors:
+        pd.concat(errors, ignore_index=True).to_csv(os.path.join(outputsPath, 'invalid.csv'), index=False)
+        print('Skipped', len(errors), 'invalid intersections, see', os.path.join(outputsPath, 'invalid.csv'))
+
+    if xlsx:
+        write_xlsx(csv_path, os.path.join(outputsPath, 'out.xlsx'))
+    return staged
+
+
+def write_xlsx(csv_path, xlsx_path):
+    """Converts out.csv to out.xlsx"""
+    outputDF = pd.read_csv(csv_path, dtype={'IDs': str, 'Crosswalks': str, 'ConflictZones': str, 'Movements': str})
+    outputDF.to_excel(xlsx_path)
+
+
+def _feature_df(feature_dict):
+    """Converts a feature_dict to the feature/value table of read_workbook"""
+    return pd.DataFrame({'feature': list(feature_dict), 'value': list(feature_dict.values())})
+
+
+def _read_input(path, inputsPath, entry, store):
+    # runs in the workers of run: a workbook found in the cache is read from its entry and
+    # any other is parsed and, with store, returned as well for run to add to the cache
+    if entry is not None:
+        try:
+            return read_entry(entry), None
+        except OSError:
+            # evicted by the entries run stored since it looked the workbook up
+            pass
+    feature_dict = read_summary_input(os.path.join(inputsPath, path))
+    return feature_dict, feature_dict if store else None
+
+
+def _store_parsed(cache, inputsPath, paths, results):
+    for path, (parsed, result) in zip(paths, results):
+        if parsed is not None:
+            cache.put(os.path.join(inputsPath, path), parsed)
+        yield result
+
+
+def _process_intersection(path, inputsPath, full_precision, validate, entry, store):
+    feature_dict, parsed = _read_input(path, inputsPath, entry, store)
+    return parsed, compute_intersection(path, _feature_df(feature_dict), full_precision, validate)
+
+
+def _read_workbook(item, inputsPath, store):
+    path, entry = item
+    feature_dict, parsed = _read_input(path, inputsPath, entry, store)
+    return path, _feature_df(feature_dict), parsed
+
+
+def _compute_intersection(item, full_precision, validate):
+    path, feature_df, parsed = item
+    return parsed, compute_intersection(path, feature_df, full_precision, validate)
+
+
+def _write_results(f, writer, paths, results, result_store=None, run_id=None):
+    # out.txt sections are written right before their rows are flushed, so a resumed
+    # run never misses a section (at worst it repeats the sections of the last batch)
+    pending = []
+    errors = []
+    for path, (text, rows) in zip(paths, results):
+        print(path)
+        if text is None:
+            errors.append(rows)
+            continue
+        pending.append(text)
+        writer.append(rows)
+        if result_store is not None:
+            result_store.append(run_id, rows)
+        if writer.full():
+            with instrumentation.span('main.write_text'):
+                f.write("".join(pending))
+                f.flush()
+            pending = []
+            writer.flush()
+            if result_store is not None:
+                result_store.commit()
+    with instrumentation.span('main.write_text'):
+        f.write("".join(pending))
+    return errors
+
+
+def main(argv=None):
+    """Runs the command line interface of this script on argv (sys.argv[1:] by default)"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--inputs', default=inputsPath, help='folder of the input workbooks')
+    parser.add_argument('--outputs', default=outputsPath, help='folder of out.txt and out.xlsx')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes (default: 1, serial)')
+    parser.add_argument('--chunksize', type=int, default=1, help='intersections sent to a worker at once')
+    parser.add_argument('--batch-rows', type=int, default=1000, help='rows appended to out.csv at once')
+    parser.add_argument('--resume', action='store_true', help='skip intersections already complete in out.csv')
+    parser.add_argument('--no-xlsx', dest='xlsx', action='store_false', help='do not write out.xlsx at the end')
+    parser.add_argument('--full-precision', action='store_true',
+                        help='compute without intermediate rounding, round only the outputs')
+    parser.add_argument('--validate', action='store_true',
+                        help='skip invalid intersections and list their problems in invalid.csv')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='read, compute and write concurrently (compute in --workers processes)')
+    parser.add_argument('--ingest-workers', type=int, default=2, help='processes reading workbooks in the pipeline')
+    parser.add_argument('--queue-size', type=int, default=64, help='items waiting in front of every pipeline stage')
+    parser.add_argument('--pipeline-metrics', help='write the stage and queue depth metrics of the pipeline as JSON')
+    parser.add_argument('--cache', default='./Cache', help='input cache folder, empty to always parse the workbooks')
+    parser.add_argument('--store', help='SQLite result store the results are also added to')
+    parser.add_argument('--run-id', help='name of the run in the result store (default: start time)')
+    parser.add_argument('--memoize', type=int, metavar='SIZE',
+                        help='cache up to SIZE results of each Crossing sub-model in this process and print the hit rates')
+    parser.add_argument('--profile', help='write the timings and branch counters of this process as JSON')
+    parser.add_argument('--trace', help='write a Chrome trace of the calls made in this process')
+    args = parser.parse_args(argv)
+    if args.profile or args.trace:
+        # the functions of this script run as __main__ when it is run directly
+        instrumentation.enable(trace=bool(args.trace),
+                               targets=[t.replace('main:', __name__ + ':', 1) if t.startswith('main:') else t
+                                        for t in instrumentation.TARGETS])
+    if args.memoize:
+        memo.enable(args.memoize)
+    pipeline = run(args.inputs, args.outputs, args.workers, args.chunksize, args.batch_rows, args.resume, args.xlsx,
+                   args.full_precision, args.store, args.run_id, args.validate, args.pipeline, args.ingest_workers,
+                   args.queue_size, args.cache or None)
+    if pipeline is not None:
+        metrics = pipeline.metrics()
+        for name, stage in metrics['stages'].items():
+            print('%s: %d items, idle %.2fs, blocked %.2fs, mean queue depth %.1f/%d'
+                  % (name, stage['items'], stage['idle_s'], stage['blocked_s'],
+                     metrics['queues'][name]['mean_depth'], metrics['queues'][name]['capacity']))
+        if args.pipeline_metrics:
+            with open(args.pipeline_metrics, 'w') as f:
+                json.dump(metrics, f, indent=2)
+    if args.memoize:
+        for stage, stat in memo.stats().items():
+            print('%s cache: %d hits, %d misses (%.1f%%)' % (stage, stat['hits'], stat['misses'], 100 * stat['hit_rate']))
+    if args.profile:
+        instrumentation.save_summary(args.profile)
+    if args.trace:
+        instrumentation.save_trace(args.trace)
+
+
+if __name__ == '__main__':
+    main()
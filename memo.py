@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Bounded LRU memoization of the Crossing sub-models keyed by the inputs each one reads"""
+# ---------------------------------------------------------------------------
+# Imports
+from collections import OrderedDict
+from contextlib import contextmanager
+from operator import itemgetter
+
+import patching
+from crossing_v3 import Crossing
+
+# crossing features each sub-model of Crossing can read (in any of its branches)
+PCV_FEATURES = (
+    'baseSaturationFlow', 'cycleTime', 'pedWalkSpeed',
+    'slipLane1', 'slipLane2', 'RTOR1', 'RTOR2', 'shoulderType1', 'shoulderType2', 'shoulderType4',
+    'laneNumber1', 'laneNumber2', 'laneNumber4', 'rightTurnRadius1', 'rightTurnRadius2', 'rightTurnRadius4',
+    'volume_P1', 'volume_P2', 'volume_P3', 'volume_TH1', 'volume_TH2', 'volume_TH4',
+    'volume_RT1', 'volume_RT2', 'volume_RT4', 'volume_LT3', 'leftTurnType3',
+    'leadingPedInterval1', 'leadingPedInterval2', 'walkInterval1', 'walkInterval2',
+    'flashingDontWalkInterval1', 'flashingDontWalkInterval2', 'effectiveRed1', 'effectiveRed2',
+    'effectiveGreenPermissive1', 'effectiveGreenPermissive3',
+    'effectiveGreenProtectedRightTurn1', 'effectiveGreenProtectedLeftTurn3',
+    )
+PPP_FEATURES = (
+    'width_a2', 'width_b2', 'width_c2', 'width_d2', 'pedWalkSpeed', 'volume_P2', 'cycleTime',
+    'walkInterval1', 'flashingDontWalkInterval1', 'leadingPedInterval1', 'slipLane1', 'slipLane2',
+    )
+# besides PCV_RT1_c and PCV_RT2_d of the crossing
+CS_FEATURES = ('rightTurnRadius1', 'rightTurnRadius2', 'volume_RT1', 'leftTurnRadius3')
+
+_GETTERS = {features: itemgetter(*features) for features in [PCV_FEATURES, PPP_FEATURES, CS_FEATURES]}
+
+# sub-models that are memoized, in the order Crossing computes them
+STAGES = ['PCV', 'PPP', 'CS', 'DR', 'SIR']
+
+
+class LRUCache:
+    """represents a bounded mapping that drops its least recently used entry when full
+
+    Attributes:
+        maxsize int: Maximum number of entries
+        hits int: Number of lookups served from the cache
+        misses int: Number of lookups that required computing the value
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, compute):
+        """Returns the value of key, calling compute() and storing its result on a miss"""
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            value = self.entries[key] = compute()
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+            return value
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def lookup(self, key, default=None):
+        """Returns the value of key or default, counting a hit or a miss"""
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Stores value under key, dropping the least recently used entry when full"""
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# caches[stage]: cache of one sub-model
+caches = {stage: LRUCache() for stage in STAGES}
+
+_patched = set()
+
+
+def feature_key(feature_dict, features):
+    """Returns the values of features with their types, so 1 and 1.0 (which Crossing can report differently) do not collide"""
+    values = _GETTERS[features](feature_dict)
+    return values + tuple(map(type, values))
+
+
+def enable(maxsize=100000):
+    """Starts memoizing the sub-models of Crossing by replacing them with cached versions
+
+    Every sub-model result is kept under the exact values it is computed from (the features
+    it reads and, for CS, DR and SIR, the results of the sub-models before it), so a crossing
+    that only differs in e.g. signal timing reuses the conflict speeds and risks of one seen
+    before. Results are returned as new lists and are identical to computing them. test_validity
+    and getPedestrianRiskIndex are not memoized: the first has to print and raise for every
+    crossing and the second costs no more than its key would. The cached versions are
+    installed inside the wrappers of instrumentation (see patching).
+
+    Args:
+        maxsize: Maximum number of entries of each sub-model cache
+
+    """
+    for cache in caches.values():
+        cache.maxsize = maxsize
+    for attribute, cached in _CACHED.items():
+        if attribute not in _patched:
+            patching.install(Crossing, attribute, 'memo', cached)
+            _patched.add(attribute)
+
+
+def disable():
+    """Restores the original sub-models, the cached entries and statistics are kept"""
+    for attribute in _patched:
+        patching.remove(Crossing, attribute, 'memo')
+    _patched.clear()
+
+
+def enabled():
+    return bool(_patched)
+
+
+def clear():
+    """Removes all cached entries and resets the statistics"""
+    for cache in caches.values():
+        cache.clear()
+
+
+@contextmanager
+def memoized(maxsize=100000):
+    """Enables memoization inside a with block"""
+    enable(maxsize)
+    try:
+        yield
+    finally:
+        disable()
+
+
+def stats():
+    """Returns the hits, misses, hit rate, size and maxsize of each sub-model cache"""
+    return {stage: {'hits': cache.hits, 'misses': cache.misses,
+                    'hit_rate': cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else 0.0,
+                    'size': len(cache), 'maxsize': cache.maxsize}
+            for stage, cache in caches.items()}
+
+
+def _cached_PCV(original):
+    def getPotentialConflictVolume(self, feature_dict):
+        key = feature_key(feature_dict, PCV_FEATURES)
+        return list(caches['PCV'].get(key, lambda: tuple(original(self, feature_dict))))
+    return getPotentialConflictVolume
+
+
+def _cached_PPP(original):
+    def getPresentPedestrianProbability(self, feature_dict):
+        key = feature_key(feature_dict, PPP_FEATURES)
+        return list(caches['PPP'].get(key, lambda: tuple(original(self, feature_dict))))
+    return getPresentPedestrianProbability
+
+
+def _cached_CS(original):
+    def getConflictSpeed(self, feature_dict):
+        key = feature_key(feature_dict, CS_FEATURES) + (self.PCV[1], self.PCV[3], type(self.PCV[1]), type(self.PCV[3]))
+        return list(caches['CS'].get(key, lambda: tuple(original(self, feature_dict))))
+    return getConflictSpeed
+
+
+def _cached_DR(original):
+    def getDeathRisk(self):
+        return list(caches['DR'].get(tuple(self.CS), lambda: tuple(original(self))))
+    return getDeathRisk
+
+
+def _cached_SIR(original):
+    def getSevereInjuryRisk(self):
+        return list(caches['SIR'].get(tuple(self.CS), lambda: tuple(original(self))))
+    return getSevereInjuryRisk
+
+
+# Crossing methods and the functions making their cached versions
+_CACHED = {
+    'getPotentialConflictVolume': _cached_PCV,
+    'getPresentPedestrianProbability': _cached_PPP,
+    'getConflictSpeed': _cached_CS,
+    'getDeathRisk': _cached_DR,
+    'getSevereInjuryRisk': _cached_SIR,
+    }
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Monte Carlo propagation of volume uncertainty to PSI, DR and SIR"""
+# ---------------------------------------------------------------------------
+# Imports
+import fnmatch
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from intersection_batch import IntersectionBatch, DIRECTIONS
+
+# areas of a crossing in the order of the PCV/PPP/CS/DR/SIR lists
+AREAS = ['RT1_a', 'RT1_c', 'RT2_b', 'RT2_d', 'LT3_a']
+PERCENTILES = [2.5, 5, 25, 50, 75, 95, 97.5]
+
+
+def expand_distributions(feature_dict, distributions):
+    """Expands wildcard feature names (e.g. 'volume_RT*') of a distributions specification
+
+    Args:
+        feature_dict: The SummaryInput feature_dict of the base intersection
+        distributions: A dictionary of feature names or patterns to distributions, one of:
+            ('poisson',)              mean is the base value
+            ('normal', sd)            mean is the base value, negative draws are set to 0
+            ('lognormal', cv)         mean is the base value, cv the coefficient of variation
+            ('gamma', cv)             mean is the base value, cv the coefficient of variation
+            ('uniform', low, high)
+
+    Returns:
+        A dictionary of feature names to distributions, one entry per sampled feature
+
+    """
+    expanded = {}
+    for pattern, distribution in distributions.items():
+        names = fnmatch.filter(feature_dict, pattern)
+        if not names:
+            raise Exception('Error: no feature matches ' + pattern)
+        for name in names:
+            expanded[name] = tuple(distribution)
+    return expanded
+
+
+def sample(rng, distribution, mean, size):
+    """Draws size values of a feature with base value mean"""
+    kind = distribution[0]
+    if kind == 'poisson':
+        return rng.poisson(mean, size).astype(np.float64)
+    if kind == 'normal':
+        return np.maximum(rng.normal(mean, distribution[1], size), 0)
+    if kind == 'lognormal':
+        sigma2 = np.log(1 + distribution[1]**2)
+        return rng.lognormal(np.log(mean) - sigma2/2, np.sqrt(sigma2), size) if mean > 0 else np.zeros(size)
+    if kind == 'gamma':
+        shape = 1 / distribution[1]**2
+        return rng.gamma(shape, mean / shape, size)
+    if kind == 'uniform':
+        return rng.uniform(distribution[1], distribution[2], size)
+    raise Exception('Error: unknown distribution ' + str(kind))
+
+
+def simulate_chunk(feature_dict, distributions, size, seed_sequence):
+    """Samples and evaluates one chunk of scenarios
+
+    Returns:
+        A dictionary with 'PSI_death' and 'PSI_injury' arrays of shape (size, 4) and 'DR' and
+        'SIR' arrays of shape (size, 4, 5)
+
+    """
+    rng = np.random.default_rng(seed_sequence)
+    overrides = {name: sample(rng, distribution, float(feature_dict[name]), size)
+                 for name, distribution in distributions.items()}
+    batch = IntersectionBatch.from_scenarios(feature_dict, overrides)
+    return {'PSI_death': batch.PSI_death,
+            'PSI_injury': batch.PSI_injury,
+            'DR': batch.crossings.DR,
+            'SIR': batch.crossings.SIR}
+
+
+def simulate(feature_dict, distributions, samples=10000, chunk_size=20000, seed=None, workers=1):
+    """Evaluates the intersection on samples of its uncertain inputs
+
+    The samples are drawn in chunks of chunk_size, each from its own child of
+    np.random.SeedSequence(seed), so the results only depend on seed and chunk_size and
+    not on the number of workers the chunks are spread on.
+
+    Args:
+        feature_dict: The SummaryInput feature_dict of the base intersection
+        distributions: See expand_distributions
+        samples: Number of samples
+        chunk_size: Number of samples drawn and evaluated at once, bounds the memory used
+        seed: Seed (int or np.random.SeedSequence) of the random streams
+        workers: Number of worker processes, 1 runs in this process
+
+    Returns:
+        A dictionary with the sampled 'PSI_death', 'PSI_injury' (samples, 4), 'DR' and 'SIR' (samples, 4, 5)
+
+    """
+    distributions = expand_distributions(feature_dict, distributions)
+    sizes = [min(chunk_size, samples - start) for start in range(0, samples, chunk_size)]
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(len(sizes))
+    args = ([feature_dict]*len(sizes), [distributions]*len(sizes), sizes, seeds)
+    if workers == 1:
+        chunks = list(map(simulate_chunk, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(simulate_chunk, *args))
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in ['PSI_death', 'PSI_injury', 'DR', 'SIR']}
+
+
+def summarize(results, percentiles=PERCENTILES):
+    """Computes the mean and percentiles of the simulated results
+
+    Returns:
+        A DataFrame with a row per crossing and output ('PSI_death', 'PSI_injury', and 'DR' and
+        'SIR' of each area) plus the intersection totals of PSI (crossing 'Intersection')
+
+    """
+    columns = ['p%g' % p for p in percentiles]
+    records = []
+
+    def add(crossing, area, output, values):
+        record = {'crossing': crossing, 'area': area, 'output': output, 'mean': values.mean()}
+        record.update(zip(columns, np.percentile(values, percentiles)))
+        records.append(record)
+
+    for c, direction in enumerate(DIRECTIONS):
+        for output in ['PSI_death', 'PSI_injury']:
+            add(direction, '', output, results[output][:, c])
+        for output in ['DR', 'SIR']:
+            for a, area in enumerate(AREAS):
+                add(direction, area, output, results[output][:, c, a])
+    for output in ['PSI_death', 'PSI_injury']:
+        add('Intersection', '', output, results[output].sum(axis=1))
+    return pd.DataFrame.from_records(records)
+
+
+def simulate_table(table, distributions, samples=10000, chunk_size=20000, seed=None, workers=1, percentiles=PERCENTILES):
+    """Runs simulate and summarize for every intersection of a feature table (see workbook_loader.read_feature_table)
+
+    Every intersection gets its own child seed, so adding intersections does not change the others.
+
+    Returns:
+        The summaries of all intersections with an 'ID' column
+
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(table))
+    summaries = []
+    for ID, seed_sequence in zip(table.index, seeds):
+        feature_dict = table.loc[ID].to_dict()
+        summary = summarize(simulate(feature_dict, distributions, samples, chunk_size, seed_sequence, workers), percentiles)
+        summary.insert(0, 'ID', ID)
+        summaries.append(summary)
+    return pd.concat(summaries, ignore_index=True)
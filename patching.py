@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Registry of the wrappers the opt-in modules install around functions of the model
+
+memo and instrumentation both replace Crossing methods. Each one installs a layer here
+instead of setting the attribute itself, and the registry rebuilds the attribute from the
+original function with the layers in the order of LAYERS (memo innermost, so instrumentation
+times and counts every call including cache hits). Layers can be removed in any order.
+"""
+# ---------------------------------------------------------------------------
+# Imports
+
+# layers from the innermost to the outermost
+LAYERS = ['memo', 'instrumentation']
+
+# _installed[(owner, attribute)]: (original function, {layer: function making the wrapper of its inner function})
+_installed = {}
+
+
+def install(owner, attribute, layer, wrap):
+    """Wraps owner.attribute with wrap(inner) as the layer named layer (one of LAYERS)"""
+    if layer not in LAYERS:
+        raise Exception('Error: unknown layer ' + str(layer))
+    if (owner, attribute) not in _installed:
+        _installed[(owner, attribute)] = (vars(owner)[attribute], {})
+    _installed[(owner, attribute)][1][layer] = wrap
+    _rebuild(owner, attribute)
+
+
+def remove(owner, attribute, layer):
+    """Removes a layer from owner.attribute, restoring the original function once no layer is left"""
+    if (owner, attribute) not in _installed:
+        return
+    _installed[(owner, attribute)][1].pop(layer, None)
+    _rebuild(owner, attribute)
+
+
+def original(owner, attribute):
+    """Returns owner.attribute without any layer"""
+    if (owner, attribute) in _installed:
+        return _installed[(owner, attribute)][0]
+    return vars(owner)[attribute]
+
+
+def _rebuild(owner, attribute):
+    function, layers = _installed[(owner, attribute)]
+    if not layers:
+        del _installed[(owner, attribute)]
+    for layer in LAYERS:
+        if layer in layers:
+            function = layers[layer](function)
+    setattr(owner, attribute, function)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Staged producer/consumer pipeline with bounded queues and queue-depth metrics"""
+# ---------------------------------------------------------------------------
+# Imports
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# marks the end of the items of a queue
+_END = object()
+
+
+class _Failure:
+    """An exception raised by a stage, passed downstream to the consumer"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class Stage:
+    """represents one step of a Pipeline applying a function to every item
+
+    A stage with more than one worker runs its function in a pool of processes (the function
+    and items must be picklable, e.g. top-level functions or functools.partial of them); a
+    stage with one worker runs it in a thread, which still overlaps with the other stages
+    whenever they wait on I/O or on processes.
+
+
+    Attributes:
+        name str: Name of the stage in the metrics
+        function: Function of one item returning the item of the next stage
+        workers int: Number of processes (or 1 thread)
+        items int: Number of items the stage completed
+        idle_s float: Seconds the stage waited for items from the previous stage
+        blocked_s float: Seconds the stage waited for room in the next queue (backpressure)
+        max_in_flight int: Largest number of items the stage was processing at once
+    """
+
+    def __init__(self, name, function, workers=1):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.items = 0
+        self.idle_s = 0.0
+        self.blocked_s = 0.0
+        self.max_in_flight = 0
+
+
+class Pipeline:
+    """represents stages connected by bounded queues
+
+    Every stage has its own input queue holding at most queue_size items and is driven by a
+    feeder thread that takes items from it, keeps up to 2 * workers of them in progress and
+    puts the results, in the order of the items, on the queue of the next stage. A stage that
+    falls behind fills its queue, which blocks the stage before it, so no more than about
+    queue_size + 2 * workers items per stage are in memory whatever the size of the input.
+    The results of the last stage are consumed by iterating over map(items) in the calling
+    thread. The depth of every queue is sampled every interval seconds.
+
+
+    Attributes:
+        stages List[Stage]: The stages in order
+        queue_size int: Capacity of the queue in front of every stage and of the output queue
+        interval float: Seconds between queue depth samples
+        depths dict: Queue name (a stage name or 'output') to the sampled depths
+        elapsed_s float: Seconds from the start of map to its last result
+    """
+
+    def __init__(self, stages, queue_size=64, interval=0.01):
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.interval = interval
+        self.depths = {}
+        self.elapsed_s = 0.0
+        self._executors = []
+        self._threads = []
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def map(self, items):
+        """Runs items through all stages and yields the results of the last stage in order
+
+        An exception raised by a stage stops the pipeline and is raised here.
+        """
+        start = time.perf_counter()
+        self._stop = threading.Event()
+        names = [stage.name for stage in self.stages] + ['output']
+        queues = [queue.Queue(self.queue_size) for _ in names]
+        self.depths = {name: [] for name in names}
+
+        self._start(self._source, iter(items), queues[0])
+        for stage, inq, outq in zip(self.stages, queues[:-1], queues[1:]):
+            executor = ProcessPoolExecutor(stage.workers) if stage.workers > 1 else ThreadPoolExecutor(1)
+            self._executors.append(executor)
+            self._start(self._feed, stage, executor, inq, outq)
+        self._start(self._sample, dict(zip(names, queues)))
+
+        try:
+            while True:
+                result = queues[-1].get()
+                if result is _END:
+                    break
+                if isinstance(result, _Failure):
+                    raise result.error
+                yield result
+        finally:
+            self.elapsed_s = time.perf_counter() - start
+            self.close()
+
+    def close(self):
+        """Stops the threads and worker processes of the pipeline"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        for executor in self._executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+        self._threads = []
+        self._executors = []
+
+    def metrics(self):
+        """Returns the item counts, waiting times and queue depths of every stage
+
+        Returns:
+            A dictionary with 'elapsed_s', 'stages' (for every stage its workers, items,
+            idle_s, blocked_s and max_in_flight) and 'queues' (for the queue in front of every
+            stage and the output queue its capacity and mean and max sampled depth, and the
+            fraction of samples it was full)
+
+        """
+        stages = {stage.name: {'workers': stage.workers, 'items': stage.items, 'idle_s': stage.idle_s,
+                               'blocked_s': stage.blocked_s, 'max_in_flight': stage.max_in_flight}
+                  for stage in self.stages}
+        queues = {}
+        for name, depths in self.depths.items():
+            depths = list(depths)
+            queues[name] = {'capacity': self.queue_size,
+                            'mean_depth': sum(depths) / len(depths) if depths else 0.0,
+                            'max_depth': max(depths, default=0),
+                            'full_fraction': sum([d >= self.queue_size for d in depths]) / len(depths) if depths else 0.0}
+        return {'elapsed_s': self.elapsed_s, 'stages': stages, 'queues': queues}
+
+    def _start(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _put(self, outq, item):
+        """Puts item on outq, waiting for room unless the pipeline is stopped; returns the seconds waited"""
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                outq.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        return time.perf_counter() - start
+
+    def _get(self, inq):
+        """Takes the next item of inq, or _END once the pipeline is stopped"""
+        while not self._stop.is_set():
+            try:
+                return inq.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _END
+
+    def _source(self, items, outq):
+        try:
+            for item in items:
+                if self._stop.is_set():
+                    return
+                self._put(outq, item)
+        except Exception as e:
+            self._put(outq, _Failure(e))
+            return
+        self._put(outq, _END)
+
+    def _feed(self, stage, executor, inq, outq):
+        pending = deque()
+
+        def emit():
+            result = pending.popleft().result()
+            stage.items += 1
+            stage.blocked_s += self._put(outq, result)
+
+        try:
+            while True:
+                start = time.perf_counter()
+                item = self._get(inq)
+                stage.idle_s += time.perf_counter() - start
+                if item is _END or isinstance(item, _Failure):
+                    break
+                pending.append(executor.submit(stage.function, item))
+                stage.max_in_flight = max(stage.max_in_flight, len(pending))
+                # emit finished results early, and wait for the oldest when enough are in progress
+                while pending and (pending[0].done() or len(pending) >= 2 * stage.workers):
+                    emit()
+            while pending:
+                emit()
+        except Exception as e:
+            self._put(outq, _Failure(e))
+            return
+        self._put(outq, item)
+
+    def _sample(self, queues):
+        while not self._stop.wait(self.interval):
+            for name, q in queues.items():
+                self.depths[name].append(q.qsize())
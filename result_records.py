@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Compact results of many intersections in one NumPy structured array"""
+# ---------------------------------------------------------------------------
+# Imports
+import numpy as np
+
+from intersection_batch import DIRECTIONS, CONFLICT_ZONES, MOVEMENTS
+
+# results of every area (conflict zone and movement) of a crossing
+AREA_VALUES = ['PCV', 'PPP', 'CS', 'DR', 'SIR']
+# results of every crossing
+CROSSING_VALUES = ['PCV', 'PSI_death', 'PSI_injury']
+
+AREA_DTYPE = np.dtype([(name, np.float64) for name in AREA_VALUES])
+# one crossing: its five areas in the order of CONFLICT_ZONES/MOVEMENTS (A/RT1, C/RT1, B/RT2, D/RT2, A/LT3) and its totals
+CROSSING_DTYPE = np.dtype([('areas', AREA_DTYPE, (len(CONFLICT_ZONES),))] + [(name, np.float64) for name in CROSSING_VALUES])
+
+# areas of each conflict zone and movement as slices, so selecting them returns views
+ZONE_SLICES = {'A': slice(0, 5, 4), 'C': slice(1, 2), 'B': slice(2, 3), 'D': slice(3, 4)}
+MOVEMENT_SLICES = {'RT1': slice(0, 2), 'RT2': slice(2, 4), 'LT3': slice(4, 5)}
+
+
+class ResultRecords:
+    """represents the results of N intersections as a structured array of shape (N, 4)
+
+    Element [i, k] holds crossing k+1 (crosswalk DIRECTIONS[k]) of intersection i: the PCV,
+    PPP, CS, DR and SIR of its five areas and its PCV, PSI_death and PSI_injury, 224 bytes
+    per crossing instead of a Crossing object with six lists. Selecting an intersection,
+    a crosswalk, a result or the areas of a conflict zone or movement returns a view, so
+    the records can be sliced and updated without copying, and an array read with
+    np.load(path, mmap_mode='r') can be wrapped as well.
+
+
+    Attributes:
+        records np.ndarray[N, 4]: Structured array of CROSSING_DTYPE
+        ids List: Identifier of each intersection
+    """
+
+    def __init__(self, records, ids=None):
+        if records.dtype != CROSSING_DTYPE or records.ndim != 2 or records.shape[1] != 4:
+            raise Exception('Error: records must be an array (N, 4) of CROSSING_DTYPE')
+        self.records = records
+        self.ids = list(ids) if ids is not None else list(range(len(records)))
+        self._index = None
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def nbytes(self):
+        return self.records.nbytes
+
+    @classmethod
+    def empty(cls, n, ids=None):
+        """Creates zeroed records of n intersections"""
+        return cls(np.zeros((n, 4), dtype=CROSSING_DTYPE), ids)
+
+    @classmethod
+    def from_batch(cls, batch):
+        """Copies the results of an IntersectionBatch, rounded or not as the batch is"""
+        res = cls.empty(len(batch), batch.ids)
+        n = len(batch)
+        for name in AREA_VALUES:
+            res.records['areas'][name] = np.broadcast_to(getattr(batch.crossings, name), (n, 4, 5))
+        for name in CROSSING_VALUES:
+            res.records[name] = np.broadcast_to(getattr(batch, name), (n, 4))
+        return res
+
+    @classmethod
+    def from_intersections(cls, intersections, ids=None):
+        """Copies the results of intersection objects of the scalar model"""
+        res = cls.empty(len(intersections), ids)
+        for i, intersection_result in enumerate(intersections):
+            res.set(i, intersection_result)
+        return res
+
+    def set(self, i, intersection_result):
+        """Stores the results of an intersection object of the scalar model as intersection i"""
+        crossings = [intersection_result.crossing1, intersection_result.crossing2,
+                     intersection_result.crossing3, intersection_result.crossing4]
+        record = self.records[i]
+        for k, crossing in enumerate(crossings):
+            record['areas'][k] = list(zip(*[getattr(crossing, name) for name in AREA_VALUES]))
+        for name in CROSSING_VALUES:
+            record[name] = getattr(intersection_result, name)
+
+    def index(self, ID):
+        """Returns the position of the intersection ID"""
+        if self._index is None or len(self._index) != len(self.ids):
+            self._index = {ID: i for i, ID in enumerate(self.ids)}
+        return self._index[ID]
+
+    def intersection(self, ID):
+        """Returns a view (4,) of the crossings of the intersection ID"""
+        return self.records[self.index(ID)]
+
+    def direction(self, crosswalk):
+        """Returns a view (N,) of one crosswalk ('SouthBound', 'EastBound', 'NorthBound' or 'WestBound') of all intersections"""
+        return self.records[:, DIRECTIONS.index(crosswalk)]
+
+    def areas(self, name=None, zone=None, movement=None):
+        """Returns a view of the area results, optionally of one result and one conflict zone or movement
+
+        Args:
+            name: One of AREA_VALUES, or None for all of them (a structured view)
+            zone: 'A', 'B', 'C' or 'D'; zone A holds two areas (RT1 and LT3)
+            movement: 'RT1', 'RT2' or 'LT3'; with a zone, the one area of both (e.g. A and LT3)
+
+        Returns:
+            A view of shape (N, 4, areas)
+
+        """
+        areas = self.records['areas']
+        if zone is not None and movement is not None:
+            # the one area of the pair
+            pairs = list(zip(CONFLICT_ZONES, MOVEMENTS))
+            if (zone, movement) not in pairs:
+                raise Exception('Error: no area of conflict zone ' + str(zone) + ' and movement ' + str(movement))
+            k = pairs.index((zone, movement))
+            areas = areas[..., k:k + 1]
+        elif zone is not None:
+            areas = areas[..., ZONE_SLICES[zone]]
+        elif movement is not None:
+            areas = areas[..., MOVEMENT_SLICES[movement]]
+        return areas if name is None else areas[name]
+
+    def to_frame(self):
+        """Returns the results in the layout of out.xlsx, one row per area"""
+        import pandas as pd
+
+        n = len(self)
+        frame = pd.DataFrame({'IDs': np.repeat(np.asarray(self.ids, dtype=object), 20),
+                              'Crosswalks': np.tile(np.repeat(np.asarray(DIRECTIONS, dtype=object), 5), n),
+                              'ConflictZones': np.tile(np.asarray(CONFLICT_ZONES, dtype=object), 4 * n),
+                              'Movements': np.tile(np.asarray(MOVEMENTS, dtype=object), 4 * n)})
+        columns = ['Potential Conflict Volume', 'Ped Presence Prob', 'Conflict Speed', 'Death Risk', 'Injury Risk']
+        for column, name in zip(columns, AREA_VALUES):
+            frame[column] = self.records['areas'][name].reshape(-1)
+        return frame
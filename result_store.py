@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Indexed SQLite store of the results of many runs"""
+# ---------------------------------------------------------------------------
+# Imports
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# out.xlsx columns and the store columns they are kept in
+AREA_COLUMNS = {
+    'IDs': 'ID', 'Crosswalks': 'crosswalk', 'ConflictZones': 'zone', 'Movements': 'movement',
+    'Potential Conflict Volume': 'PCV', 'Ped Presence Prob': 'PPP', 'Conflict Speed': 'CS',
+    'Death Risk': 'DR', 'Injury Risk': 'SIR',
+    }
+CROSSING_VALUES = ['PCV', 'PSI_death', 'PSI_injury']
+AREA_VALUES = ['PCV', 'PPP', 'CS', 'DR', 'SIR']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created TEXT,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS crossings (
+    run_id TEXT, ID TEXT, crosswalk TEXT,
+    PCV REAL, PSI_death REAL, PSI_injury REAL,
+    PRIMARY KEY (run_id, ID, crosswalk)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS areas (
+    run_id TEXT, ID TEXT, crosswalk TEXT, zone TEXT, movement TEXT,
+    PCV REAL, PPP REAL, CS REAL, DR REAL, SIR REAL,
+    PRIMARY KEY (run_id, ID, crosswalk, zone, movement)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS crossings_PSI_injury ON crossings (run_id, PSI_injury);
+CREATE INDEX IF NOT EXISTS crossings_PSI_death ON crossings (run_id, PSI_death);
+CREATE INDEX IF NOT EXISTS crossings_PCV ON crossings (run_id, PCV);
+CREATE INDEX IF NOT EXISTS crossings_ID ON crossings (ID, crosswalk);
+CREATE INDEX IF NOT EXISTS areas_DR ON areas (run_id, DR);
+CREATE INDEX IF NOT EXISTS areas_SIR ON areas (run_id, SIR);
+CREATE INDEX IF NOT EXISTS areas_CS ON areas (run_id, CS);
+CREATE INDEX IF NOT EXISTS areas_ID ON areas (ID, crosswalk);
+"""
+
+
+class ResultStore:
+    """represents a SQLite database holding the results of many runs
+
+    Every run (a scenario, a timing plan, a yearly count update, ...) has a run_id. The
+    table crossings holds PCV, PSI_death and PSI_injury of every crossing and the table areas
+    the five rows per crossing of out.xlsx. Both are keyed by run, intersection ID and
+    crosswalk (plus conflict zone and movement for areas) and indexed on their values, so
+    ranking, threshold and run comparison queries read only the rows they return.
+    Storing a crossing again in the same run replaces it.
+
+    Attributes:
+        path str: Path of the database file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_run(self, run_id, description=''):
+        """Registers a run, keeping the creation time of an existing one"""
+        self.connection.execute('INSERT OR IGNORE INTO runs VALUES (?, ?, ?)',
+                                (run_id, datetime.now().isoformat(timespec='seconds'), description))
+        self.connection.commit()
+
+    def append(self, run_id, rows):
+        """Stores the results of one or more intersections given as out.xlsx rows (see main.process_intersection)
+
+        rows also holds the lists PCV, PSI_death and PSI_injury of the crossing results, one
+        value per crossing, which are stored as computed (not derived again from the rounded
+        area rows, so full precision runs store the values out.txt reports).
+        """
+        areas = [area[:4] + tuple(float(value) for value in area[4:])
+                 for area in zip(*[rows[name] for name in AREA_COLUMNS])]
+        crossings = [(run_id, crossing[0], crossing[1]) + tuple(float(value) for value in values)
+                     for crossing, values in zip(areas[::5], zip(*[rows[name] for name in CROSSING_VALUES]))]
+        self._insert(run_id, [(run_id,) + area for area in areas], crossings)
+
+    def add_batch(self, run_id, batch):
+        """Stores all intersections of an IntersectionBatch, rounded or not as the batch is"""
+        from intersection_batch import DIRECTIONS, CONFLICT_ZONES, MOVEMENTS
+
+        n = len(batch)
+        ids = np.repeat(np.asarray([str(ID) for ID in batch.ids], dtype=object), 4)
+        crosswalks = np.tile(np.asarray(DIRECTIONS, dtype=object), n)
+        crossings = zip([run_id] * 4 * n, ids, crosswalks,
+                        *[np.broadcast_to(getattr(batch, name), (n, 4)).reshape(-1).tolist() for name in CROSSING_VALUES])
+        areas = zip([run_id] * 20 * n, np.repeat(ids, 5), np.repeat(crosswalks, 5),
+                    np.tile(np.asarray(CONFLICT_ZONES, dtype=object), 4 * n), np.tile(np.asarray(MOVEMENTS, dtype=object), 4 * n),
+                    *[np.broadcast_to(getattr(batch.crossings, name), (n, 4, 5)).reshape(-1).tolist() for name in AREA_VALUES])
+        self._insert(run_id, areas, crossings)
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def runs(self):
+        """Returns the runs with their number of crossings"""
+        return self.query('SELECT runs.*, (SELECT COUNT(*) FROM crossings WHERE crossings.run_id = runs.run_id) AS crossings '
+                          'FROM runs ORDER BY created')
+
+    def top(self, n=50, by='PSI_injury', run_id=None, ascending=False):
+        """Returns the n crossings with the highest (lowest) value of by ('PSI_injury', 'PSI_death' or 'PCV')"""
+        self._check(by, CROSSING_VALUES)
+        run_id = self._run(run_id)
+        order = 'ASC' if ascending else 'DESC'
+        return self.query('SELECT * FROM crossings WHERE run_id = ? ORDER BY %s %s LIMIT ?' % (by, order), (run_id, n))
+
+    def threshold(self, column='DR', above=None, below=None, run_id=None, table='areas'):
+        """Returns the areas (or crossings with table='crossings') whose column is above and/or below the given values"""
+        self._check(table, ['areas', 'crossings'])
+        self._check(column, AREA_VALUES if table == 'areas' else CROSSING_VALUES)
+        conditions, parameters = ['run_id = ?'], [self._run(run_id)]
+        if above is not None:
+            conditions.append('%s > ?' % column)
+            parameters.append(above)
+        if below is not None:
+            conditions.append('%s < ?' % column)
+            parameters.append(below)
+        return self.query('SELECT * FROM %s WHERE %s ORDER BY %s DESC' % (table, ' AND '.join(conditions), column), parameters)
+
+    def diff(self, run_a, run_b, column='PSI_injury', min_change=0, limit=None):
+        """Compares the crossings of two runs
+
+        Returns:
+            A DataFrame with the crossings of both runs whose column changed by more than
+            min_change, with the values 'a' and 'b' and 'change' (b - a), largest change first
+
+        """
+        self._check(column, CROSSING_VALUES)
+        sql = ('SELECT a.ID, a.crosswalk, a.{0} AS a, b.{0} AS b, b.{0} - a.{0} AS change '
+               'FROM crossings a JOIN crossings b ON b.run_id = ? AND b.ID = a.ID AND b.crosswalk = a.crosswalk '
+               'WHERE a.run_id = ? AND ABS(b.{0} - a.{0}) > ? ORDER BY ABS(b.{0} - a.{0}) DESC').format(column)
+        parameters = [run_b, run_a, min_change]
+        if limit is not None:
+            sql += ' LIMIT ?'
+            parameters.append(limit)
+        return self.query(sql, parameters)
+
+    def intersection(self, ID, run_id=None):
+        """Returns the area rows of one intersection"""
+        return self.query('SELECT * FROM areas WHERE run_id = ? AND ID = ?', (self._run(run_id), ID))
+
+    def query(self, sql, parameters=()):
+        """Runs a SQL query and returns its rows as a DataFrame"""
+        cursor = self.connection.execute(sql, parameters)
+        return pd.DataFrame(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+
+    def _insert(self, run_id, areas, crossings):
+        self.connection.execute('INSERT OR IGNORE INTO runs VALUES (?, ?, ?)',
+                                (run_id, datetime.now().isoformat(timespec='seconds'), ''))
+        self.connection.executemany('INSERT OR REPLACE INTO areas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', areas)
+        self.connection.executemany('INSERT OR REPLACE INTO crossings VALUES (?, ?, ?, ?, ?, ?)', crossings)
+
+    def _run(self, run_id):
+        """Returns run_id, or the latest run when it is None"""
+        if run_id is not None:
+            return run_id
+        row = self.connection.execute('SELECT run_id FROM runs ORDER BY created DESC, rowid DESC LIMIT 1').fetchone()
+        if row is None:
+            raise Exception('Error: the result store has no runs')
+        return row[0]
+
+    @staticmethod
+    def _check(value, allowed):
+        if value not in allowed:
+            raise Exception('Error: ' + str(value) + ' is not one of ' + str(allowed))
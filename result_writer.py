@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Streaming writer of the per-zone result rows"""
+# ---------------------------------------------------------------------------
+# Imports
+import csv
+import io
+import os
+
+
+class ResultWriter:
+    """represents a CSV file that result rows are appended to in batches
+
+    Rows are buffered and appended in batches of batch_rows; every batch is flushed and
+    synced to disk, so a crash loses at most the rows of the current batch. Rows are given
+    one intersection at a time, which lets an interrupted run resume: incomplete
+    intersections at the end of the file are cut off and the complete ones are reported
+    in done_ids so they can be skipped.
+
+
+    Attributes:
+        path str: Path of the CSV file
+        columns List[str]: Column names, written as the header
+        done_ids Set[str]: IDs of the intersections already complete in the file
+    """
+
+    def __init__(self, path, columns, batch_rows=1000, resume=False, id_column='IDs', rows_per_id=20):
+        self.path = path
+        self.columns = list(columns)
+        self.batch_rows = batch_rows
+        self.id_index = self.columns.index(id_column)
+        self.rows_per_id = rows_per_id
+        self.done_ids = set()
+        self._buffer = []
+
+        resuming = resume and os.path.exists(path) and os.path.getsize(path) > 0
+        if resuming:
+            self._recover()
+        self._file = open(path, 'a' if resuming else 'w', newline='')
+        self._writer = csv.writer(self._file)
+        if not resuming:
+            self._writer.writerow(self.columns)
+            self._sync()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, rows):
+        """Buffers the rows of one intersection given as a dictionary of columns"""
+        self._buffer.extend(zip(*[rows[name] for name in self.columns]))
+
+    def full(self):
+        """Returns True when the buffer holds at least one batch"""
+        return len(self._buffer) >= self.batch_rows
+
+    def flush(self):
+        """Appends the buffered rows to the file"""
+        if self._buffer:
+            self._writer.writerows(self._buffer)
+            self._buffer = []
+            self._sync()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _recover(self):
+        """Finds complete intersections and truncates a partially written one at the end of the file"""
+        with open(self.path, 'rb') as f:
+            header = f.readline()
+            if next(csv.reader([header.decode()])) != self.columns:
+                raise Exception('Error: cannot resume, ' + self.path + ' has different columns')
+            run_id, run_start, run_count = None, f.tell(), 0
+            end = f.tell()
+            for line in iter(f.readline, b''):
+                if not line.endswith(b'\n'):
+                    break
+                row_id = next(csv.reader(io.StringIO(line.decode())))[self.id_index]
+                if row_id != run_id:
+                    if run_count == self.rows_per_id:
+                        self.done_ids.add(run_id)
+                    run_id, run_start, run_count = row_id, end, 0
+                run_count += 1
+                end = f.tell()
+        if run_count == self.rows_per_id:
+            self.done_ids.add(run_id)
+            run_start = end
+        with open(self.path, 'r+b') as f:
+            f.truncate(run_start)
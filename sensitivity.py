@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Sensitivity analysis of the PSI of each crossing to the SummaryInput features"""
+# ---------------------------------------------------------------------------
+# Imports
+import fnmatch
+
+import numpy as np
+import pandas as pd
+
+from intersection_batch import IntersectionBatch, DIRECTIONS
+
+OUTPUTS = ['PSI_death', 'PSI_injury']
+
+
+def expand_ranges(feature_dict, ranges):
+    """Expands wildcard parameter names (e.g. 'walkInterval*') to the matching features
+
+    Args:
+        feature_dict: The SummaryInput feature_dict of the base intersection
+        ranges: A dictionary of feature names or patterns to (low, high) ranges
+
+    Returns:
+        A dictionary of feature names to (low, high), one entry per varied feature
+
+    """
+    expanded = {}
+    for pattern, bounds in ranges.items():
+        names = fnmatch.filter(feature_dict, pattern)
+        if not names:
+            raise Exception('Error: no feature matches ' + pattern)
+        for name in names:
+            expanded[name] = (float(bounds[0]), float(bounds[1]))
+    return expanded
+
+
+def evaluate(feature_dict, overrides, chunk_size=50000):
+    """Computes the PSI of each crossing for many scenarios of one intersection
+
+    Args:
+        feature_dict: The SummaryInput feature_dict of the base intersection
+        overrides: A dictionary of feature names to arrays with the value of each scenario
+        chunk_size: Number of scenarios evaluated at once, bounds the memory used
+
+    Returns:
+        A dictionary with 'PSI_death' and 'PSI_injury' arrays of shape (scenarios, 4)
+
+    """
+    n = max([len(v) for v in overrides.values()], default=1)
+    res = {name: np.empty((n, 4)) for name in OUTPUTS}
+    for start in range(0, n, chunk_size):
+        chunk = {key: np.asarray(values)[start:start + chunk_size] for key, values in overrides.items()}
+        batch = IntersectionBatch.from_scenarios(feature_dict, chunk)
+        for name in OUTPUTS:
+            res[name][start:start + len(batch)] = getattr(batch, name)
+    return res
+
+
+def one_at_a_time(feature_dict, ranges, levels=11, chunk_size=50000):
+    """Varies each parameter over its range while the others stay at the base value
+
+    Returns:
+        A DataFrame with a row per parameter, crossing and output holding the base PSI, the
+        minimum and maximum PSI over the range and the swing (max - min)
+
+    """
+    ranges = expand_ranges(feature_dict, ranges)
+    names = list(ranges)
+    overrides = {name: np.full(len(names) * levels + 1, float(feature_dict[name])) for name in names}
+    for i, name in enumerate(names):
+        overrides[name][i*levels:(i + 1)*levels] = np.linspace(*ranges[name], levels)
+    # the last scenario is the base intersection
+    Y = evaluate(feature_dict, overrides, chunk_size)
+
+    records = []
+    for i, name in enumerate(names):
+        for output in OUTPUTS:
+            Y_i = Y[output][i*levels:(i + 1)*levels]
+            for k, direction in enumerate(DIRECTIONS):
+                records.append({'parameter': name, 'crossing': direction, 'output': output,
+                                'base': Y[output][-1, k], 'min': Y_i[:, k].min(), 'max': Y_i[:, k].max(),
+                                'swing': Y_i[:, k].max() - Y_i[:, k].min()})
+    return pd.DataFrame.from_records(records)
+
+
+def morris(feature_dict, ranges, trajectories=50, num_levels=4, seed=None, chunk_size=50000):
+    """Computes Morris elementary effects screening measures
+
+    Each trajectory starts on a random point of a num_levels grid over the parameter ranges
+    and moves one parameter at a time by delta = num_levels / (2 * (num_levels - 1)) of its
+    range, so it costs len(parameters) + 1 evaluations.
+
+    Returns:
+        A DataFrame with a row per parameter, crossing and output holding mu, mu_star and sigma
+        of the elementary effects, in PSI per full range of the parameter
+
+    """
+    ranges = expand_ranges(feature_dict, ranges)
+    names = list(ranges)
+    k = len(names)
+    rng = np.random.default_rng(seed)
+    delta = num_levels / (2 * (num_levels - 1))
+
+    # X[t, s]: point s of trajectory t in the unit cube
+    start = rng.integers(0, num_levels, size=(trajectories, k)) / (num_levels - 1)
+    step = np.where(start + delta <= 1, delta, -delta)
+    order = np.argsort(rng.random((trajectories, k)), axis=1)
+    X = np.repeat(start[:, None, :], k + 1, axis=1)
+    for s in range(k):
+        moved = order[:, s]
+        X[np.arange(trajectories), s + 1:, moved] += step[np.arange(trajectories), moved][:, None]
+    Y = evaluate(feature_dict, _scale(X.reshape(-1, k), names, ranges), chunk_size)
+
+    records = []
+    for output in OUTPUTS:
+        Y_out = Y[output].reshape(trajectories, k + 1, 4)
+        effects = np.empty((trajectories, k, 4))
+        for s in range(k):
+            moved = order[:, s]
+            effects[np.arange(trajectories), moved] = ((Y_out[:, s + 1] - Y_out[:, s])
+                                                       / step[np.arange(trajectories), moved][:, None])
+        for i, name in enumerate(names):
+            for c, direction in enumerate(DIRECTIONS):
+                ee = effects[:, i, c]
+                records.append({'parameter': name, 'crossing': direction, 'output': output,
+                                'mu': ee.mean(), 'mu_star': np.abs(ee).mean(), 'sigma': ee.std(ddof=1) if trajectories > 1 else 0.0})
+    return pd.DataFrame.from_records(records)
+
+
+def sobol(feature_dict, ranges, samples=4096, seed=None, chunk_size=50000):
+    """Computes first order and total Sobol indices with the Saltelli sampling scheme
+
+    Costs samples * (len(parameters) + 2) evaluations. First order indices use the Saltelli
+    (2010) estimator and total indices the Jansen estimator.
+
+    Returns:
+        A DataFrame with a row per parameter, crossing and output holding S1 and ST
+
+    """
+    ranges = expand_ranges(feature_dict, ranges)
+    names = list(ranges)
+    k = len(names)
+    rng = np.random.default_rng(seed)
+    A = rng.random((samples, k))
+    B = rng.random((samples, k))
+    AB = np.repeat(A[None], k, axis=0)
+    for i in range(k):
+        AB[i, :, i] = B[:, i]
+    X = np.concatenate([A, B, AB.reshape(-1, k)])
+    Y = evaluate(feature_dict, _scale(X, names, ranges), chunk_size)
+
+    records = []
+    for output in OUTPUTS:
+        Y_A = Y[output][:samples]
+        Y_B = Y[output][samples:2*samples]
+        Y_AB = Y[output][2*samples:].reshape(k, samples, 4)
+        variance = np.concatenate([Y_A, Y_B]).var(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            S1 = (Y_B[None] * (Y_AB - Y_A[None])).mean(axis=1) / variance
+            ST = 0.5 * ((Y_A[None] - Y_AB) ** 2).mean(axis=1) / variance
+        for i, name in enumerate(names):
+            for c, direction in enumerate(DIRECTIONS):
+                records.append({'parameter': name, 'crossing': direction, 'output': output,
+                                'S1': S1[i, c], 'ST': ST[i, c]})
+    return pd.DataFrame.from_records(records)
+
+
+def _scale(X, names, ranges):
+    """Maps points of the unit cube to feature overrides"""
+    return {name: ranges[name][0] + X[:, i] * (ranges[name][1] - ranges[name][0]) for i, name in enumerate(names)}
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Local HTTP server evaluating PSI scenarios on intersections kept in memory
+
+Endpoints (JSON unless noted):
+    GET  /health          'ok'
+    GET  /intersections   IDs of the loaded intersections
+    GET  /metrics         latency, throughput and cache statistics (see PSIService.metrics)
+    POST /intersections   {"ID": {feature: value, ...}, ...} adds or replaces intersections
+    POST /evaluate        {"scenarios": [{"id": ID, "overrides": {feature: value}}, ...],
+                           "detail": false, "full_precision": false}
+                          or an Arrow IPC stream (application/vnd.apache.arrow.stream, needs
+                          pyarrow) with a column 'id' and one column per overridden feature
+                          (null keeps the base value); returns {"results": [...]} in order
+
+Usage:
+    python server.py --inputs ./Inputs --port 8765
+"""
+# ---------------------------------------------------------------------------
+# Imports
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from crossing_batch import round_half_even
+from input_cache import InputCache
+from intersection_batch import IntersectionBatch, DIRECTIONS
+from memo import LRUCache
+from validation import validate_feature_dicts
+from workbook_loader import read_feature_table, table_to_dict
+
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+# results of every crossing returned with detail
+CROSSING_RESULTS = ['PCV', 'PPP', 'CS', 'DR', 'SIR']
+
+
+class PSIService:
+    """represents the intersections and cached scenario results a server keeps in memory
+
+    Scenarios of a request are evaluated together: the ones already in the cache are
+    answered from it and the rest are validated and computed in a single IntersectionBatch,
+    so a request of many scenarios costs about one batch evaluation. A scenario with problems
+    (see validation.validate), or whose results are not finite, gets its error rows instead
+    of results and does not fail the rest of the request. Results are cached under the
+    intersection, its overrides and the precision, and the cache of an intersection is
+    dropped when it is replaced; results computed from an intersection replaced meanwhile
+    are returned but not cached.
+
+
+    Attributes:
+        intersections dict: IDs to SummaryInput feature_dicts
+        cache LRUCache: Scenario results
+        latencies deque: Seconds taken by the most recent requests
+        requests int: Number of evaluate requests served
+        scenarios int: Number of scenarios served
+        started float: time.time() at which the service started
+    """
+
+    def __init__(self, cache_size=100000, window=10000):
+        self.intersections = {}
+        self.cache = LRUCache(cache_size)
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.scenarios = 0
+        self.started = time.time()
+        self._recent = deque()
+        # number of times each intersection was added, to tell a replaced one
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def load(self, inputsPath, workers=None, cache=None):
+        """Parses every workbook of inputsPath once and keeps its features under its file name
+
+        With an input_cache.InputCache, only the workbooks missing from it are parsed.
+        """
+        paths = [os.path.join(inputsPath, path) for path in sorted(os.listdir(inputsPath))]
+        table = read_feature_table(paths, workers, cache=cache)
+        self.add({ID: table_to_dict(table, ID) for ID in table.index})
+
+    def add(self, feature_dicts):
+        """Adds or replaces intersections given as a dictionary of IDs to feature_dicts"""
+        with self._lock:
+            self.intersections.update(feature_dicts)
+            for ID in feature_dicts:
+                self._versions[ID] = self._versions.get(ID, 0) + 1
+            stale = [key for key in self.cache.entries if key[0] in feature_dicts]
+            for key in stale:
+                del self.cache.entries[key]
+
+    def evaluate(self, scenarios, detail=False, full_precision=False):
+        """Computes the PSI breakdown of scenarios of the loaded intersections
+
+        Args:
+            scenarios: A list of dictionaries with the 'id' of a loaded intersection and
+                optional 'overrides', a dictionary of SummaryInput features to new values
+            detail: Also return PCV, PPP, CS, DR and SIR of the five areas of every crossing
+            full_precision: Round only the returned results (see main.process_intersection)
+
+        Returns:
+            A list with for every scenario a dictionary of its 'id', 'overrides' and either
+            'PCV', 'PSI_death' and 'PSI_injury' of the four crossings (plus 'crossings' with
+            detail) or 'errors', a list of error rows
+
+        """
+        start = time.perf_counter()
+        keys = []
+        with self._lock:
+            for scenario in scenarios:
+                ID = scenario['id']
+                if ID not in self.intersections:
+                    raise KeyError(ID)
+                overrides = scenario.get('overrides') or {}
+                unknown = set(overrides) - set(self.intersections[ID])
+                if unknown:
+                    raise KeyError(sorted(unknown)[0])
+                keys.append((ID, tuple(sorted(overrides.items())), full_precision))
+            # the intersections as of this request, an add() may replace them while computing
+            intersections = {key[0]: self.intersections[key[0]] for key in keys}
+            versions = {ID: self._versions[ID] for ID in intersections}
+            results = {key: self.cache.lookup(key) for key in dict.fromkeys(keys)}
+        missing = [key for key, result in results.items() if result is None]
+        if missing:
+            computed = self._compute(missing, intersections, full_precision)
+            with self._lock:
+                for key, result in zip(missing, computed):
+                    if self._versions[key[0]] == versions[key[0]]:
+                        self.cache.put(key, result)
+                    results[key] = result
+
+        response = []
+        for scenario, key in zip(scenarios, keys):
+            result = results[key]
+            entry = {'id': key[0], 'overrides': dict(key[1])}
+            if 'errors' in result:
+                entry['errors'] = result['errors']
+            else:
+                entry.update({name: result[name] for name in ['PCV', 'PSI_death', 'PSI_injury']})
+                if detail:
+                    entry['crossings'] = result['crossings']
+            response.append(entry)
+        self._record(start, len(scenarios))
+        return response
+
+    def metrics(self):
+        """Returns the request and scenario counts, throughput, latency percentiles and cache statistics
+
+        Returns:
+            A dictionary with 'uptime_s', 'requests', 'scenarios', 'scenarios_per_s' (since
+            start and over the last minute), 'latency_ms' (mean, p50, p95, p99 and max of the
+            most recent requests) and 'cache' (hits, misses, hit_rate, size and maxsize)
+
+        """
+        with self._lock:
+            latencies = np.array(self.latencies) * 1e3
+            now = time.time()
+            recent = sum([n for t, n in self._recent if t > now - 60])
+            hits, misses = self.cache.hits, self.cache.misses
+            res = {'uptime_s': now - self.started,
+                   'intersections': len(self.intersections),
+                   'requests': self.requests,
+                   'scenarios': self.scenarios,
+                   'scenarios_per_s': self.scenarios / max(now - self.started, 1e-9),
+                   'scenarios_per_s_last_minute': recent / min(60, max(now - self.started, 1e-9)),
+                   'cache': {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                             'size': len(self.cache), 'maxsize': self.cache.maxsize}}
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist()
+            res['latency_ms'] = {'mean': float(latencies.mean()), 'p50': p50, 'p95': p95, 'p99': p99,
+                                 'max': float(latencies.max())}
+        else:
+            res['latency_ms'] = {}
+        return res
+
+    def _compute(self, keys, intersections, full_precision):
+        """Evaluates the scenarios of keys on intersections (IDs to feature_dicts) in one IntersectionBatch"""
+        feature_dicts = [{**intersections[ID], **dict(overrides)} for ID, overrides, _ in keys]
+        errors = validate_feature_dicts(feature_dicts, list(range(len(keys))))
+        invalid = set(errors['ID'])
+        valid = [i for i in range(len(keys)) if i not in invalid]
+
+        results = [None] * len(keys)
+        for i in invalid:
+            rows = errors[errors['ID'] == i].drop(columns='ID')
+            results[i] = {'errors': json.loads(rows.to_json(orient='records'))}
+        if valid:
+            batch = IntersectionBatch.from_feature_dicts([feature_dicts[i] for i in valid], rounding=not full_precision)
+            rounded = (lambda values: round_half_even(values).tolist()) if full_precision else (lambda values: values.tolist())
+            PCV, PSI_death, PSI_injury = [rounded(getattr(batch, name)) for name in ['PCV', 'PSI_death', 'PSI_injury']]
+            areas = {name: rounded(getattr(batch.crossings, name)) for name in CROSSING_RESULTS}
+            # NaN or inf of a division by zero validation does not catch would not be valid JSON
+            finite = np.ones((len(valid), 4), dtype=bool)
+            for values in [batch.PCV, batch.PSI_death, batch.PSI_injury]:
+                finite &= np.isfinite(np.broadcast_to(values, finite.shape))
+            for name in CROSSING_RESULTS:
+                finite &= np.isfinite(np.broadcast_to(getattr(batch.crossings, name), finite.shape + (5,))).all(axis=-1)
+            for row, i in enumerate(valid):
+                if not finite[row].all():
+                    results[i] = {'errors': [{'crossing': k + 1, 'approach': None, 'feature': None, 'rule': 'non_finite_result',
+                                              'severity': 'error', 'message': 'the crossing has results that are not finite'}
+                                             for k in np.nonzero(~finite[row])[0].tolist()]}
+                    continue
+                results[i] = {'PCV': PCV[row], 'PSI_death': PSI_death[row], 'PSI_injury': PSI_injury[row],
+                              'crossings': [dict({'crosswalk': direction},
+                                                 **{name: areas[name][row][k] for name in CROSSING_RESULTS})
+                                            for k, direction in enumerate(DIRECTIONS)]}
+        return results
+
+    def _record(self, start, scenarios):
+        with self._lock:
+            self.latencies.append(time.perf_counter() - start)
+            self.requests += 1
+            self.scenarios += scenarios
+            now = time.time()
+            self._recent.append((now, scenarios))
+            while self._recent and self._recent[0][0] < now - 60:
+                self._recent.popleft()
+
+
+def read_arrow_scenarios(body):
+    """Converts an Arrow IPC stream with a column 'id' and one column per overridden feature to scenarios"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise Exception('Error: pyarrow is required for Arrow requests')
+    scenarios = []
+    for row in pa.ipc.open_stream(body).read_all().to_pylist():
+        ID = row.pop('id')
+        scenarios.append({'id': ID, 'overrides': {key: value for key, value in row.items() if value is not None}})
+    return scenarios
+
+
+def make_handler(service):
+    """Returns a request handler class serving the endpoints of the module docstring from service"""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, 'ok')
+            elif self.path == '/intersections':
+                self._send(200, sorted(service.intersections, key=str))
+            elif self.path == '/metrics':
+                self._send(200, service.metrics())
+            else:
+                self._send(404, {'error': 'unknown path ' + self.path})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            try:
+                if self.path == '/evaluate':
+                    if self.headers.get('Content-Type', '').startswith(ARROW_STREAM):
+                        request = {'scenarios': read_arrow_scenarios(body)}
+                    else:
+                        request = json.loads(body)
+                    results = service.evaluate(request['scenarios'], request.get('detail', False),
+                                               request.get('full_precision', False))
+                    self._send(200, {'results': results})
+                elif self.path == '/intersections':
+                    service.add(json.loads(body))
+                    self._send(200, {'intersections': len(service.intersections)})
+                else:
+                    self._send(404, {'error': 'unknown path ' + self.path})
+            except KeyError as e:
+                self._send(400, {'error': 'unknown intersection or feature ' + str(e)})
+            except Exception as e:
+                self._send(400, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            # requests are counted in /metrics instead of logged one per line
+            pass
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def serve(service, host='127.0.0.1', port=8765):
+    """Serves service until interrupted"""
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print('Serving', len(service.intersections), 'intersections on http://%s:%d' % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serves PSI evaluations of the intersections of a folder over HTTP')
+    parser.add_argument('--inputs', default='./Inputs', help='folder of the input workbooks loaded at start')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: local only)')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on')
+    parser.add_argument('--workers', type=int, default=None, help='processes parsing the workbooks at start')
+    parser.add_argument('--cache-size', type=int, default=100000, help='scenario results kept in memory')
+    parser.add_argument('--input-cache', default='./Cache',
+                        help='input cache folder, empty to always parse the workbooks')
+    args = parser.parse_args()
+
+    service = PSIService(args.cache_size)
+    service.load(args.inputs, args.workers, InputCache(args.input_cache) if args.input_cache else None)
+    serve(service, args.host, args.port)
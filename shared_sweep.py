@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Multi-process scenario sweeps over inputs and results in shared memory
+
+The base intersections are packed once into a float matrix in shared memory, and every
+sweep puts the base intersection and override values of its scenarios and a result buffer
+of result_records.CROSSING_DTYPE next to it. Worker processes attach to the blocks by name
+(a task is only a range of scenarios), read their inputs without copying and write the
+PCV, PPP, CS, DR, SIR and PSI of every crossing straight into the result buffer, so no
+feature_dict or result is pickled.
+"""
+# ---------------------------------------------------------------------------
+# Imports
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import crossing_kernel
+from crossing_kernel import FEATURES, LEFT_TURN_CODES, PROTECTED_PERMISSIVE, SOURCES, check, round3
+from result_records import CROSSING_DTYPE, ResultRecords
+
+# intersection features read by the four crossings, in the order of the columns of the base matrix
+INTERSECTION_FEATURES = list(dict.fromkeys(source for cross_num in (1, 2, 3, 4) for source in SOURCES[cross_num]))
+COLUMN = {name: i for i, name in enumerate(INTERSECTION_FEATURES)}
+# base matrix columns packed into crossing 1..4 (see crossing_kernel.pack)
+CROSSING_COLUMNS = [[COLUMN[source] for source in SOURCES[cross_num]] for cross_num in (1, 2, 3, 4)]
+
+# status of a scenario
+OK = 0
+INVALID = 1  # a crossing fails Crossing.test_validity
+FAILED = 2  # the model raised, e.g. on a division by zero (see validation)
+
+# kernel results (PCV, PPP, CS, DR, SIR of five areas, PSI_death, PSI_injury) in the order of the fields of
+# CROSSING_DTYPE (the five results of each area, then PCV, PSI_death and PSI_injury of the crossing)
+_AREA_ORDER = [5 * j + area for area in range(5) for j in range(5)]
+_LEFT_TURN_NAMES = {code: name for name, code in LEFT_TURN_CODES.items()}
+_LEFT_TURN_NAMES[PROTECTED_PERMISSIVE] = 'protected/permissive'
+
+# dtypes of the blocks: base matrix, base of each scenario, override values, results and status
+_DTYPES = [np.float64, np.int64, np.float64, CROSSING_DTYPE, np.int8]
+
+# blocks a worker is attached to, by name
+_attached = {}
+
+
+def encode(name, value):
+    """Converts a SummaryInput feature value to the float stored in the shared matrices"""
+    if name.startswith('leftTurnType'):
+        return float(LEFT_TURN_CODES.get(value, PROTECTED_PERMISSIVE))
+    return float(value)
+
+
+class SharedSweep:
+    """represents base intersections in shared memory and the worker processes evaluating scenarios of them
+
+    Workers run the crossing kernel, which gives the same results as Crossing (see
+    crossing_kernel.verify), or Crossing itself with model='crossing'. Scenarios whose
+    crossings Crossing.test_validity rejects, or on which the model raises, get NaN results
+    and the status INVALID or FAILED instead of failing the sweep.
+
+
+    Attributes:
+        workers int: Number of worker processes
+        chunksize int: Scenarios per task
+        model str: 'kernel' or 'crossing'
+    """
+
+    def __init__(self, feature_dicts, workers=None, chunksize=256, model='kernel'):
+        if model not in ('kernel', 'crossing'):
+            raise Exception('Error: model must be kernel or crossing')
+        self.workers = workers or os.cpu_count()
+        self.chunksize = chunksize
+        self.model = model
+        self._blocks = []
+        self._executor = None
+        self._base_block = self._create(len(feature_dicts) * len(INTERSECTION_FEATURES) * 8)
+        self._base_shape = (len(feature_dicts), len(INTERSECTION_FEATURES))
+        base = np.ndarray(self._base_shape, dtype=np.float64, buffer=self._base_block.buf)
+        for i, feature_dict in enumerate(feature_dicts):
+            base[i] = [encode(name, feature_dict[name]) for name in INTERSECTION_FEATURES]
+        del base
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, overrides, base=None):
+        """Evaluates scenarios of the base intersections
+
+        Args:
+            overrides: A dictionary of SummaryInput feature names to arrays (S,) holding the
+                value of that feature in each scenario
+            base: Index of the base intersection of each scenario, an array (S,) or one index
+                for all (default 0)
+
+        Returns:
+            A tuple (records, status) of the ResultRecords of the S scenarios (ids are the
+            scenario numbers) and an int8 array (S,) of OK, INVALID or FAILED
+
+        """
+        unknown = [name for name in overrides if name not in COLUMN]
+        if unknown:
+            raise Exception('Error: ' + unknown[0] + ' is not read by the model')
+        n = max([len(values) for values in overrides.values()] + [np.size(base) if base is not None else 1])
+        shapes = [self._base_shape, (n,), (n, len(overrides)), (n, 4), (n,)]
+        blocks = [self._base_block] + [self._create(int(np.prod(shape)) * np.dtype(dtype).itemsize)
+                                       for shape, dtype in zip(shapes[1:], _DTYPES[1:])]
+        try:
+            return self._run(blocks, shapes, overrides, base)
+        finally:
+            for block in blocks[1:]:
+                self._release(block)
+
+    def close(self):
+        """Stops the workers and frees all shared memory"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for block in list(self._blocks):
+            self._release(block)
+
+    def _run(self, blocks, shapes, overrides, base):
+        _, scenario_base, values, results, status = [np.ndarray(shape, dtype=dtype, buffer=block.buf)
+                                                     for block, shape, dtype in zip(blocks, shapes, _DTYPES)]
+        scenario_base[:] = 0 if base is None else base
+        for j, (name, column) in enumerate(overrides.items()):
+            column = np.asarray(column)
+            values[:, j] = column.astype(np.float64) if column.dtype.kind in 'biuf' else [encode(name, v) for v in column]
+        columns = [COLUMN[name] for name in overrides]
+        names = [block.name for block in blocks]
+
+        n = len(status)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+        tasks = [self._executor.submit(_evaluate, names, shapes, columns, start, min(start + self.chunksize, n),
+                                       self.model)
+                 for start in range(0, n, self.chunksize)]
+        for task in tasks:
+            task.result()
+        return ResultRecords(results.copy()), status.copy()
+
+    def _create(self, size):
+        block = shared_memory.SharedMemory(create=True, size=max(1, size))
+        self._blocks.append(block)
+        return block
+
+    def _release(self, block):
+        self._blocks.remove(block)
+        try:
+            block.close()
+        except BufferError:
+            # arrays on the block are still referenced (e.g. by a traceback); the memory is
+            # freed once they are gone
+            pass
+        block.unlink()
+
+
+def _attach(names, shapes):
+    """Returns arrays on the blocks of a run, attaching to them once per worker"""
+    for name in [name for name in _attached if name not in names]:
+        # blocks of an earlier run
+        block, array = _attached.pop(name)
+        del array
+        block.close()
+    arrays = []
+    for name, shape, dtype in zip(names, shapes, _DTYPES):
+        if name not in _attached:
+            # workers share the resource tracker of the creating process, which unlinks the block
+            block = shared_memory.SharedMemory(name=name)
+            _attached[name] = (block, np.ndarray(shape, dtype=dtype, buffer=block.buf))
+        arrays.append(_attached[name][1])
+    return arrays
+
+
+def _evaluate(names, shapes, columns, start, stop, model):
+    """Worker task: evaluates scenarios start..stop-1 and writes their results and status"""
+    base, scenario_base, values, results, status = _attach(names, shapes)
+    flat = results.view(np.float64).reshape(len(results), 4, -1)
+    compiled = crossing_kernel.is_compiled() and model == 'kernel'
+    function = crossing_kernel.kernel(compiled)
+    out = np.empty(crossing_kernel.RESULT_SIZE) if compiled else [0.0] * crossing_kernel.RESULT_SIZE
+    rows = []
+    codes = []
+    for s in range(start, stop):
+        row = base[scenario_base[s]].tolist()
+        for column, value in zip(columns, values[s].tolist()):
+            row[column] = value
+        crossings = [[row[j] for j in crossing_columns] for crossing_columns in CROSSING_COLUMNS]
+        if not all(check(x) for x in crossings):
+            rows.append([[np.nan] * flat.shape[2]] * 4)
+            codes.append(INVALID)
+            continue
+        try:
+            rows.append([_crossing_results(x, function, out, compiled, model) for x in crossings])
+            codes.append(OK)
+        except Exception:
+            rows.append([[np.nan] * flat.shape[2]] * 4)
+            codes.append(FAILED)
+    flat[start:stop] = rows
+    status[start:stop] = codes
+
+
+def _crossing_results(x, function, out, compiled, model):
+    """Returns the results of one crossing in the field order of CROSSING_DTYPE"""
+    if model == 'crossing':
+        from crossing_v3 import Crossing
+        feature_dict = dict(zip(FEATURES, x))
+        feature_dict['leftTurnType3'] = _LEFT_TURN_NAMES.get(int(feature_dict['leftTurnType3']), 'protected/permissive')
+        crossing = Crossing(feature_dict)
+        res = list(crossing.PCV) + crossing.PPP + crossing.CS + crossing.DR + crossing.SIR + [crossing.PSI_death, crossing.PSI_injury]
+    else:
+        res = function(np.asarray(x) if compiled else x, out)
+        res = res.tolist() if compiled else res
+    return [res[i] for i in _AREA_ORDER] + [round3(sum(res[:5])), round3(res[25]), round3(res[26])]
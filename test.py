@@ -8,7 +8,6 @@
 """Test file for Crossing implementation"""
 # ---------------------------------------------------------------------------
 # Imports
-from curses.ascii import SI
 # from crossing_v1 import Crossing
 from crossing_v3 import Crossing
 
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Time-of-day PSI profiles from interval volume counts and scheduled timing plans"""
+# ---------------------------------------------------------------------------
+# Imports
+import numpy as np
+import pandas as pd
+
+from intersection_batch import IntersectionBatch, DIRECTIONS, CONFLICT_ZONES, MOVEMENTS
+
+INTERVAL_MINUTES = 15
+INTERVALS_PER_DAY = 24 * 60 // INTERVAL_MINUTES
+
+
+def schedule_from_periods(periods, interval_minutes=INTERVAL_MINUTES):
+    """Expands timing plan periods to one plan name per interval of the day
+
+    Args:
+        periods: A list of (start time 'HH:MM', plan name) sorted by start time; the first
+            period must start at '00:00'
+        interval_minutes: Length of an interval
+
+    Returns:
+        A list with the plan name of every interval
+
+    """
+    starts = [int(start[:2]) * 60 + int(start[3:]) for start, _ in periods]
+    if starts[0] != 0:
+        raise Exception('Error: the first timing plan period must start at 00:00')
+    minutes = np.arange(0, 24 * 60, interval_minutes)
+    period = np.searchsorted(starts, minutes, side='right') - 1
+    return [periods[p][1] for p in period]
+
+
+def day_profile(feature_dict, volumes, plans, schedule, interval_minutes=INTERVAL_MINUTES):
+    """Computes the PSI profile of every crossing and conflict zone over a day
+
+    All intervals are evaluated in one IntersectionBatch. Geometry (crossing widths, turn
+    radii) is not overridden, so the terms depending only on it, such as the crossing times
+    and the radius part of the conflict speed models, are computed once for the intersection
+    and broadcast over the intervals.
+
+    Args:
+        feature_dict: The SummaryInput feature_dict of the intersection
+        volumes: A dictionary of volume features ('volume_RT1', 'volume_P2', ...) to the counts
+            of each interval; features not given keep their hourly value of feature_dict
+        plans: A dictionary of plan names to dictionaries of timing features (e.g. 'cycleTime',
+            'walkInterval1', 'leftTurnType3'); features not given keep their value of feature_dict
+        schedule: The plan name of each interval (see schedule_from_periods)
+        interval_minutes: Length of an interval, counts are converted to hourly flow rates
+
+    Returns:
+        A dictionary with 'PCV', 'PPP', 'CS', 'DR' and 'SIR' arrays of shape (intervals, 4, 5)
+        and 'PSI_death' and 'PSI_injury' arrays of shape (intervals, 4)
+
+    """
+    overrides = {name: np.asarray(counts, dtype=np.float64) * 60 / interval_minutes
+                 for name, counts in volumes.items()}
+
+    plan_names = list(plans)
+    plan_index = np.array([plan_names.index(plan) for plan in schedule])
+    for name in sorted({name for plan in plans.values() for name in plan}):
+        plan_values = np.asarray([plans[plan].get(name, feature_dict[name]) for plan in plan_names])
+        overrides[name] = plan_values[plan_index]
+
+    batch = IntersectionBatch.from_scenarios(feature_dict, overrides)
+    profile = {name: np.broadcast_to(getattr(batch.crossings, name), (len(schedule), 4, 5))
+               for name in ['PCV', 'PPP', 'CS', 'DR', 'SIR']}
+    profile['PSI_death'] = np.broadcast_to(batch.PSI_death, (len(schedule), 4))
+    profile['PSI_injury'] = np.broadcast_to(batch.PSI_injury, (len(schedule), 4))
+    return profile
+
+
+def profile_frame(profile, schedule=None, interval_minutes=INTERVAL_MINUTES):
+    """Converts a day profile to a DataFrame with a row per interval, crossing and conflict zone
+
+    The PSI_death and PSI_injury columns hold the contribution PCV * PPP * risk of each zone;
+    they add up to the PSI of the crossing before rounding.
+    """
+    intervals = profile['PCV'].shape[0]
+    index = pd.MultiIndex.from_product([range(intervals), DIRECTIONS, range(5)],
+                                       names=['interval', 'crossing', 'area'])
+    frame = index.to_frame(index=False)
+    frame.insert(1, 'time', ['%02d:%02d' % divmod(i * interval_minutes, 60) for i in frame['interval']])
+    if schedule is not None:
+        frame.insert(2, 'plan', np.asarray(schedule)[frame['interval']])
+    frame['zone'] = np.asarray(CONFLICT_ZONES)[frame['area']]
+    frame['movement'] = np.asarray(MOVEMENTS)[frame['area']]
+    frame = frame.drop(columns='area')
+    for name in ['PCV', 'PPP', 'CS', 'DR', 'SIR']:
+        frame[name] = profile[name].reshape(-1)
+    frame['PSI_death'] = (profile['PCV'] * profile['PPP'] * profile['DR']).reshape(-1)
+    frame['PSI_injury'] = (profile['PCV'] * profile['PPP'] * profile['SIR']).reshape(-1)
+    return frame
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Search of the signal timing plan that minimizes the PSI of an intersection"""
+# ---------------------------------------------------------------------------
+# Imports
+from collections import ChainMap
+
+import numpy as np
+
+from intersection_batch import IntersectionBatch
+
+
+def fits_in_cycle(*names, lost_time=0):
+    """Returns a constraint: the sum of the given intervals plus lost_time must not exceed cycleTime"""
+    def constraint(values):
+        return sum(values[name] for name in names) + lost_time <= values['cycleTime']
+    return constraint
+
+
+def cycle_length(min_cycle, max_cycle):
+    """Returns a constraint: cycleTime must be within [min_cycle, max_cycle]"""
+    def constraint(values):
+        return (values['cycleTime'] >= min_cycle) & (values['cycleTime'] <= max_cycle)
+    return constraint
+
+
+class TimingOptimizer:
+    """represents the search of timing variables of one intersection minimizing its total PSI
+
+    Candidates are searched with differential evolution. Every generation is evaluated with a
+    single IntersectionBatch, continuous variables are snapped to their step (e.g. whole
+    seconds) and the objective of every distinct candidate is cached, so candidates that
+    repeat within or across generations are never evaluated twice.
+
+
+    Attributes:
+        feature_dict dict: The SummaryInput feature_dict of the base intersection
+        variables dict: Feature names to (low, high, step) or to a list of choices (e.g. leftTurnType3)
+        objective str: 'PSI_injury' or 'PSI_death', summed over the four crossings
+        constraints List: Functions of a mapping of feature names to candidate values returning a feasibility mask
+        evaluations int: Number of candidates evaluated by the model
+        cache_hits int: Number of candidates served from the cache
+    """
+
+    def __init__(self, feature_dict, variables, objective='PSI_injury', constraints=()):
+        self.feature_dict = feature_dict
+        self.variables = variables
+        self.objective = objective
+        self.constraints = list(constraints)
+        self.names = list(variables)
+        self.evaluations = 0
+        self.cache_hits = 0
+        self._cache = {}
+
+        # candidates are encoded as rows of floats: values for numeric variables, choice index for categorical
+        low, high = [], []
+        for name in self.names:
+            spec = variables[name]
+            if self._categorical(name):
+                low.append(0)
+                high.append(len(spec) - 1)
+            else:
+                low.append(spec[0])
+                high.append(spec[1])
+        self.low = np.array(low, dtype=np.float64)
+        self.high = np.array(high, dtype=np.float64)
+
+    def decode(self, X):
+        """Converts encoded candidates to a dictionary of feature names to arrays of values"""
+        overrides = {}
+        for i, name in enumerate(self.names):
+            if self._categorical(name):
+                overrides[name] = np.asarray(self.variables[name])[X[:, i].astype(int)]
+            else:
+                overrides[name] = X[:, i]
+        return overrides
+
+    def snap(self, X):
+        """Clips candidates to the bounds and rounds them to the step of each variable"""
+        X = np.clip(X, self.low, self.high)
+        for i, name in enumerate(self.names):
+            step = 1 if self._categorical(name) else (self.variables[name][2] if len(self.variables[name]) > 2 else 0)
+            if step:
+                X[:, i] = self.low[i] + np.round((X[:, i] - self.low[i]) / step) * step
+        return np.clip(X, self.low, self.high)
+
+    def evaluate(self, X):
+        """Computes the objective of encoded candidates, inf for infeasible ones
+
+        Only candidates not seen before are evaluated, all of them in one batch.
+        """
+        X = self.snap(np.atleast_2d(np.asarray(X, dtype=np.float64)))
+        keys = [row.tobytes() for row in X]
+        new = {}
+        for key, row in zip(keys, X):
+            if key not in self._cache and key not in new:
+                new[key] = row
+        self.cache_hits += len(keys) - len(new)
+
+        if new:
+            X_new = np.array(list(new.values()))
+            overrides = self.decode(X_new)
+            values = ChainMap(overrides, self.feature_dict)
+            feasible = np.ones(len(X_new), dtype=bool)
+            for constraint in self.constraints:
+                feasible &= np.broadcast_to(constraint(values), feasible.shape)
+            batch = IntersectionBatch.from_scenarios(self.feature_dict, overrides)
+            objective = getattr(batch, self.objective).sum(axis=1)
+            objective = np.where(feasible & np.isfinite(objective), objective, np.inf)
+            self.evaluations += len(X_new)
+            self._cache.update(zip(new, objective.tolist()))
+
+        return np.array([self._cache[key] for key in keys])
+
+    def optimize(self, population=40, generations=100, F=0.7, CR=0.9, seed=None, patience=20):
+        """Runs differential evolution (rand/1/bin)
+
+        Args:
+            population: Number of candidates per generation
+            generations: Maximum number of generations
+            F: Differential weight
+            CR: Crossover probability
+            seed: Seed of the random generator
+            patience: Stop after this many generations without improvement
+
+        Returns:
+            A dictionary with the best 'values' (feature name to value), its 'objective', the
+            best objective of each generation ('history'), 'evaluations' and 'cache_hits'
+
+        """
+        rng = np.random.default_rng(seed)
+        k = len(self.names)
+        # the base timing plan is part of the first generation
+        X = self.low + rng.random((population, k)) * (self.high - self.low)
+        X[0] = self._encode_base()
+        X = self.snap(X)
+        y = self.evaluate(X)
+        history = [y.min()]
+        stale = 0
+        for _ in range(generations):
+            idx = np.array([rng.choice(np.delete(np.arange(population), i), 3, replace=False) for i in range(population)])
+            mutant = X[idx[:, 0]] + F * (X[idx[:, 1]] - X[idx[:, 2]])
+            cross = rng.random((population, k)) < CR
+            cross[np.arange(population), rng.integers(0, k, population)] = True
+            trial = self.snap(np.where(cross, mutant, X))
+            y_trial = self.evaluate(trial)
+            better = y_trial <= y
+            X[better] = trial[better]
+            y[better] = y_trial[better]
+            stale = stale + 1 if y.min() >= history[-1] else 0
+            history.append(y.min())
+            if stale >= patience:
+                break
+
+        best = np.argmin(y)
+        values = {name: value[0] for name, value in self.decode(X[best:best + 1]).items()}
+        values = {name: value.item() if hasattr(value, 'item') else value for name, value in values.items()}
+        return {'values': values, 'objective': y[best], 'history': history,
+                'evaluations': self.evaluations, 'cache_hits': self.cache_hits}
+
+    def _categorical(self, name):
+        spec = self.variables[name]
+        return isinstance(spec, (list, tuple)) and len(spec) > 0 and isinstance(spec[0], str)
+
+    def _encode_base(self):
+        row = []
+        for name in self.names:
+            if self._categorical(name):
+                choices = list(self.variables[name])
+                row.append(choices.index(self.feature_dict[name]) if self.feature_dict[name] in choices else 0)
+            else:
+                row.append(float(self.feature_dict[name]))
+        return np.array(row)
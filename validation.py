@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Vectorized validation of many intersections reporting every problem at once
+
+Usage:
+    python validation.py ./Inputs                               checks that validation flags exactly
+                                                                the workbooks Crossing raises on
+    python validation.py --synthetic 400 --set volume_P=3000    the same on synthetic intersections
+"""
+# ---------------------------------------------------------------------------
+# Imports
+import math
+
+from intersection import rotate_feature_dict, transform_table
+
+ERROR_COLUMNS = ['ID', 'crossing', 'approach', 'feature', 'rule', 'severity', 'message']
+
+
+def validate(approach_features, global_features, ids=None):
+    """Checks all crossings of many intersections
+
+    Two kinds of problems are reported. Errors are the lane/shoulder/slip lane combinations
+    Crossing.test_validity raises on (checked on approach 1 of every crossing, which covers
+    all four approaches of the intersection). Hazards are divisions by zero the crossing
+    would run into in the branch of the model it takes: a zero effectiveRed, a zero volume_P2
+    in the pedestrian headway, walk + flashing don't walk equal to the leading pedestrian
+    interval, no right turn and through volume (V_R + V_T = 0) on a shared lane, a zero right
+    turn saturation flow S_R in K_R = S_base/S_R on a shared lane (F_Rped is 0 from
+    q'ped >= 5216 ped/h), and zero lane numbers, permissive greens, cycle time or walking
+    speed. verify checks that the intersections with problems are the ones Crossing raises on.
+
+    Args:
+        approach_features: A dictionary of approach features to arrays (N, 4) (see IntersectionBatch)
+        global_features: A dictionary of global features to arrays (N,)
+        ids: Identifier of each intersection, 0..N-1 by default
+
+    Returns:
+        A DataFrame with one row per problem and the columns ERROR_COLUMNS: the intersection
+        ID, the crossing (1..4) and intersection approach (1..4) it was found on (empty for
+        global features), the SummaryInput feature to fix, a rule name, the severity ('error'
+        or 'hazard') and a message
+
+    """
+    import numpy as np
+    import pandas as pd
+    from crossing_batch import PROTECTED
+    from intersection_batch import APPROACH_FEATURES, GLOBAL_FEATURES, approach_array, rotate_columns
+
+    approach_features = {base: approach_array(base, approach_features[base]) for base in APPROACH_FEATURES}
+    global_features = {key: np.asarray(global_features[key], dtype=np.float64) for key in GLOBAL_FEATURES}
+    n = np.broadcast_shapes((1,), *[v.shape[:-1] for v in approach_features.values()],
+                            *[v.shape for v in global_features.values()])[0]
+    ids = list(ids) if ids is not None else list(range(n))
+    columns = rotate_columns(approach_features, global_features)
+
+    frames = []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for mask, feature, rule, severity, message in _crossing_rules(columns, columns['leftTurnType3'] != PROTECTED):
+            frames.append(_crossing_errors(np.broadcast_to(mask, (n, 4)), feature, rule, severity, message, ids))
+        for mask, feature, rule, message in _global_rules(global_features):
+            intersections = np.nonzero(np.broadcast_to(mask, (n,)))[0]
+            frames.append(pd.DataFrame({'ID': [ids[i] for i in intersections], 'crossing': None, 'approach': None,
+                                        'feature': feature, 'rule': rule, 'severity': 'hazard', 'message': message}))
+
+    errors = pd.concat([pd.DataFrame(columns=ERROR_COLUMNS)] + frames, ignore_index=True)
+    # a feature read by several branches of a crossing is reported once
+    errors = errors.drop_duplicates(['ID', 'crossing', 'feature', 'rule'])
+    order = {ID: i for i, ID in enumerate(ids)}
+    errors = errors.iloc[np.lexsort((errors['crossing'].fillna(0).to_numpy(dtype=float),
+                                     errors['ID'].map(order).to_numpy(dtype=float)))]
+    errors['crossing'] = errors['crossing'].astype('Int64')
+    errors['approach'] = errors['approach'].astype('Int64')
+    return errors.reset_index(drop=True)
+
+
+def check_intersection(feature_dict, ID=None):
+    """Checks one intersection given as a SummaryInput feature_dict with the rules of validate in plain Python
+
+    Nothing but the model itself is imported, so a single intersection is checked without
+    the start up cost of NumPy and pandas.
+
+    Returns:
+        A list of the rows of the error table of validate as dictionaries
+
+    """
+    rows = []
+    for mask, feature, rule, message in _global_rules(feature_dict):
+        if mask:
+            rows.append({'ID': ID, 'crossing': None, 'approach': None, 'feature': feature, 'rule': rule,
+                         'severity': 'hazard', 'message': message})
+    for cross_num in (1, 2, 3, 4):
+        c = rotate_feature_dict(cross_num, feature_dict)
+        for mask, feature, rule, severity, message in _crossing_rules(c, c['leftTurnType3'] != 'protected'):
+            approach = transform_table[cross_num][int(feature[-1])] if feature[-1].isdigit() else None
+            row = {'ID': ID, 'crossing': cross_num, 'approach': approach,
+                   'feature': feature if approach is None else feature[:-1] + str(approach),
+                   'rule': rule, 'severity': severity, 'message': message}
+            if mask and not any(r['crossing'] == cross_num and r['feature'] == row['feature'] and r['rule'] == rule
+                                for r in rows):
+                rows.append(row)
+    return rows
+
+
+def verify(feature_dicts):
+    """Compares the intersections validate and check_intersection flag with the ones Crossing raises on
+
+    Args:
+        feature_dicts: SummaryInput feature_dicts of intersections
+
+    Returns:
+        A tuple (raising, mismatches) of the number of intersections on which Crossing raises
+        and a list of (intersection index, flagged by validate, flagged by check_intersection,
+        Crossing raises) of the intersections where the three disagree
+
+    """
+    import contextlib
+    import io
+    from crossing_v3 import Crossing
+
+    flagged = set(validate_feature_dicts(feature_dicts)['ID'])
+    raising = 0
+    mismatches = []
+    for i, feature_dict in enumerate(feature_dicts):
+        try:
+            # test_validity prints the features it rejects
+            with contextlib.redirect_stdout(io.StringIO()):
+                for cross_num in (1, 2, 3, 4):
+                    Crossing(rotate_feature_dict(cross_num, feature_dict))
+            raises = False
+        except Exception:
+            raises = True
+        raising += raises
+        checked = bool(check_intersection(feature_dict, i))
+        if not (i in flagged) == checked == raises:
+            mismatches.append((i, i in flagged, checked, raises))
+    return raising, mismatches
+
+
+def validate_feature_dicts(feature_dicts, ids=None):
+    """Checks intersections given as SummaryInput feature_dicts (see intersection.df_to_dict) and returns the error table of validate"""
+    from intersection_batch import APPROACH_FEATURES, GLOBAL_FEATURES
+
+    approach_features = {base: [[d[base + str(j)] for j in (1, 2, 3, 4)] for d in feature_dicts]
+                         for base in APPROACH_FEATURES}
+    global_features = {key: [d[key] for d in feature_dicts] for key in GLOBAL_FEATURES}
+    return validate(approach_features, global_features, ids)
+
+
+def validate_table(table, exclude_hazards=True):
+    """Checks a feature table (see workbook_loader.read_feature_table) and splits off its valid rows
+
+    Args:
+        table: A feature table with one row per intersection
+        exclude_hazards: Also leave out the intersections that only have hazards
+
+    Returns:
+        A tuple (errors, valid) of the error table of validate and the rows of table without
+        problems, which can be passed to IntersectionBatch.from_table
+
+    """
+    from intersection_batch import APPROACH_FEATURES, GLOBAL_FEATURES
+
+    approach_features = {base: table[[base + str(j) for j in (1, 2, 3, 4)]].to_numpy()
+                         for base in APPROACH_FEATURES}
+    global_features = {key: table[key].to_numpy() for key in GLOBAL_FEATURES}
+    errors = validate(approach_features, global_features, table.index)
+    problems = errors if exclude_hazards else errors[errors['severity'] == 'error']
+    return errors, table[~table.index.isin(problems['ID'])]
+
+
+def _crossing_rules(c, permissive_left):
+    """Yields (mask, crossing feature, rule, severity, message) for the features of a crossing
+
+    c holds the crossing features as arrays or as plain values, so only operators both
+    support are used (e.g. x == False rather than ~x). permissive_left tells whether left
+    turns of approach 3 have a permissive phase (leftTurnType3 is not protected).
+    """
+    single_lane = c['laneNumber1'] == 1
+    multi_lane = c['laneNumber1'] >= 2
+    shoulder = c['shoulderType1']
+    slip = c['slipLane1']
+    yield (single_lane & (shoulder == 1), 'shoulderType1', 'shoulder_type_1_single_lane', 'error',
+           'Shoulder type can never equal 1 (because then through vehicle cannot proceed) when lane Number = 1')
+    yield (single_lane & (shoulder == 2) & (slip == False), 'shoulderType1', 'shoulder_type_2_single_lane', 'error',
+           'Shoulder type can never equal 2 when lane Number = 1 and there is no slip lane')
+    yield (multi_lane & (shoulder == 2) & (slip == False), 'shoulderType1', 'shoulder_type_2_multi_lane', 'error',
+           'Shoulder type can never equal 2 when lane Number >= 2 and there is no slip lane')
+    yield (slip & (shoulder != 2), 'shoulderType1', 'slip_lane_shoulder_type', 'error',
+           'Shoulder type can only equal 2 when there is a slip lane')
+
+    # branches of getPotentialConflictVolume
+    rtor1 = (c['slipLane1'] == False) & (c['RTOR1'] != False) & (c['shoulderType1'] != 2)
+    rtor2 = (c['slipLane2'] == False) & (c['RTOR2'] != False)
+    for branch, red, shared in [(rtor1, 'effectiveRed1', rtor1 & (c['shoulderType1'] != 1)),
+                                (rtor2, 'effectiveRed2', rtor2 & (c['shoulderType2'] != 1))]:
+        approach = red[-1]
+        other = '2' if approach == '1' else '1'
+        yield (branch & (c[red] == 0), red, 'zero_effective_red', 'hazard',
+               'effectiveRed is 0 while right turns on red are permitted')
+        yield (branch & _walk_equals_LPI(c, other), 'leadingPedInterval' + other, 'walk_equals_LPI', 'hazard',
+               'walk + flashing don\'t walk equals the leading pedestrian interval')
+        yield (shared & _walk_equals_LPI(c, approach), 'leadingPedInterval' + approach, 'walk_equals_LPI', 'hazard',
+               'walk + flashing don\'t walk equals the leading pedestrian interval')
+        yield (shared & (c['laneNumber' + approach] == 0), 'laneNumber' + approach, 'zero_lane_number', 'hazard',
+               'laneNumber is 0 on an approach with right turns on red')
+        yield (shared & _no_turning_volume(c, approach), 'volume_RT' + approach, 'zero_turn_volumes', 'hazard',
+               'right turn and through volumes are both 0 (V_R + V_T = 0) on a shared lane with right turns on red')
+    # K_R = S_base/S_R on a shared lane, with q'ped of (pedestrian volume, signal approach)
+    # and the radius of the lane; getPotentialConflictVolume compares q'ped > 200 on RT2
+    adjustments = {}
+    for path, branch, volume_P, signal, lane, strict in [
+            ('RT1', rtor1, 'volume_P1', '2', '4', False),
+            ('RT1 shared', rtor1 & (c['shoulderType1'] != 1), 'volume_P2', '1', '1', False),
+            ('RT2', rtor2, 'volume_P2', '1', '1', True),
+            ('RT2 shared', rtor2 & (c['shoulderType2'] != 1), 'volume_P3', '2', '2', False)]:
+        branch = branch & (c['shoulderType' + lane] == 0) & (_walk_equals_LPI(c, signal) == False)
+        K_R, F_Rped, F_radius = adjustments[path] = _right_turn_adjustment(c, volume_P, signal, lane, strict)
+        yield (branch & (F_Rped == 0), volume_P, 'zero_right_turn_saturation', 'hazard',
+               'F_Rped is 0 (q\'ped >= 5216 ped/h) so S_R is 0 in K_R = S_base/S_R on a shared lane with right turns on red')
+        yield (branch & (F_radius == 0), 'rightTurnRadius' + lane, 'zero_right_turn_saturation', 'hazard',
+               'F_radius is 0 so S_R is 0 in K_R = S_base/S_R on a shared lane with right turns on red')
+        yield (branch & (c['baseSaturationFlow'] == 0), 'baseSaturationFlow', 'zero_right_turn_saturation', 'hazard',
+               'baseSaturationFlow is 0 so S_R is 0 in K_R = S_base/S_R on a shared lane with right turns on red')
+
+    # f_hat = P_R * P_R ** (q_rtor * effectiveRed / 10600) on a shared lane: no right turns
+    # (P_R = 0) and a negative capacity q_rtor divide by zero
+    cycle = c['cycleTime']
+    K_R = adjustments['RT1'][0]
+    q_m1 = _through_volume(c, '4', K_R)
+    q_mR = _where(c['shoulderType4'] == 0, c['volume_RT4'], 0)
+    q_prime_m = _divide(q_m1 * cycle, c['effectiveRed1']) / 2 + _divide(q_mR * cycle, c['effectiveRed1'])
+    q_rtor1 = 850 - 0.35 * q_prime_m
+    K_R = adjustments['RT2'][0]
+    V_R = _where(c['shoulderType1'] == 0, c['volume_RT1'], 0)
+    q_prime_m = _divide(V_R * cycle, c['effectiveRed2']) / 2 + _divide(_through_volume(c, '1', K_R) * cycle, c['effectiveRed2'])
+    q_rtor2 = 850 - 0.35 * q_prime_m
+    for branch, approach, q_rtor in [(rtor1, '1', q_rtor1), (rtor2, '2', q_rtor2)]:
+        V_R = c['volume_RT' + approach]
+        P_R = _divide(V_R, V_R + _through_volume(c, approach, adjustments['RT%s shared' % approach][0]))
+        yield (branch & (c['shoulderType' + approach] != 1) & (P_R == 0) & (q_rtor * c['effectiveRed' + approach] / 10600 < 0),
+               'volume_RT' + approach, 'no_right_turns_negative_capacity', 'hazard',
+               'no right turns (P_R = 0) on a shared lane with right turns on red whose capacity q_rtor is negative, '
+               'so P_R ** (q_rtor * effectiveRed / 10600) divides by zero')
+    yield (rtor2 & (c['laneNumber1'] == 0), 'laneNumber1', 'zero_lane_number', 'hazard',
+           'laneNumber is 0 on an approach with right turns on red')
+    yield (rtor1 & (c['laneNumber4'] == 0), 'laneNumber4', 'zero_lane_number', 'hazard',
+           'laneNumber is 0 on an approach with right turns on red')
+    yield ((c['slipLane1'] == False) & (c['effectiveGreenPermissive1'] == 0), 'effectiveGreenPermissive1', 'zero_effective_green',
+           'hazard', 'effectiveGreenPermissive is 0 on an approach with right turns')
+    yield (permissive_left & (c['effectiveGreenPermissive3'] == 0), 'effectiveGreenPermissive3',
+           'zero_effective_green', 'hazard', 'effectiveGreenPermissive is 0 on an approach with permissive left turns')
+
+    # getPresentPedestrianProbability
+    yield (c['volume_P2'] == 0, 'volume_P2', 'zero_ped_volume', 'hazard',
+           'volume_P2 is 0 so the pedestrian headway is infinite')
+    yield (_walk_equals_LPI(c, '1'), 'leadingPedInterval1', 'walk_equals_LPI', 'hazard',
+           'walk + flashing don\'t walk equals the leading pedestrian interval')
+
+
+def _global_rules(g):
+    """Yields (mask, feature, rule, message) for the global features"""
+    yield g['cycleTime'] == 0, 'cycleTime', 'zero_cycle_time', 'cycleTime is 0'
+    yield g['pedWalkSpeed'] == 0, 'pedWalkSpeed', 'zero_walk_speed', 'pedWalkSpeed is 0'
+
+
+def _walk_equals_LPI(c, approach):
+    return c['walkInterval' + approach] + c['flashingDontWalkInterval' + approach] == c['leadingPedInterval' + approach]
+
+
+def _right_turn_adjustment(c, volume_P, signal, lane, strict):
+    # (K_R, F_Rped, F_radius) of a shared lane with the float operations of getPotentialConflictVolume
+    cycle = c['cycleTime']
+    LPI = c['leadingPedInterval' + signal]
+    W_plus_FDW = c['walkInterval' + signal] + c['flashingDontWalkInterval' + signal]
+    V_P = c[volume_P]
+    V = V_P * cycle / 3600
+    V = _where(LPI == 0, V, _max0(V - V_P * (cycle - W_plus_FDW) / 3600))
+    q_prime_ped = _divide(_divide(V * 3600, cycle) * cycle, W_plus_FDW - LPI)
+    F_Rped = _where(q_prime_ped > 200 if strict else q_prime_ped >= 200, _max0(0.49 - q_prime_ped / 10645), 1.0)
+    radius = c['rightTurnRadius' + lane]
+    F_radius = _where(radius < 15, _max0(0.5 + radius / 30), 1)
+    S_base = c['baseSaturationFlow']
+    S_R = S_base * _where(F_radius < F_Rped, F_radius, F_Rped)
+    return _where(c['shoulderType' + lane] == 0, _divide(S_base, S_R), 0), F_Rped, F_radius
+
+
+def _through_volume(c, approach, K_R):
+    # V_T of a lane (q_m1 on approach 4) given its K_R
+    q_prime = c['volume_TH' + approach] + c['volume_RT' + approach] * K_R
+    per_lane = _divide(q_prime, c['laneNumber' + approach])
+    return _where(c['shoulderType' + approach] == 0, _max0(per_lane - c['volume_RT' + approach] * K_R), per_lane)
+
+
+def _where(condition, x, y):
+    # x where condition holds, else y, of arrays or of values
+    if hasattr(condition, 'shape'):
+        import numpy as np
+        return np.where(condition, x, y)
+    return x if condition else y
+
+
+def _max0(x):
+    # max(0, x)
+    return _where(x > 0, x, 0)
+
+
+def _divide(a, b):
+    # a / b of arrays (under np.errstate) or of values, inf or nan instead of raising on values
+    if hasattr(a, 'shape') or hasattr(b, 'shape') or b != 0:
+        return a / b
+    return math.nan if a == 0 or a != a else math.copysign(math.inf, a) * math.copysign(1, b)
+
+
+def _no_turning_volume(c, approach):
+    # V_R is the right turn volume, so V_R + V_T can only be 0 without right turns, when V_T
+    # no longer depends on the right turn adjustment K_R: V_T is V_TH/N, or max(0, V_TH/N)
+    # on a shared lane
+    V_TH = c['volume_TH' + approach]
+    no_through = (V_TH == 0) | ((c['shoulderType' + approach] == 0) & (V_TH <= 0))
+    return (c['volume_RT' + approach] == 0) & (c['laneNumber' + approach] != 0) & no_through
+
+
+def _crossing_errors(mask, feature, rule, severity, message, ids):
+    """Builds the error rows of the crossings where mask is set, naming the intersection feature behind a crossing feature"""
+    import numpy as np
+    import pandas as pd
+    from intersection_batch import CROSSING_PERMUTATION
+
+    intersections, crossings = np.nonzero(mask)
+    if not feature[-1].isdigit():
+        # a global feature read by the crossing
+        return pd.DataFrame({'ID': [ids[i] for i in intersections], 'crossing': crossings + 1, 'approach': None,
+                             'feature': feature, 'rule': rule, 'severity': severity, 'message': message})
+    approaches = CROSSING_PERMUTATION[crossings, int(feature[-1]) - 1] + 1
+    return pd.DataFrame({'ID': [ids[i] for i in intersections], 'crossing': crossings + 1, 'approach': approaches,
+                         'feature': [feature[:-1] + str(a) for a in approaches], 'rule': rule,
+                         'severity': severity, 'message': message})
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description='Checks that validation flags exactly the intersections Crossing raises on')
+    parser.add_argument('inputs', nargs='?', help='folder of input workbooks')
+    parser.add_argument('--synthetic', type=int, default=0, help='number of synthetic intersections (see benchmark.synthetic_table)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--set', action='append', default=[], metavar='FEATURE=VALUE',
+                        help='value of a feature in every synthetic intersection; an approach feature without its number sets all four')
+    args = parser.parse_args()
+
+    feature_dicts = []
+    if args.inputs:
+        from workbook_loader import read_summary_input
+        feature_dicts += [read_summary_input(os.path.join(args.inputs, name))
+                          for name in sorted(os.listdir(args.inputs)) if name.endswith('.xlsx')]
+    if args.synthetic:
+        from benchmark import synthetic_table
+        from cli import parse_value
+        table = synthetic_table(args.synthetic, args.seed)
+        for setting in args.set:
+            feature, _, value = setting.partition('=')
+            for column in [feature] if feature in table else [feature + str(j) for j in (1, 2, 3, 4)]:
+                table[column] = parse_value(value)
+        feature_dicts += [{key: value.item() if hasattr(value, 'item') else value for key, value in row.items()}
+                          for row in table.to_dict('records')]
+    raising, mismatches = verify(feature_dicts)
+    print('%d intersections, Crossing raises on %d, %d mismatches' % (len(feature_dicts), raising, len(mismatches)))
+    for mismatch in mismatches[:20]:
+        print('  intersection %d: validate %s, check_intersection %s, Crossing raises %s' % mismatch)
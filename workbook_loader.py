@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Mohammad Zarei
+# Created Date: 17 Oct 2026
+# version = '1.0'
+# ---------------------------------------------------------------------------
+"""Fast loading of the SummaryInput sheet of intersection workbooks"""
+# ---------------------------------------------------------------------------
+# Imports
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+
+SHEET_NAME = 'SummaryInput'
+# version of read_summary_input, part of the key of the sheets input_cache.InputCache keeps;
+# change it whenever the values it returns change
+LOADER_VERSION = '2'
+
+# namespaces of the spreadsheet and relationship xml
+_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+
+def read_summary_input(path, sheet_name=SHEET_NAME):
+    """Reads the feature/value columns of the SummaryInput sheet of one workbook
+
+    The sheet xml is read straight from the .xlsx archive and only the cells of the two
+    columns are typed; the styles, theme and other sheets openpyxl loads are never parsed.
+    A SummaryInput sheet of ~100 rows takes ~1.6 ms against ~12 ms with openpyxl and ~15 ms
+    with pd.read_excel (see benchmark.py, ingest.read_summary_input). Values are typed like
+    openpyxl reads them: numbers as int when integral (as pd.read_excel does) and float
+    otherwise, booleans as bool and text (shared, inline or formula strings) as str.
+    Formulas give their cached value and cells formatted as dates keep their serial number.
+
+    Args:
+        path: Path of the .xlsx workbook
+        sheet_name: Name of the sheet holding the 'feature' and 'value' columns
+
+    Returns:
+        A dictionary of features in the same format as intersection.df_to_dict
+
+    """
+    with zipfile.ZipFile(path) as archive:
+        sheet_path, strings_path = _sheet_paths(archive, sheet_name)
+        shared_strings = []
+        if strings_path in archive.namelist():
+            shared_strings = [_text(si) for si in ElementTree.fromstring(archive.read(strings_path))]
+        rows = ElementTree.fromstring(archive.read(sheet_path)).find(_MAIN + 'sheetData')
+
+    rows = iter(rows)
+    header = {column: _cell_value(c, shared_strings) for column, c in _cells(next(rows, ()))}
+    columns = {value: column for column, value in header.items()}
+    if 'feature' not in columns or 'value' not in columns:
+        raise Exception('Error: no feature and value columns in sheet ' + sheet_name + ' of ' + str(path))
+    feature_col = columns['feature']
+    value_col = columns['value']
+
+    feature_dict = {}
+    for row in rows:
+        feature = value = None
+        for column, c in _cells(row):
+            if column == feature_col:
+                feature = _cell_value(c, shared_strings)
+            elif column == value_col:
+                value = _cell_value(c, shared_strings)
+        if feature is not None:
+            feature_dict[feature] = value
+    return feature_dict
+
+
+def _sheet_paths(archive, sheet_name):
+    """Returns the archive paths of the xml of a sheet and of the shared strings"""
+    workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    rels = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {}
+    strings_path = 'xl/sharedStrings.xml'
+    for rel in rels:
+        # targets are relative to xl/ or absolute within the archive
+        target = rel.get('Target')
+        target = target[1:] if target.startswith('/') else 'xl/' + target
+        targets[rel.get('Id')] = target
+        if rel.get('Type', '').endswith('/sharedStrings'):
+            strings_path = target
+    for sheet in workbook.iter(_MAIN + 'sheet'):
+        if sheet.get('name') == sheet_name:
+            return targets[sheet.get(_REL + 'id')], strings_path
+    raise Exception('Error: no sheet ' + sheet_name + ' in ' + archive.filename)
+
+
+def _cells(row):
+    """Yields the column numbers (A is 1) and elements of the cells of a row"""
+    column = 0
+    for c in row:
+        ref = c.get('r')
+        if ref is None:
+            # cells without a reference follow the previous one
+            column += 1
+            yield column, c
+            continue
+        column = _column_number(ref.rstrip('0123456789'))
+        yield column, c
+
+
+def _column_number(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - 64
+    return number
+
+
+def _text(element):
+    """Returns the text of a shared or inline string, joining its rich text runs (phonetic runs are skipped)"""
+    t = element.find(_MAIN + 't')
+    if t is not None:
+        return t.text or ''
+    return ''.join(r.findtext(_MAIN + 't') or '' for r in element.iter(_MAIN + 'r'))
+
+
+def _cell_value(c, shared_strings):
+    """Returns the value of a cell typed as pd.read_excel returns it"""
+    kind = c.get('t', 'n')
+    if kind == 'inlineStr':
+        inline = c.find(_MAIN + 'is')
+        return None if inline is None else _text(inline)
+    v = c.findtext(_MAIN + 'v')
+    if v is None or v == '' and kind != 'str':
+        return None
+    if kind == 'n':
+        try:
+            return int(v)
+        except ValueError:
+            value = float(v)
+            return int(value) if value.is_integer() else value
+    if kind == 's':
+        return shared_strings[int(v)]
+    if kind == 'b':
+        return v == '1'
+    # str (formula results) and e (errors such as #N/A)
+    return v
+
+
+def read_feature_table(paths, workers=None, chunksize=1, sheet_name=SHEET_NAME, cache=None):
+    """Reads many workbooks in parallel into one consolidated feature table
+
+    Args:
+        paths: List of workbook paths
+        workers: Number of worker processes, defaults to the number of cores. 1 reads serially.
+        chunksize: Number of workbooks sent to a worker at once
+        sheet_name: Name of the sheet holding the 'feature' and 'value' columns
+        cache: Optional input_cache.InputCache; only workbooks missing from it are parsed
+
+    Returns:
+        A pandas DataFrame with one row per workbook (indexed by file name, in the order of paths)
+        and one column per feature. It can be passed to IntersectionBatch.from_table.
+
+    """
+    import pandas as pd
+
+    paths = list(paths)
+    feature_dicts = [cache.get(p, sheet_name) for p in paths] if cache is not None else [None] * len(paths)
+    missing = [i for i, d in enumerate(feature_dicts) if d is None]
+    missing_paths = [paths[i] for i in missing]
+
+    workers = workers or os.cpu_count() or 1
+    sheet_names = [sheet_name] * len(missing_paths)
+    if workers == 1 or len(missing_paths) <= 1:
+        parsed = list(map(read_summary_input, missing_paths, sheet_names))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(missing_paths))) as executor:
+            parsed = list(executor.map(read_summary_input, missing_paths, sheet_names, chunksize=chunksize))
+
+    for i, feature_dict in zip(missing, parsed):
+        feature_dicts[i] = feature_dict
+        if cache is not None:
+            cache.put(paths[i], feature_dict, sheet_name)
+    if cache is not None:
+        cache.save()
+
+    table = pd.DataFrame.from_records(feature_dicts, index=[os.path.basename(p) for p in paths])
+    table.index.name = 'ID'
+    return table
+
+
+def table_to_dict(table, ID):
+    """Returns the feature_dict of one intersection of a feature table"""
+    return table.loc[ID].to_dict()